@@ -0,0 +1,161 @@
+# app/acrud.py
+"""
+Asyncio-native variant of the crud module.
+
+Every crud function is exposed here as an awaitable. Reads run on a set of dedicated reader threads
+(one per pooled reader connection). Writes go through the single-writer queue in writer.py, which
+commits concurrent writes together, so API handlers never block the event loop on SQLite.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from . import crud
+from .config import DB_READER_POOL_SIZE
+from .writer import get_write_queue, close_write_queue
+
+_reader_executor = None
+_reader_executor_lock = threading.Lock()
+
+def _get_reader_executor():
+    """Returns the reader executor, creating it on first use."""
+    global _reader_executor
+    if _reader_executor is None:
+        with _reader_executor_lock:
+            if _reader_executor is None:
+                _reader_executor = ThreadPoolExecutor(max_workers=DB_READER_POOL_SIZE, thread_name_prefix="trakfin-db-reader")
+    return _reader_executor
+
+def shutdown():
+    """Stops the reader threads and drains the write queue."""
+    global _reader_executor
+    with _reader_executor_lock:
+        if _reader_executor is not None:
+            _reader_executor.shutdown(wait=True)
+            _reader_executor = None
+    close_write_queue()
+
+def get_write_queue_stats():
+    """Queue depth, batch size and commit latency of the write queue."""
+    return get_write_queue().stats()
+
+
+def _read(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_reader_executor(), functools.partial(fn, *args, **kwargs))
+    return wrapper
+
+_EXHAUSTED = object()
+
+def _read_iter(fn):
+    """Wraps a crud generator as an async generator whose every step runs on the reader threads."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        executor = _get_reader_executor()
+        iterator = fn(*args, **kwargs)
+        step = None
+        try:
+            while True:
+                step = executor.submit(next, iterator, _EXHAUSTED)
+                item = await asyncio.wrap_future(step)
+                if item is _EXHAUSTED:
+                    return
+                yield item
+        finally:
+            # Close the generator (and its connection) on a reader thread, once any step still running there is done.
+            if step is not None and not step.done():
+                step.add_done_callback(lambda _: executor.submit(iterator.close))
+            else:
+                executor.submit(iterator.close)
+    return wrapper
+
+def _write(fn, exclusive: bool = False):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.wrap_future(get_write_queue().submit(fn, args, kwargs, exclusive=exclusive))
+    return wrapper
+
+
+# --- Infrastructure ------------------------------------------------------------------------------------------------------
+get_data_version = _read(crud.get_data_version)
+run_migrations = _write(crud.run_migrations, exclusive=True)  # manages its own transactions
+
+# --- Users ------------------------------------------------------------------------------------------------------
+create_user = _write(crud.create_user)
+get_users = _read(crud.get_users)
+
+# --- Schema ------------------------------------------------------------------------------------------------------
+get_db_schema_string = _read(crud.get_db_schema_string)
+
+# --- Accounts ------------------------------------------------------------------------------------------------------
+add_account = _write(crud.add_account)
+get_accounts = _read(crud.get_accounts)
+update_account = _write(crud.update_account)
+delete_account = _write(crud.delete_account)
+get_transaction_count_for_account = _read(crud.get_transaction_count_for_account)
+reassign_transactions_from_account = _write(crud.reassign_transactions_from_account)
+delete_transactions_by_account = _write(crud.delete_transactions_by_account)
+
+# --- Categories ------------------------------------------------------------------------------------------------------
+add_category = _write(crud.add_category)
+get_categories = _read(crud.get_categories)
+update_category = _write(crud.update_category)
+delete_category = _write(crud.delete_category)
+get_transaction_count_for_category = _read(crud.get_transaction_count_for_category)
+recategorize_transactions = _write(crud.recategorize_transactions)
+delete_transactions_by_category = _write(crud.delete_transactions_by_category)
+
+# --- Settings ------------------------------------------------------------------------------------------------------
+get_setting = _read(crud.get_setting)
+update_setting = _write(crud.update_setting)
+
+# --- Exchange Rates ------------------------------------------------------------------------------------------------------
+get_exchange_rates = _read(crud.get_exchange_rates)
+get_effective_rates_date = _read(crud.get_effective_rates_date)
+load_exchange_rates = _write(crud.load_exchange_rates, exclusive=True)  # backfills amount_base in bulk
+
+# --- Transactions ------------------------------------------------------------------------------------------------------
+add_transaction = _write(crud.add_transaction)
+update_transaction = _write(crud.update_transaction)
+count_confirmed_transactions_in_series = _read(crud.count_confirmed_transactions_in_series)
+delete_transaction_by_id = _write(crud.delete_transaction_by_id)
+delete_entire_series = _write(crud.delete_entire_series)
+delete_entire_transfer = _write(crud.delete_entire_transfer)
+delete_pending_transactions_by_recurrence_id = _write(crud.delete_pending_transactions_by_recurrence_id)
+count_transactions = _read(crud.count_transactions)
+get_all_transactions = _read(crud.get_all_transactions)
+get_transaction_by_id = _read(crud.get_transaction_by_id)
+get_master_recurrent_transactions = _read(crud.get_master_recurrent_transactions)
+get_pending_transactions_by_recurrence_id = _read(crud.get_pending_transactions_by_recurrence_id)
+get_pending_transactions = _read(crud.get_pending_transactions)
+get_due_pending_transactions = _read(crud.get_due_pending_transactions)
+
+# --- Recurrence Rules ------------------------------------------------------------------------------------------------------
+create_recurrence_series = _write(crud.create_recurrence_series)
+get_recurrence_rules = _read(crud.get_recurrence_rules)
+get_recurrence_rules_to_materialize = _read(crud.get_recurrence_rules_to_materialize)
+materialize_recurrence_occurrences = _write(crud.materialize_recurrence_occurrences)
+
+# --- Transfer ------------------------------------------------------------------------------------------------------
+create_transfer = _write(crud.create_transfer)
+get_transfer = _read(crud.get_transfer)
+update_transfer = _write(crud.update_transfer)
+process_batch_instructions = _write(crud.process_batch_instructions)
+
+# --- Import ------------------------------------------------------------------------------------------------------
+get_last_transaction_id = _read(crud.get_last_transaction_id)
+import_transaction_rows = _write(crud.import_transaction_rows, exclusive=True)  # each chunk is its own bounded transaction
+
+# --- Export ------------------------------------------------------------------------------------------------------
+iter_transactions = _read_iter(crud.iter_transactions)
+
+# --- Reports & Charts ------------------------------------------------------------------------------------------------------
+get_balance_report = _read(crud.get_balance_report)
+get_balance_evolution_report = _read(crud.get_balance_evolution_report)
+get_balance_as_of = _read(crud.get_balance_as_of)
+get_category_summary_for_chart = _read(crud.get_category_summary_for_chart)
+get_monthly_income_expense_summary = _read(crud.get_monthly_income_expense_summary)
+get_recurrent_summary = _read(crud.get_recurrent_summary)
+get_dashboard_report = _read(crud.get_dashboard_report)
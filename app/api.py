@@ -1,10 +1,15 @@
-import traceback
-from fastapi import FastAPI, HTTPException, Response, Query, Depends, Header
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response, Query, Depends, Header, UploadFile, File, Form
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date as date_type
 from fastapi.middleware.cors import CORSMiddleware
-from .services import account_service, ai_service, transaction_service, category_service, report_service, setting_service, user_service
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from .services import account_service, ai_service, export_service, import_service, transaction_service, category_service, report_service, setting_service, user_service
+from . import acrud, crud, db, metrics, sql_sandbox
+
+logger = logging.getLogger(__name__)
 
 # --- Pydantic Models ---
 class AccountUpdate(BaseModel): name: str
@@ -36,83 +41,170 @@ async def get_current_user_id(x_user_id: int = Header(...)):
     if x_user_id is None: raise HTTPException(status_code=400, detail="X-User-ID header is missing")
     return x_user_id
 
-app = FastAPI(title="TrakFin API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await acrud.run_migrations()
+    yield
+    await ai_service.close_http_client()
+    sql_sandbox.shutdown()
+    acrud.shutdown()
+    db.close_pool()
+
+app = FastAPI(title="TrakFin API", lifespan=lifespan, default_response_class=ORJSONResponse)
 app.add_middleware(CORSMiddleware, allow_origins=["http://localhost:5173"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 # --- Users ---
 @app.get("/users/")
-def get_all_users():
-    return user_service.get_all_users()
+async def get_all_users():
+    return await user_service.get_all_users()
 
 @app.post("/users/", status_code=201)
-def create_new_user(user: UserCreate):
-    return user_service.create_new_user(user.first_name, user.second_name, user.surname, preferred_currency=user.preferred_currency)
+async def create_new_user(user: UserCreate):
+    return await user_service.create_new_user(user.first_name, user.second_name, user.surname, preferred_currency=user.preferred_currency)
 
 
 # --- Reports ---
 @app.get("/reports/balance/")
-def get_balance_report(user_id: int = Depends(get_current_user_id)):
-    return report_service.get_balance_report(user_id)
+async def get_balance_report(user_id: int = Depends(get_current_user_id)):
+    return await report_service.get_balance_report(user_id)
 
 @app.get("/reports/balance-evolution/")
-def get_balance_evolution(user_id: int = Depends(get_current_user_id)):
-    return report_service.get_balance_evolution_report(user_id)
+async def get_balance_evolution(start_date: Optional[date_type] = None, end_date: Optional[date_type] = None, granularity: str = 'day', user_id: int = Depends(get_current_user_id)):
+    try:
+        return await report_service.get_balance_evolution_report(user_id, start_date=start_date, end_date=end_date, granularity=granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/reports/balance-as-of/")
+async def get_balance_as_of(date: date_type, user_id: int = Depends(get_current_user_id)):
+    return await report_service.get_balance_as_of_report(user_id, date)
 
 @app.get("/reports/category-summary/")
-def get_category_summary_for_chart(start_date: str, end_date: str, transaction_type: str = 'expense', user_id: int = Depends(get_current_user_id)):
-    return report_service.get_category_summary_report(
+async def get_category_summary_for_chart(start_date: str, end_date: str, transaction_type: str = 'expense', user_id: int = Depends(get_current_user_id)):
+    return await report_service.get_category_summary_report(
         user_id=user_id, start_date=start_date, end_date=end_date, transaction_type=transaction_type
     )
 
 @app.get("/reports/monthly-income-expense-summary/")
-def get_monthly_income_expense_summary(start_date: str, end_date: str, user_id: int = Depends(get_current_user_id)):
-    return report_service.get_monthly_income_expense_report(
+async def get_monthly_income_expense_summary(start_date: str, end_date: str, user_id: int = Depends(get_current_user_id)):
+    return await report_service.get_monthly_income_expense_report(
         user_id=user_id, start_date=start_date, end_date=end_date
     )
 
 @app.get("/reports/recurrent-summary/")
-def get_recurrent_summary(start_date: str, end_date: str, user_id: int = Depends(get_current_user_id)):
+async def get_recurrent_summary(start_date: str, end_date: str, user_id: int = Depends(get_current_user_id)):
     # The service function already handles string dates, so we just pass them through.
-    return report_service.get_recurrent_summary_report(
+    return await report_service.get_recurrent_summary_report(
         user_id=user_id, start_date=start_date, end_date=end_date
     )
 
+@app.get("/reports/dashboard/")
+async def get_dashboard(start_date: date_type, end_date: date_type, transaction_type: str = 'expense', granularity: str = 'day', user_id: int = Depends(get_current_user_id)):
+    """All dashboard reports for one date range in a single response, with per-section timings."""
+    try:
+        return await report_service.get_dashboard_report(
+            user_id, start_date, end_date, transaction_type=transaction_type, granularity=granularity
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 # --- API Endpoints ------------------------------------------------------------------------------------------
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to the Personal Finance Tracker API!"}
 
 
+# --- Stats ------------------------------------------------------------------------------------------
+@app.get("/stats/db-pool")
+async def get_db_pool_stats():
+    """Connection pool checkouts and wait times, to spot saturation under load."""
+    return crud.get_pool_stats()
+
+@app.get("/stats/cache")
+async def get_cache_stats():
+    """Hit/miss counters and memory use of the report, transaction count and chat caches in this worker."""
+    return {
+        "reports": report_service.get_report_cache_stats(),
+        "transaction_counts": transaction_service.get_count_cache_stats(),
+        "chat": ai_service.get_chat_cache_stats(),
+    }
+
+@app.get("/stats/write-queue")
+async def get_write_queue_stats():
+    """Queue depth, batch sizes and commit latency of the group-commit write queue in this worker."""
+    return acrud.get_write_queue_stats()
+
+@app.get("/stats/slow-queries")
+async def get_slow_queries():
+    """The latest SQL statements over TRAKFIN_SLOW_QUERY_MS in this worker, with their query plans."""
+    return db.get_slow_queries()
+
+# The stats above, read at scrape time and exposed next to the request and SQL metrics.
+def _pool_stat(key: str):
+    return lambda: {(side,): stats[key] for side, stats in crud.get_pool_stats().items()}
+
+def _cache_stat(key: str):
+    def read():
+        caches = {
+            "reports": report_service.get_report_cache_stats(),
+            "transaction_counts": transaction_service.get_count_cache_stats(),
+            **{f"chat_{level}": stats for level, stats in ai_service.get_chat_cache_stats().items()},
+        }
+        return {(cache,): stats[key] for cache, stats in caches.items()}
+    return read
+
+def _write_queue_stat(key: str):
+    return lambda: {(): acrud.get_write_queue_stats()[key]}
+
+metrics.Gauge("trakfin_db_pool_in_use", "Pooled connections checked out, by side.", ("side",), collect=_pool_stat("in_use"))
+metrics.Counter("trakfin_db_pool_checkouts_total", "Pooled connection checkouts, by side.", ("side",), collect=_pool_stat("checkouts"))
+metrics.Counter("trakfin_db_pool_waits_total", "Checkouts that waited for a free connection, by side.", ("side",), collect=_pool_stat("waits"))
+metrics.Counter("trakfin_cache_hits_total", "Cache hits, by cache.", ("cache",), collect=_cache_stat("hits"))
+metrics.Counter("trakfin_cache_misses_total", "Cache misses, by cache.", ("cache",), collect=_cache_stat("misses"))
+metrics.Counter("trakfin_cache_evictions_total", "Entries evicted to stay within the cache limits, by cache.", ("cache",), collect=_cache_stat("evictions"))
+metrics.Gauge("trakfin_cache_entries", "Entries held, by cache.", ("cache",), collect=_cache_stat("entries"))
+metrics.Gauge("trakfin_cache_bytes", "Approximate memory held, by cache.", ("cache",), collect=_cache_stat("bytes"))
+metrics.Gauge("trakfin_write_queue_depth", "Write jobs waiting for the writer thread.", collect=_write_queue_stat("queue_depth"))
+metrics.Counter("trakfin_write_batches_total", "Write batches committed.", collect=_write_queue_stat("batches"))
+metrics.Counter("trakfin_write_jobs_total", "Write jobs run.", collect=_write_queue_stat("jobs"))
+
+@app.get("/metrics")
+async def get_metrics():
+    """Request, SQL, pool, cache and write queue metrics of this worker in the Prometheus text format."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 # --- Accounts ------------------------------------------------------------------------------------------
 @app.get("/accounts/")
-def get_all_accounts(user_id: int = Depends(get_current_user_id)):
-    return account_service.get_accounts(user_id)
+async def get_all_accounts(user_id: int = Depends(get_current_user_id)):
+    return await account_service.get_accounts(user_id)
 
 @app.post("/accounts/", status_code=201)
-def create_account(account: AccountUpdate, user_id: int = Depends(get_current_user_id)):
+async def create_account(account: AccountUpdate, user_id: int = Depends(get_current_user_id)):
     try:
-        new_account = account_service.create_account(account.name, user_id)
+        new_account = await account_service.create_account(account.name, user_id)
         return new_account
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/accounts/{account_id}")
-def update_account(account_id: int, account: AccountUpdate, user_id: int = Depends(get_current_user_id)):
+async def update_account(account_id: int, account: AccountUpdate, user_id: int = Depends(get_current_user_id)):
     try:
-        account_service.update_account(account_id, account.name, user_id)
+        await account_service.update_account(account_id, account.name, user_id)
         return {"status": "success", "message": "Account updated."}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/accounts/{account_id}", status_code=204)
-def delete_account(account_id: int, options: Optional[AccountDeleteOptions] = None, user_id: int = Depends(get_current_user_id)):
+async def delete_account(account_id: int, options: Optional[AccountDeleteOptions] = None, user_id: int = Depends(get_current_user_id)):
     try:
         strategy = options.strategy if options else None
         target_id = options.target_account_id if options else None
         
-        account_service.delete_account_with_strategy(
+        await account_service.delete_account_with_strategy(
             account_id=account_id,
             user_id=user_id,
             strategy=strategy,
@@ -123,40 +215,40 @@ def delete_account(account_id: int, options: Optional[AccountDeleteOptions] = No
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/accounts/{account_id}/transaction_count")
-def get_account_transaction_count(account_id: int, user_id: int = Depends(get_current_user_id)):
-    return account_service.get_transaction_count_for_account(account_id, user_id)
+async def get_account_transaction_count(account_id: int, user_id: int = Depends(get_current_user_id)):
+    return await account_service.get_transaction_count_for_account(account_id, user_id)
 
 
 
 # --- Categories ------------------------------------------------------------------------------------------
 @app.get("/categories/")
-def get_all_categories(user_id: int = Depends(get_current_user_id)):
-    return category_service.get_categories(user_id)
+async def get_all_categories(user_id: int = Depends(get_current_user_id)):
+    return await category_service.get_categories(user_id)
 
 @app.post("/categories/", status_code=201)
-def create_category(category: CategoryUpdate, user_id: int = Depends(get_current_user_id)):
+async def create_category(category: CategoryUpdate, user_id: int = Depends(get_current_user_id)):
     try:
-        new_category = category_service.create_category(category.name, user_id)
+        new_category = await category_service.create_category(category.name, user_id)
         return new_category
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/categories/{category_id}")
-def update_category(category_id: int, category: CategoryUpdate, user_id: int = Depends(get_current_user_id)):
+async def update_category(category_id: int, category: CategoryUpdate, user_id: int = Depends(get_current_user_id)):
     try:
-        category_service.update_category(category_id, category.name, user_id)
+        await category_service.update_category(category_id, category.name, user_id)
         return {"status": "success", "message": "Category updated."}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/categories/{category_id}", status_code=204)
-def delete_category(category_id: int, options: Optional[CategoryDeleteOptions] = None, user_id: int = Depends(get_current_user_id)):
+async def delete_category(category_id: int, options: Optional[CategoryDeleteOptions] = None, user_id: int = Depends(get_current_user_id)):
     try:
         strategy = options.strategy if options else None
         target_id = options.target_category_id if options else None
         new_transfer_id = options.new_transfer_category_id if options else None
 
-        category_service.delete_category_with_strategy(
+        await category_service.delete_category_with_strategy(
             category_id=category_id,
             user_id=user_id,
             strategy=strategy,
@@ -168,14 +260,14 @@ def delete_category(category_id: int, options: Optional[CategoryDeleteOptions] =
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/categories/{category_id}/transaction_count")
-def get_category_transaction_count(category_id: int, user_id: int = Depends(get_current_user_id)):
-    return category_service.get_transaction_count_for_category(category_id, user_id)
+async def get_category_transaction_count(category_id: int, user_id: int = Depends(get_current_user_id)):
+    return await category_service.get_transaction_count_for_category(category_id, user_id)
 
 
 
 # --- Transactions ------------------------------------------------------------------------------------------
 @app.get("/transactions/")
-def get_all_transactions(
+async def get_all_transactions(
     user_id: int = Depends(get_current_user_id), 
     page: int = 1,
     page_size: int = 10,
@@ -188,7 +280,10 @@ def get_all_transactions(
     amount_min: Optional[float] = None,
     amount_max: Optional[float] = None,
     sort_by: Optional[str] = 'date',
-    sort_order: Optional[str] = 'desc'
+    sort_order: Optional[str] = 'desc',
+    pagination: str = 'offset',
+    cursor: Optional[str] = None,
+    include_total: bool = True
 ):
     filters = {
         "account_ids": account_ids,
@@ -202,11 +297,16 @@ def get_all_transactions(
         "sort_by": sort_by,
         "sort_order": sort_order
     }
-    return transaction_service.get_all_transactions(user_id, page, page_size, **filters)
+    try:
+        return await transaction_service.get_all_transactions(
+            user_id, page, page_size, cursor=cursor, use_cursor=(pagination == 'cursor'), include_total=include_total, **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/transactions/", status_code=201)
-def create_transaction(transaction: TransactionCreate, user_id: int = Depends(get_current_user_id)):
+async def create_transaction(transaction: TransactionCreate, user_id: int = Depends(get_current_user_id)):
     try:
         transaction_dict = transaction.model_dump()
         if transaction_dict.get('date'):
@@ -214,21 +314,19 @@ def create_transaction(transaction: TransactionCreate, user_id: int = Depends(ge
         if transaction_dict.get('recurrence_end_date'):
             transaction_dict['recurrence_end_date'] = str(transaction_dict['recurrence_end_date'])
 
-        new_transaction = transaction_service.create_transaction_with_recurrence(
+        new_transaction = await transaction_service.create_transaction_with_recurrence(
             transaction_data=transaction_dict,
             user_id=user_id
         )
         return new_transaction
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        print("--- An unexpected error occurred ---")
-        traceback.print_exc() # This will print the full, detailed traceback
-        print("------------------------------------")
+    except Exception:
+        logger.exception("Unexpected error in create_transaction")
         raise HTTPException(status_code=500, detail="An internal server error occurred.")
 
 @app.put("/transactions/{transaction_id}")
-def update_transaction(transaction_id: int, transaction: TransactionCreate, user_id: int = Depends(get_current_user_id)):
+async def update_transaction(transaction_id: int, transaction: TransactionCreate, user_id: int = Depends(get_current_user_id)):
     try:
         transaction_dict = transaction.model_dump()
         if transaction_dict.get('date'):
@@ -236,7 +334,7 @@ def update_transaction(transaction_id: int, transaction: TransactionCreate, user
         if transaction_dict.get('recurrence_end_date'):
             transaction_dict['recurrence_end_date'] = str(transaction_dict['recurrence_end_date'])
 
-        updated_transaction = transaction_service.update_transaction_with_recurrence(
+        updated_transaction = await transaction_service.update_transaction_with_recurrence(
             transaction_id=transaction_id,
             transaction_data=transaction_dict,
             user_id=user_id
@@ -244,38 +342,41 @@ def update_transaction(transaction_id: int, transaction: TransactionCreate, user
         return updated_transaction
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        print("--- An unexpected error occurred ---")
-        traceback.print_exc() # This will print the full, detailed traceback
-        print("------------------------------------")
+    except Exception:
+        logger.exception("Unexpected error in update_transaction")
         raise HTTPException(status_code=500, detail="An internal server error occurred.")
     
 @app.delete("/transactions/{transaction_id}", status_code=204)
-def delete_transaction(transaction_id: int, user_id: int = Depends(get_current_user_id)):
-    transaction_service.delete_transaction(transaction_id, user_id)
+async def delete_transaction(transaction_id: int, user_id: int = Depends(get_current_user_id)):
+    await transaction_service.delete_transaction(transaction_id, user_id)
     return Response(status_code=204)
 
 @app.get("/recurrences/", response_model=List[dict])
-def get_recurrence_series(user_id: int = Depends(get_current_user_id)):
+async def get_recurrence_series(user_id: int = Depends(get_current_user_id)):
     """Gets a list of all existing recurrence series for the user."""
-    return transaction_service.get_all_recurrence_series(user_id)
+    return await transaction_service.get_all_recurrence_series(user_id)
 
 @app.get("/recurrences/{recurrence_id}/confirmed_count")
-def get_confirmed_count_in_series(recurrence_id: str, user_id: int = Depends(get_current_user_id)):
+async def get_confirmed_count_in_series(recurrence_id: str, user_id: int = Depends(get_current_user_id)):
     """Gets the count of confirmed transactions in a specific recurrence series."""
-    return transaction_service.get_confirmed_count_for_series(recurrence_id, user_id)
+    return await transaction_service.get_confirmed_count_for_series(recurrence_id, user_id)
+
+@app.get("/recurrences/forecast", response_model=List[dict])
+async def get_recurrence_forecast(until: date_type, user_id: int = Depends(get_current_user_id)):
+    """Gets every pending occurrence up to a date, generating those beyond the stored window on the fly."""
+    return await transaction_service.get_recurrence_forecast(user_id, until)
 
 @app.get("/transactions/pending", response_model=List[dict])
-def get_due_transactions(user_id: int = Depends(get_current_user_id)):
+async def get_due_transactions(user_id: int = Depends(get_current_user_id)):
     """Gets a list of all due pending transactions for the user."""
-    return transaction_service.get_due_pending_transactions(user_id)
+    return await transaction_service.get_due_pending_transactions(user_id)
 
 
 # --- Transfers ------------------------------------------------------------------------------------------
 @app.post("/transfers/")
-def create_transfer(transfer: TransferCreate, user_id: int = Depends(get_current_user_id)):
+async def create_transfer(transfer: TransferCreate, user_id: int = Depends(get_current_user_id)):
     try:
-        return transaction_service.create_transfer(
+        return await transaction_service.create_transfer(
             date=str(transfer.date),
             description=transfer.description,
             amount=transfer.amount,
@@ -283,23 +384,21 @@ def create_transfer(transfer: TransferCreate, user_id: int = Depends(get_current
             to_account_id=transfer.to_account_id,
             user_id=user_id
         )
-    except Exception as e:
-        print("--- An unexpected error occurred ---")
-        traceback.print_exc() # This will print the full, detailed traceback
-        print("------------------------------------")
+    except Exception:
+        logger.exception("Unexpected error in create_transfer")
         raise HTTPException(status_code=500, detail="An internal server error occurred.")
 
 @app.get("/transfers/{transfer_id}")
-def get_transfer_details(transfer_id: str, user_id: int = Depends(get_current_user_id)):
+async def get_transfer_details(transfer_id: str, user_id: int = Depends(get_current_user_id)):
     try:
-        return transaction_service.get_transfer_details(transfer_id, user_id)
+        return await transaction_service.get_transfer_details(transfer_id, user_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @app.put("/transfers/{transfer_id}")
-def update_transfer(transfer_id: str, transfer: TransferUpdate, user_id: int = Depends(get_current_user_id)):
+async def update_transfer(transfer_id: str, transfer: TransferUpdate, user_id: int = Depends(get_current_user_id)):
     try:
-        transaction_service.update_transfer(
+        await transaction_service.update_transfer(
             transfer_id=transfer_id,
             date=transfer.date,
             amount=transfer.amount,
@@ -308,53 +407,140 @@ def update_transfer(transfer_id: str, transfer: TransferUpdate, user_id: int = D
             user_id=user_id
         )
         return {"status": "success", "message": "Transfer updated."}
-    except Exception as e:
-        print("--- An unexpected error occurred ---")
-        traceback.print_exc() # This will print the full, detailed traceback
-        print("------------------------------------")
+    except Exception:
+        logger.exception("Unexpected error in update_transfer")
         raise HTTPException(status_code=500, detail="An internal server error occurred.")
 
 @app.post("/transactions/batch-process")
-def batch_process_transactions(request: BatchProcessRequest, user_id: int = Depends(get_current_user_id)):
+async def batch_process_transactions(request: BatchProcessRequest, user_id: int = Depends(get_current_user_id)):
     try:
-        result = transaction_service.batch_process_transactions([i.model_dump() for i in request.instructions], user_id=user_id)
+        result = await transaction_service.batch_process_transactions([i.model_dump() for i in request.instructions], user_id=user_id)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        print("--- An unexpected error occurred ---")
-        traceback.print_exc() # This will print the full, detailed traceback
-        print("------------------------------------")
+    except Exception:
+        logger.exception("Unexpected error in batch_process_transactions")
         raise HTTPException(status_code=500, detail="An internal server error occurred.")
     
 @app.get("/recurrences/{recurrence_id}/pending", response_model=List[dict])
-def get_pending_transactions_in_series(recurrence_id: str, user_id: int = Depends(get_current_user_id)):
+async def get_pending_transactions_in_series(recurrence_id: str, user_id: int = Depends(get_current_user_id)):
     """Gets a list of all pending transactions for a specific recurrence series."""
-    return transaction_service.get_pending_transactions_for_series(recurrence_id, user_id)
+    return await transaction_service.get_pending_transactions_for_series(recurrence_id, user_id)
+
+
+
+# --- Import ------------------------------------------------------------------------------------------
+@app.post("/import/transactions")
+async def import_transactions(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    mapping: Optional[str] = Form(None),
+    account: Optional[str] = Form(None),
+    category: Optional[str] = Form(None),
+    currency: Optional[str] = Form(None),
+    date_format: Optional[str] = Form(None),
+    decimal_comma: bool = Form(False),
+    delimiter: str = Form(','),
+    sheet: Optional[str] = Form(None),
+    user_id: int = Depends(get_current_user_id)
+):
+    """
+    Streams a CSV or XLSX bank statement into transactions. `mapping` maps fields to column headers,
+    as JSON or 'field=Column,...'. Returns the counts, throughput and the rejected rows.
+    """
+    try:
+        return await import_service.import_file(
+            file.file, file.filename, user_id, file_format=format, delimiter=delimiter, sheet=sheet,
+            mapping=mapping, account=account, category=category, currency=currency,
+            date_format=date_format, decimal_comma=decimal_comma
+        )
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await file.close()
+
 
+# --- Exchange Rates ---
+@app.get("/exchange-rates/")
+async def get_exchange_rates(currency: Optional[str] = None):
+    return await setting_service.get_exchange_rates(currency)
+
+
+# --- Export ------------------------------------------------------------------------------------------
+def _export_response(stream, export_format: str, filename: str):
+    return StreamingResponse(
+        stream,
+        media_type=export_service.EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
+
+@app.get("/export/transactions")
+async def export_transactions(
+    user_id: int = Depends(get_current_user_id),
+    format: str = 'csv',
+    account_ids: Optional[list[int]] = Query(None),
+    category_ids: Optional[list[int]] = Query(None),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    search: Optional[str] = None,
+    recurrent: Optional[bool] = None,
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+    sort_by: Optional[str] = 'date',
+    sort_order: Optional[str] = 'desc'
+):
+    """Streams every transaction matching the /transactions/ filters as CSV, NDJSON or XLSX."""
+    try:
+        stream = export_service.export_transactions(
+            user_id, format, sort_by=sort_by, sort_order=sort_order,
+            account_ids=account_ids, category_ids=category_ids, start_date=start_date, end_date=end_date,
+            search_query=search, is_recurrent=recurrent, amount_min=amount_min, amount_max=amount_max
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _export_response(stream, format, "transactions")
+
+@app.get("/export/reports/{name}")
+async def export_report(
+    name: str,
+    user_id: int = Depends(get_current_user_id),
+    format: str = 'csv',
+    start_date: Optional[date_type] = None,
+    end_date: Optional[date_type] = None,
+    date: Optional[date_type] = None,
+    transaction_type: str = 'expense',
+    granularity: str = 'day'
+):
+    """Streams a report as CSV, NDJSON or XLSX. Takes the same parameters as the matching /reports/ endpoint."""
+    try:
+        stream = await export_service.export_report(
+            name, user_id, format, start_date=start_date, end_date=end_date, as_of=date,
+            transaction_type=transaction_type, granularity=granularity
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _export_response(stream, format, name)
 
 
 # --- Settings ------------------------------------------------------------------------------------------
 @app.get("/settings/transfer_category_id")
-def get_transfer_category_setting(user_id: int = Depends(get_current_user_id)):
+async def get_transfer_category_setting(user_id: int = Depends(get_current_user_id)):
     try:
-        return setting_service.get_transfer_category_setting(user_id)
+        return await setting_service.get_transfer_category_setting(user_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @app.put("/settings/transfer_category_id")
-def update_transfer_category_setting(setting: SettingUpdate, user_id: int = Depends(get_current_user_id)):
+async def update_transfer_category_setting(setting: SettingUpdate, user_id: int = Depends(get_current_user_id)):
     try:
-        return setting_service.update_transfer_category_setting(
+        return await setting_service.update_transfer_category_setting(
             user_id=user_id,
             value=setting.value,
             original_value=setting.original_value,
             migration_strategy=setting.migration_strategy
         )
-    except Exception as e:
-        print("--- An unexpected error occurred ---")
-        traceback.print_exc() # This will print the full, detailed traceback
-        print("------------------------------------")
+    except Exception:
+        logger.exception("Unexpected error in update_transfer_category_setting")
         raise HTTPException(status_code=500, detail="An internal server error occurred.")
 
 
@@ -362,10 +548,16 @@ def update_transfer_category_setting(setting: SettingUpdate, user_id: int = Depe
 @app.post("/chat/")
 async def handle_chat(query: ChatQuery, user_id: int = Depends(get_current_user_id)):
     try:
-        response_text = await ai_service.execute_natural_language_query(query.query, query.history, user_id)
-        return {"response": response_text}
-    except Exception as e:
-        print("--- An unexpected error occurred ---")
-        traceback.print_exc() # This will print the full, detailed traceback
-        print("------------------------------------")
-        raise HTTPException(status_code=500, detail="An internal server error occurred.")
\ No newline at end of file
+        return await ai_service.execute_natural_language_query(query.query, query.history, user_id)
+    except Exception:
+        logger.exception("Unexpected error in handle_chat")
+        raise HTTPException(status_code=500, detail="An internal server error occurred.")
+
+@app.post("/chat/stream")
+async def handle_chat_stream(query: ChatQuery, user_id: int = Depends(get_current_user_id)):
+    """Answers like /chat/, streamed as Server-Sent Events: progress and token events, then done or error."""
+    return StreamingResponse(
+        ai_service.stream_natural_language_query(query.query, query.history, user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,99 @@
+# app/cache.py
+import threading
+import time
+from collections import OrderedDict
+import orjson
+
+
+def _estimate_size(value):
+    """Approximates an entry's footprint by the size of its JSON encoding."""
+    try:
+        return len(orjson.dumps(value))
+    except TypeError:
+        return 0
+
+
+class VersionedLRUCache:
+    """
+    A thread-safe LRU cache whose entries are tagged with the data version they were computed at.
+    A lookup with a different version is a miss, so bumping the version invalidates every entry at once.
+    Entries are evicted least-recently-used first once either max_entries or max_bytes is exceeded,
+    and, when ttl is given, expire that many seconds after they were stored.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int | None = None, ttl: float | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, version):
+        """Returns the cached value for key if it was stored at this version and has not expired, otherwise None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] is not None and entry[3] <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= entry[2]
+                self.expirations += 1
+                entry = None
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, version, value):
+        size = _estimate_size(value) if self.max_bytes is not None else 0
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (version, value, size, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, _, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, version, compute):
+        """Returns the cached value, or computes and stores it. None results are never cached."""
+        value = self.get(key, version)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.set(key, version, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,8 +1,55 @@
-# app/config.py
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent"
\ No newline at end of file
+GEMINI_API_URL = os.getenv("TRAKFIN_GEMINI_API_URL", "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent")
+# The same model's streaming endpoint; point both at scripts/fake_gemini.py to test without the real API.
+GEMINI_STREAM_URL = os.getenv("TRAKFIN_GEMINI_STREAM_URL", GEMINI_API_URL.replace(":generateContent", ":streamGenerateContent"))
+# One pooled client is shared by every chat request; failed calls are retried with exponential backoff.
+GEMINI_TIMEOUT = float(os.getenv("TRAKFIN_GEMINI_TIMEOUT", "60"))
+GEMINI_MAX_CONNECTIONS = int(os.getenv("TRAKFIN_GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_KEEPALIVE_EXPIRY = float(os.getenv("TRAKFIN_GEMINI_KEEPALIVE_EXPIRY", "60"))
+GEMINI_MAX_RETRIES = int(os.getenv("TRAKFIN_GEMINI_MAX_RETRIES", "3"))
+GEMINI_RETRY_BACKOFF = float(os.getenv("TRAKFIN_GEMINI_RETRY_BACKOFF", "0.5"))
+# Queries the assistant generates run on their own threads, each stopped after AI_SQL_TIMEOUT seconds.
+AI_SQL_WORKERS = int(os.getenv("TRAKFIN_AI_SQL_WORKERS", "2"))
+AI_SQL_TIMEOUT = float(os.getenv("TRAKFIN_AI_SQL_TIMEOUT", "5"))
+AI_SQL_MAX_ROWS = int(os.getenv("TRAKFIN_AI_SQL_MAX_ROWS", "500"))
+
+# --- Database ---
+DB_PATH = os.getenv("TRAKFIN_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'trakfin.db'))
+DB_READER_POOL_SIZE = int(os.getenv("TRAKFIN_DB_READERS", "4"))
+DB_BUSY_TIMEOUT = float(os.getenv("TRAKFIN_DB_BUSY_TIMEOUT", "10"))
+DB_MMAP_SIZE = int(os.getenv("TRAKFIN_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv("TRAKFIN_DB_CACHE_SIZE_KB", str(16 * 1024)))
+# Every statement on a pooled connection is timed for /metrics; statements slower than SLOW_QUERY_MS are also
+# logged with their query plan, to SLOW_QUERY_LOG as JSON lines when it is set and as warnings of the app.db logger otherwise.
+SQL_METRICS = os.getenv("TRAKFIN_SQL_METRICS", "1") != "0"
+SLOW_QUERY_MS = float(os.getenv("TRAKFIN_SLOW_QUERY_MS", "250"))
+SLOW_QUERY_LOG = os.getenv("TRAKFIN_SLOW_QUERY_LOG")
+SLOW_QUERY_KEEP = int(os.getenv("TRAKFIN_SLOW_QUERY_KEEP", "100"))
+
+# --- Recurrences ---
+# Pending occurrences are only materialized as rows up to this many days ahead of today.
+RECURRENCE_WINDOW_DAYS = int(os.getenv("TRAKFIN_RECURRENCE_WINDOW_DAYS", "90"))
+
+# --- Caches ---
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("TRAKFIN_REPORT_CACHE_MAX_ENTRIES", "4096"))
+REPORT_CACHE_MAX_BYTES = int(os.getenv("TRAKFIN_REPORT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Chat keeps the generated SQL per question and the final answer per query result, each for at most CHAT_CACHE_TTL seconds.
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("TRAKFIN_CHAT_CACHE_MAX_ENTRIES", "2048"))
+CHAT_CACHE_MAX_BYTES = int(os.getenv("TRAKFIN_CHAT_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+CHAT_CACHE_TTL = float(os.getenv("TRAKFIN_CHAT_CACHE_TTL", "3600"))
+
+# --- Write queue ---
+# Writes arriving within this window of the first queued one are committed together in one transaction.
+WRITE_BATCH_WINDOW_MS = float(os.getenv("TRAKFIN_WRITE_BATCH_WINDOW_MS", "2"))
+WRITE_BATCH_MAX_JOBS = int(os.getenv("TRAKFIN_WRITE_BATCH_MAX_JOBS", "64"))
+
+# --- Import ---
+# Rows are validated and inserted this many at a time, each chunk in its own transaction.
+IMPORT_CHUNK_SIZE = int(os.getenv("TRAKFIN_IMPORT_CHUNK_SIZE", "5000"))
+# At most this many rejected rows are returned in an import report; the rest are only counted.
+IMPORT_MAX_REJECTED_REPORTED = int(os.getenv("TRAKFIN_IMPORT_MAX_REJECTED_REPORTED", "1000"))
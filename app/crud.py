@@ -1,29 +1,85 @@
-import pandas as pd
+import re
+import time
+import calendar
+import hashlib
+import threading
+from decimal import Decimal
+from datetime import date as date_type
 from typing import Optional
-import sqlite3
-import os
 from contextlib import contextmanager
+from .db import get_pool
+from . import migrations, money, writer
 
-# Hardcoded exchange rates relative to EUR
-EXCHANGE_RATES = {
-    'EUR': 1.0,
-    'USD': 0.92, # 1 EUR = 1.08 USD -> 1 USD = 0.92 EUR
-    'GBP': 1.18, # 1 EUR = 0.85 GBP -> 1 GBP = 1.18 EUR
-}
+# Stored amount_base values and exchange_rates are in this currency; reports convert them to the user's preferred one.
+BASE_CURRENCY = 'EUR'
+
+def _rate_sql(currency_sql: str, date_sql: str):
+    """SQL expression for the rate (base-currency value of one unit) of a currency effective on a date."""
+    return migrations.rate_lookup_sql(currency_sql, date_sql)
+
+def _scale_sql(currency_sql: str):
+    """SQL expression for the minor units per major unit of a currency."""
+    return migrations.scale_lookup_sql(currency_sql)
+
+def _to_major(row: dict):
+    """
+    Converts the stored minor-unit amounts of a transaction or rule dict to decimal amounts in place.
+    Amounts are integers of minor units in the database and decimal amounts everywhere outside crud.
+    """
+    if 'amount' in row:
+        row['amount'] = money.to_major(row['amount'], row.get('currency'))
+    if 'amount_base' in row:
+        row['amount_base'] = money.to_major(row['amount_base'], BASE_CURRENCY)
+    return row
 
 @contextmanager
 def get_db_connection():
-    """Provides a database connection using a context manager."""
-    DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'trakfin.db')
-    conn = None
-    try:
-        conn = sqlite3.connect(DB_PATH, timeout=10)
-        conn.row_factory = sqlite3.Row
+    """
+    Provides the pooled writer connection using a context manager.
+    Inside a write-queue batch it provides the running job's savepoint instead, so commit() and
+    rollback() only apply to that job and the batch commits once for all of them.
+    """
+    job_conn = writer.current_connection()
+    if job_conn is not None:
+        yield job_conn
+        return
+    with get_pool().writer() as conn:
+        yield conn
+
+@contextmanager
+def get_read_connection():
+    """Provides a pooled read-only connection using a context manager."""
+    with get_pool().reader() as conn:
         yield conn
-    finally:
-        if conn:
-            conn.close()
-             
+
+def _fetch_dicts(conn, query, params=()):
+    """Runs a query and returns plain dicts, built straight from the row tuples."""
+    cursor = conn.execute(query, params)
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def get_pool_stats():
+    """Returns checkout and wait-time counters for the connection pool."""
+    return get_pool().stats()
+
+def get_data_version(user_id):
+    """Returns the user's data version, which triggers bump on every write to their data."""
+    with get_read_connection() as conn:
+        row = conn.execute("SELECT version FROM user_data_versions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+def rebuild_search_index():
+    """Rebuilds the FTS5 description index from the transactions table and merges its segments."""
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('optimize')")
+        conn.commit()
+        return conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+def run_migrations():
+    """Brings the database schema up to the latest version and returns the applied migrations."""
+    with get_db_connection() as conn:
+        return migrations.apply_migrations(conn)
 
 
 # --- Users ------------------------------------------------------------------------------------------------------
@@ -41,26 +97,42 @@ def create_user(first_name: str, second_name: Optional[str], surname: str):
 
 def get_users():
     """Retrieves all users from the database."""
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         users = conn.execute("SELECT id, first_name, second_name, surname FROM users ORDER BY first_name, surname").fetchall()
         return [dict(row) for row in users]
 
 
 # --- Schema Function ------------------------------------------------------------------------------------------------------
+# (schema_version, text) of the last schema description built; SQLite bumps schema_version on every DDL change.
+_schema_string_cache = (None, None)
+_schema_string_lock = threading.Lock()
+
 def get_db_schema_string():
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        schema_str = ""
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        for table in tables:
-            table_name = table['name']
+    """
+    Describes every table and its columns for the assistant's prompt. The text is rebuilt, with one query over
+    pragma_table_info, only when PRAGMA schema_version shows the schema changed since it was last built.
+    """
+    global _schema_string_cache
+    with get_read_connection() as conn:
+        version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+        with _schema_string_lock:
+            cached_version, schema_str = _schema_string_cache
+        if cached_version == version:
+            return schema_str
+        rows = conn.execute("""
+            SELECT m.name, p.name, p.type FROM sqlite_master m JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table' ORDER BY m.rowid, p.cid
+        """).fetchall()
+    schema_str = ""
+    current_table = None
+    for table_name, column_name, column_type in rows:
+        if table_name != current_table:
             schema_str += f"\nTable '{table_name}':\n"
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
-            for column in columns:
-                schema_str += f"  - {column['name']} ({column['type']})\n"
-        return schema_str
+            current_table = table_name
+        schema_str += f"  - {column_name} ({column_type})\n"
+    with _schema_string_lock:
+        _schema_string_cache = (version, schema_str)
+    return schema_str
 
 
 # --- Accounts ------------------------------------------------------------------------------------------------------
@@ -73,7 +145,7 @@ def add_account(name, user_id):
         return account_id
 
 def get_accounts(user_id):
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         accounts = conn.execute("SELECT id, name FROM accounts WHERE user_id = ? ORDER BY name COLLATE NOCASE", (user_id,)).fetchall()
         return [dict(row) for row in accounts]
 
@@ -90,18 +162,20 @@ def delete_account(account_id, user_id):
         return True
 
 def get_transaction_count_for_account(account_id, user_id):
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         count = conn.execute("SELECT COUNT(id) FROM transactions WHERE account_id = ? AND user_id = ?", (account_id, user_id)).fetchone()[0]
         return count
 
 def reassign_transactions_from_account(from_account_id, to_account_id, user_id):
     with get_db_connection() as conn:
         conn.execute("UPDATE transactions SET account_id = ? WHERE account_id = ? AND user_id = ?", (to_account_id, from_account_id, user_id))
+        conn.execute("UPDATE recurrence_series SET account_id = ? WHERE account_id = ? AND user_id = ?", (to_account_id, from_account_id, user_id))
         conn.commit()
 
 def delete_transactions_by_account(account_id, user_id):
     with get_db_connection() as conn:
         conn.execute("DELETE FROM transactions WHERE account_id = ? AND user_id = ?", (account_id, user_id))
+        _drop_rules(conn, user_id, "account_id = ?", (account_id,))
         conn.commit()
 
 
@@ -118,7 +192,7 @@ def add_category(category_name: str, user_id: int, i18n_key: str | None = None):
         return category_id
 
 def get_categories(user_id):
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         categories = conn.execute(
             "SELECT id, name, i18n_key FROM categories WHERE user_id = ? ORDER BY name COLLATE NOCASE", 
             (user_id,)
@@ -141,26 +215,32 @@ def delete_category(category_id, user_id):
         return True
 
 def get_transaction_count_for_category(category_id, user_id):
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         count = conn.execute("SELECT COUNT(id) FROM transactions WHERE category_id = ? AND user_id = ?", (category_id, user_id)).fetchone()[0]
         return count
 
 def recategorize_transactions(from_category_id, to_category_id, user_id):
     with get_db_connection() as conn:
         conn.execute("UPDATE transactions SET category_id = ? WHERE category_id = ? AND user_id = ?", (to_category_id, from_category_id, user_id))
+        conn.execute("UPDATE recurrence_series SET category_id = ? WHERE category_id = ? AND user_id = ?", (to_category_id, from_category_id, user_id))
         conn.commit()     
 
 def delete_transactions_by_category(category_id, user_id):
     with get_db_connection() as conn:
         conn.execute("DELETE FROM transactions WHERE category_id = ? AND user_id = ?", (category_id, user_id))
+        _drop_rules(conn, user_id, "category_id = ?", (category_id,))
         conn.commit()     
 
 
 # --- Setting Functions ------------------------------------------------------------------------------------------------------
 def get_setting(key, user_id):
-    with get_db_connection() as conn:
-        value = conn.execute("SELECT value FROM settings WHERE key = ? AND user_id = ?", (key, user_id)).fetchone()
-        return value[0] if value else None
+    with get_read_connection() as conn:
+        return _get_setting(conn, key, user_id)
+
+def _get_setting(conn, key, user_id):
+    """Reads a setting on an already checked-out connection."""
+    value = conn.execute("SELECT value FROM settings WHERE key = ? AND user_id = ?", (key, user_id)).fetchone()
+    return value[0] if value else None
 
 def update_setting(key, value, user_id):
     with get_db_connection() as conn:
@@ -168,17 +248,128 @@ def update_setting(key, value, user_id):
         conn.commit()
 
 
+# --- Exchange Rates ------------------------------------------------------------------------------------------------------
+def get_exchange_rates(currency: str | None = None):
+    with get_read_connection() as conn:
+        query = "SELECT currency, effective_date, rate FROM exchange_rates"
+        params = []
+        if currency:
+            query += " WHERE currency = ?"; params.append(currency.upper())
+        return _fetch_dicts(conn, query + " ORDER BY currency, effective_date", params)
+
+def get_effective_rates_date(on_date: str | None = None):
+    """
+    The date of the latest exchange rate in effect on on_date (default: today). It moves when a rate loaded with a
+    future effective_date takes effect, which bumps no data version.
+    """
+    with get_read_connection() as conn:
+        return conn.execute(
+            "SELECT MAX(effective_date) FROM exchange_rates WHERE effective_date <= ?", (on_date or str(date_type.today()),)
+        ).fetchone()[0]
+
+def load_exchange_rates(rates):
+    """
+    Upserts (currency, effective_date, rate) rows, rate being the BASE_CURRENCY value of one unit, then recomputes
+    amount_base for the transactions whose effective rate may have changed: those in each loaded currency dated on or
+    after its earliest loaded rate, or all of them when that rate is the currency's first. Every user's data version
+    is bumped, since balances are also converted at the latest rates. Returns (rates loaded, transactions updated).
+    """
+    rates = [(currency.strip().upper(), str(effective_date), float(rate)) for currency, effective_date, rate in rates]
+    earliest = {}
+    for currency, effective_date, _ in rates:
+        earliest[currency] = min(earliest.get(currency, effective_date), effective_date)
+    with get_db_connection() as conn:
+        try:
+            conn.executemany(
+                """INSERT INTO exchange_rates (currency, effective_date, rate) VALUES (?, ?, ?)
+                   ON CONFLICT(currency, effective_date) DO UPDATE SET rate = excluded.rate""",
+                rates
+            )
+            updated = 0
+            for currency, since in earliest.items():
+                first = conn.execute("SELECT MIN(effective_date) FROM exchange_rates WHERE currency = ?", (currency,)).fetchone()[0]
+                if since <= first:
+                    since = ''
+                amount_base = migrations.base_amount_sql('amount', 'currency', 'date')
+                updated += conn.execute(
+                    f"UPDATE transactions SET amount_base = {amount_base} WHERE currency = ? AND date >= ? AND amount_base IS NOT {amount_base}",
+                    (currency, since)
+                ).rowcount
+            conn.execute("UPDATE user_data_versions SET version = version + 1")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(rates), updated
+
+def _report_currency(conn, user_id, on_date: str | None = None):
+    """
+    Returns the user's preferred currency and the divisor converting BASE_CURRENCY minor units into decimal
+    amounts of it, at the rate effective on on_date (default: today). Dividing rather than multiplying by the
+    inverse keeps sums of cents such as 50809 / 100 at the closest float, 508.09.
+    """
+    currency = (_get_setting(conn, 'preferred_currency', user_id) or BASE_CURRENCY).upper()
+    divisor = float(money.scale(BASE_CURRENCY))
+    if currency == BASE_CURRENCY:
+        return currency, divisor
+    rate = conn.execute(f"SELECT {_rate_sql('?1', '?2')}", (currency, on_date or str(date_type.today()))).fetchone()[0]
+    return currency, divisor * rate
+
+
 # --- Transactions ------------------------------------------------------------------------------------------------------
+# Transactions reference their series and transfer by integer key; outside crud both are known by their public ids,
+# returned as recurrence_id and transfer_id.
+_TRANSACTION_SELECT = """
+    SELECT t.id, t.user_id, t.date, t.description, t.amount, t.currency, t.account_id, t.category_id, t.is_recurrent,
+           tr.public_id as transfer_id, t.recurrence_end_date, s.public_id as recurrence_id, t.status,
+           t.recurrence_num, t.recurrence_unit, t.amount_base
+"""
+_SERIES_AND_TRANSFER_JOINS = """
+    LEFT JOIN recurrence_series s ON s.id = t.series_id
+    LEFT JOIN transfers tr ON tr.id = t.transfer_ref_id
+"""
+
+def _series_key(conn, recurrence_id: str | None, user_id: int, create: bool = False):
+    """Integer key of the user's series with this public id, or None. With create=True an unknown id starts a series."""
+    if recurrence_id is None:
+        return None
+    row = conn.execute("SELECT id FROM recurrence_series WHERE public_id = ? AND user_id = ?", (recurrence_id, user_id)).fetchone()
+    if row:
+        return row[0]
+    if not create:
+        return None
+    return conn.execute("INSERT INTO recurrence_series (public_id, user_id) VALUES (?, ?)", (recurrence_id, user_id)).lastrowid
+
+def _transfer_key(conn, transfer_id: str | None, user_id: int, create: bool = False):
+    """Integer key of the user's transfer with this public id, or None. With create=True an unknown id starts a transfer."""
+    if transfer_id is None:
+        return None
+    row = conn.execute("SELECT id FROM transfers WHERE public_id = ? AND user_id = ?", (transfer_id, user_id)).fetchone()
+    if row:
+        return row[0]
+    if not create:
+        return None
+    return conn.execute("INSERT INTO transfers (public_id, user_id) VALUES (?, ?)", (transfer_id, user_id)).lastrowid
+
+def _set_transfer_leg(conn, transfer_key: int, transaction_id: int, amount):
+    leg = 'expense_id' if amount < 0 else 'income_id'
+    conn.execute(f"UPDATE transfers SET {leg} = ? WHERE id = ?", (transaction_id, transfer_key))
+
 def add_transaction(date, description, amount, currency, is_recurrent, account_id, category_id, user_id, transfer_id=None, recurrence_end_date=None, recurrence_id=None, status='confirmed', recurrence_num=None, recurrence_unit=None):
+    """Inserts a transaction. An unknown recurrence_id or transfer_id starts a new series or transfer with that public id."""
     with get_db_connection() as conn:
+        series_key = _series_key(conn, recurrence_id, user_id, create=True)
+        transfer_key = _transfer_key(conn, transfer_id, user_id, create=True)
         cursor = conn.cursor()
         cursor.execute(
             """INSERT INTO transactions 
-               (date, description, amount, currency, is_recurrent, account_id, category_id, user_id, transfer_id, recurrence_end_date, recurrence_id, status, recurrence_num, recurrence_unit) 
+               (date, description, amount, currency, is_recurrent, account_id, category_id, user_id, transfer_ref_id, recurrence_end_date, series_id, status, recurrence_num, recurrence_unit) 
                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (date, description, amount, currency, is_recurrent, account_id, category_id, user_id, transfer_id, recurrence_end_date, recurrence_id, status, recurrence_num, recurrence_unit)
+            (date, description, money.to_minor(amount, currency), currency, is_recurrent, account_id, category_id, user_id, transfer_key, recurrence_end_date, series_key, status, recurrence_num, recurrence_unit)
         )
         new_id = cursor.lastrowid
+        if transfer_key is not None:
+            _set_transfer_leg(conn, transfer_key, new_id, amount)
         conn.commit()
         return new_id
 
@@ -190,6 +381,23 @@ def update_transaction(transaction_id: int, user_id: int, updates: dict):
         
         if not valid_updates:
             return True # Nothing to update
+        if 'amount' in valid_updates:
+            currency = valid_updates.get('currency') or conn.execute(
+                "SELECT currency FROM transactions WHERE id = ? AND user_id = ?", (transaction_id, user_id)
+            ).fetchone()[0]
+            valid_updates['amount'] = money.to_minor(valid_updates['amount'], currency)
+        elif 'currency' in valid_updates:
+            # The stored amount is in minor units of the old currency; carry its decimal value over to the new one.
+            stored = conn.execute("SELECT amount, currency FROM transactions WHERE id = ? AND user_id = ?", (transaction_id, user_id)).fetchone()
+            if stored and stored[1] != valid_updates['currency']:
+                valid_updates['amount'] = money.to_minor(Decimal(stored[0]) / money.scale(stored[1]), valid_updates['currency'])
+        previous_series_id = None
+        if 'recurrence_id' in valid_updates:
+            valid_updates['series_id'] = _series_key(conn, valid_updates.pop('recurrence_id'), user_id, create=True)
+            previous_series_id = conn.execute("SELECT series_id FROM transactions WHERE id = ? AND user_id = ?", (transaction_id, user_id)).fetchone()
+            previous_series_id = previous_series_id[0] if previous_series_id else None
+        if 'transfer_id' in valid_updates:
+            valid_updates['transfer_ref_id'] = _transfer_key(conn, valid_updates.pop('transfer_id'), user_id, create=True)
 
         set_clause = ", ".join([f"{key} = ?" for key in valid_updates.keys()])
         params = list(valid_updates.values())
@@ -197,18 +405,11 @@ def update_transaction(transaction_id: int, user_id: int, updates: dict):
         
         query = f"UPDATE transactions SET {set_clause} WHERE id = ? AND user_id = ?"
         conn.execute(query, params)
+        if previous_series_id is not None and previous_series_id != valid_updates['series_id']:
+            _delete_empty_series(conn, previous_series_id)
         conn.commit()
     return True
 
-def count_confirmed_transactions_in_series(recurrence_id: str, user_id: int):
-    """Counts the number of 'confirmed' transactions in a given recurrence series."""
-    with get_db_connection() as conn:
-        count = conn.execute(
-            "SELECT COUNT(id) FROM transactions WHERE recurrence_id = ? AND user_id = ? AND status = 'confirmed'",
-            (recurrence_id, user_id)
-        ).fetchone()[0]
-        return count
-    
 def delete_transaction_by_id(transaction_id: int, user_id: int):
     """Deletes a single transaction by its ID, without affecting related transactions."""
     with get_db_connection() as conn:
@@ -216,167 +417,384 @@ def delete_transaction_by_id(transaction_id: int, user_id: int):
         conn.commit()
 
 def delete_entire_series(recurrence_id: str, user_id: int):
-    """Deletes all transactions (confirmed and pending) in a recurrence series."""
+    """Deletes all transactions (confirmed and pending) in a recurrence series, and the series itself."""
     with get_db_connection() as conn:
-        conn.execute("DELETE FROM transactions WHERE recurrence_id = ? AND user_id = ?", (recurrence_id, user_id))
+        series_key = _series_key(conn, recurrence_id, user_id)
+        if series_key is not None:
+            conn.execute("DELETE FROM transactions WHERE series_id = ? AND user_id = ?", (series_key, user_id))
+            conn.execute("DELETE FROM recurrence_series WHERE id = ?", (series_key,))
         conn.commit()
 
 def delete_entire_transfer(transfer_id: str, user_id: int):
-    """Deletes both sides of a transfer."""
+    """Deletes both sides of a transfer, and the transfer itself."""
     with get_db_connection() as conn:
-        conn.execute("DELETE FROM transactions WHERE transfer_id = ? AND user_id = ?", (transfer_id, user_id))
+        transfer_key = _transfer_key(conn, transfer_id, user_id)
+        if transfer_key is not None:
+            conn.execute("DELETE FROM transactions WHERE transfer_ref_id = ? AND user_id = ?", (transfer_key, user_id))
+            conn.execute("DELETE FROM transfers WHERE id = ?", (transfer_key,))
         conn.commit()
     
 def delete_pending_transactions_by_recurrence_id(recurrence_id: str, user_id: int):
-    """Deletes all 'pending' transactions belonging to a specific recurrence series."""
+    """Deletes all 'pending' transactions belonging to a specific recurrence series, and the rule that generates them."""
     with get_db_connection() as conn:
-        conn.execute(
-            "DELETE FROM transactions WHERE recurrence_id = ? AND user_id = ? AND status = 'pending'",
-            (recurrence_id, user_id)
-        )
+        series_key = _series_key(conn, recurrence_id, user_id)
+        if series_key is not None:
+            conn.execute("DELETE FROM transactions WHERE series_id = ? AND user_id = ? AND status = 'pending'", (series_key, user_id))
+            _drop_rules(conn, user_id, "id = ?", (series_key,))
         conn.commit()
 
-def get_all_transactions(
-    user_id, page=1, page_size=10, account_ids=None, category_ids=None, start_date=None, end_date=None, 
-    search_query=None, is_recurrent=None, amount_min=None, amount_max=None,
-    sort_by='date', sort_order='desc'
+# Amounts sort by their decimal value, which compares across currencies with different minor units.
+TRANSACTION_SORT_COLUMNS = {'date': 't.date', 'amount': migrations.decimal_amount_sql('t.amount', 't.currency')}
+
+def to_fts_query(search_query: str):
+    """
+    Turns free text into an FTS5 query that ANDs a prefix match for every word, e.g. 'gro sup' -> '"gro"* "sup"*'.
+    Returns None when the text has no searchable words.
+    """
+    tokens = re.findall(r"\w+", search_query, re.UNICODE)
+    return " ".join(f'"{token}"*' for token in tokens) if tokens else None
+
+def _build_transaction_filters(
+    user_id, account_ids=None, category_ids=None, start_date=None, end_date=None,
+    search_query=None, is_recurrent=None, amount_min=None, amount_max=None
 ):
-    with get_db_connection() as conn:
-        base_query = "FROM transactions t JOIN categories c ON t.category_id = c.id JOIN accounts a ON t.account_id = a.id"
-        where_clauses = ["t.user_id = ?", "t.status = 'confirmed'"]
-        params = [user_id]
-        
-        if account_ids:
-            placeholders = ','.join('?' for _ in account_ids)
-            where_clauses.append(f"t.account_id IN ({placeholders})")
-            params.extend(account_ids)
-        if category_ids:
-            placeholders = ','.join('?' for _ in category_ids)
-            where_clauses.append(f"t.category_id IN ({placeholders})")
-            params.extend(category_ids)
-        if start_date:
-            where_clauses.append("t.date >= ?")
-            params.append(start_date)
-        if end_date:
-            where_clauses.append("t.date <= ?")
-            params.append(end_date)
-        if search_query:
+    """Builds the WHERE clauses and parameters shared by the transaction list and its count."""
+    where_clauses = ["t.user_id = ?", "t.status = 'confirmed'"]
+    params = [user_id]
+
+    if account_ids:
+        placeholders = ','.join('?' for _ in account_ids)
+        where_clauses.append(f"t.account_id IN ({placeholders})")
+        params.extend(account_ids)
+    if category_ids:
+        placeholders = ','.join('?' for _ in category_ids)
+        where_clauses.append(f"t.category_id IN ({placeholders})")
+        params.extend(category_ids)
+    if start_date:
+        where_clauses.append("t.date >= ?")
+        params.append(start_date)
+    if end_date:
+        where_clauses.append("t.date <= ?")
+        params.append(end_date)
+    if search_query:
+        fts_query = to_fts_query(search_query)
+        if fts_query:
+            where_clauses.append("t.id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)")
+            params.append(fts_query)
+        else:
             where_clauses.append("t.description LIKE ?")
             params.append(f"%{search_query}%")
-        if is_recurrent is not None:
-            where_clauses.append("t.is_recurrent = ?")
-            params.append(is_recurrent)
-        if amount_min is not None:
-            where_clauses.append("t.amount >= ?")
-            params.append(amount_min)
-        if amount_max is not None:
-            where_clauses.append("t.amount <= ?")
-            params.append(amount_max)
-        
-        where_statement = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-        valid_sort_columns = {'date': 't.date', 'amount': 't.amount'}
-        sort_column = valid_sort_columns.get(sort_by, 't.date')
+    if is_recurrent is not None:
+        where_clauses.append("t.is_recurrent = ?")
+        params.append(is_recurrent)
+    # Bounds are decimal amounts; stored amounts are minor units of each row's currency.
+    if amount_min is not None:
+        where_clauses.append(f"t.amount >= ? * {_scale_sql('t.currency')}")
+        params.append(amount_min)
+    if amount_max is not None:
+        where_clauses.append(f"t.amount <= ? * {_scale_sql('t.currency')}")
+        params.append(amount_max)
+
+    return where_clauses, params
+
+def count_transactions(user_id, **filters):
+    """Counts the confirmed transactions matching the same filters as get_all_transactions."""
+    with get_read_connection() as conn:
+        where_clauses, params = _build_transaction_filters(user_id, **filters)
+        where_statement = "WHERE " + " AND ".join(where_clauses)
+        count_query = f"SELECT COUNT(t.id) FROM transactions t JOIN categories c ON t.category_id = c.id JOIN accounts a ON t.account_id = a.id {where_statement};"
+        return conn.execute(count_query, params).fetchone()[0]
+
+def get_all_transactions(
+    user_id, page=1, page_size=10, sort_by='date', sort_order='desc', after=None, **filters
+):
+    """
+    Fetches one page of confirmed transactions.
+    With `after` set to the (sort value, id) of the previous page's last row, the page is found by seeking the
+    index instead of skipping `(page - 1) * page_size` rows with OFFSET. Amounts sort by their decimal value.
+    sort_by='relevance' orders a search by its FTS5 rank (offset mode only).
+    """
+    with get_read_connection() as conn:
+        base_query = "FROM transactions t JOIN categories c ON t.category_id = c.id JOIN accounts a ON t.account_id = a.id"
+        where_clauses, params = _build_transaction_filters(user_id, **filters)
+
         order = 'DESC' if sort_order.lower() == 'desc' else 'ASC'
-        order_by_statement = f"ORDER BY {sort_column} {order}, t.id {order}"
-        
-        count_query = f"SELECT COUNT(t.id) {base_query} {where_statement};"
-        total_count = conn.execute(count_query, params).fetchone()[0]
-        
-        offset = (page - 1) * page_size
-        select_statement = "SELECT t.id, t.date, t.description, c.name as category_name, c.i18n_key as category_i18n_key, a.name as account, t.amount, t.currency, t.account_id, t.category_id, t.is_recurrent, t.transfer_id, t.status, t.recurrence_id"
-        paginated_query = f"{select_statement} {base_query} {where_statement} {order_by_statement} LIMIT ? OFFSET ?;"
-        paginated_params = params + [page_size, offset]
-        
-        df = pd.read_sql_query(paginated_query, conn, params=paginated_params)
-        
-        return df, total_count
+        fts_query = to_fts_query(filters['search_query']) if sort_by == 'relevance' and filters.get('search_query') else None
+        if fts_query and after is not None:
+            raise ValueError("Relevance ordering does not support cursor pagination; use page numbers.")
+        if fts_query:
+            # Join the match to read its bm25 rank; the IN filter above keeps the count query unchanged.
+            base_query += " JOIN (SELECT rowid, rank FROM transactions_fts WHERE transactions_fts MATCH ?) f ON f.rowid = t.id"
+            params.insert(0, fts_query)
+            order_by_statement = "ORDER BY f.rank, t.date DESC, t.id DESC"
+        else:
+            sort_column = TRANSACTION_SORT_COLUMNS.get(sort_by, 't.date')
+            order_by_statement = f"ORDER BY {sort_column} {order}, t.id {order}"
+
+        if after is not None:
+            comparison = '<' if order == 'DESC' else '>'
+            # The plain bound lets SQLite seek an expression index; the row value alone only filters it.
+            where_clauses.append(f"{sort_column} {comparison}= ? AND ({sort_column}, t.id) {comparison} (?, ?)")
+            params.extend([after[0], *after])
+
+        where_statement = "WHERE " + " AND ".join(where_clauses)
+        select_statement = "SELECT t.id, t.date, t.description, c.name, c.i18n_key, a.name, t.amount, t.currency, t.account_id, t.category_id, t.is_recurrent, tr.public_id, t.status, s.public_id"
+        base_query += _SERIES_AND_TRANSFER_JOINS
+
+        if after is not None:
+            paginated_query = f"{select_statement} {base_query} {where_statement} {order_by_statement} LIMIT ?;"
+            paginated_params = params + [page_size]
+        else:
+            offset = (page - 1) * page_size
+            paginated_query = f"{select_statement} {base_query} {where_statement} {order_by_statement} LIMIT ? OFFSET ?;"
+            paginated_params = params + [page_size, offset]
+
+        rows = conn.execute(paginated_query, paginated_params).fetchall()
+        # Build the response dicts, including the nested category, in a single pass over the row tuples.
+        return [
+            {
+                "id": r[0], "date": r[1], "description": r[2],
+                "category": {"name": r[3], "i18n_key": r[4]},
+                "account": r[5], "amount": money.to_major(r[6], r[7]), "currency": r[7], "account_id": r[8], "category_id": r[9],
+                "is_recurrent": r[10], "transfer_id": r[11], "status": r[12], "recurrence_id": r[13],
+            }
+            for r in rows
+        ]
     
 def get_transaction_by_id(transaction_id: int, user_id: int):
     """Fetches a single transaction by its ID."""
-    with get_db_connection() as conn:
-        transaction = conn.execute("SELECT * FROM transactions WHERE id = ? AND user_id = ?", (transaction_id, user_id)).fetchone()
-        return dict(transaction) if transaction else None
+    with get_read_connection() as conn:
+        transaction = conn.execute(
+            f"{_TRANSACTION_SELECT} FROM transactions t {_SERIES_AND_TRANSFER_JOINS} WHERE t.id = ? AND t.user_id = ?", (transaction_id, user_id)
+        ).fetchone()
+        return _to_major(dict(transaction)) if transaction else None
     
 def get_master_recurrent_transactions(user_id: int):
     """Fetches the first 'confirmed' transaction for each recurrence series, including category details."""
-    with get_db_connection() as conn:
-        query = """
-            SELECT 
-                t.*,
+    with get_read_connection() as conn:
+        # master_id is kept on the series row by triggers, so no GROUP BY over the series' transactions.
+        query = f"""
+            {_TRANSACTION_SELECT},
                 c.name as category_name,
                 c.i18n_key as category_i18n_key
-            FROM transactions t
+            FROM recurrence_series m
+            JOIN transactions t ON t.id = m.master_id
             JOIN categories c ON t.category_id = c.id
-            INNER JOIN (
-                SELECT recurrence_id, MIN(id) as min_id
-                FROM transactions
-                WHERE recurrence_id IS NOT NULL AND user_id = ? AND status = 'confirmed'
-                GROUP BY recurrence_id
-            ) AS m ON t.recurrence_id = m.recurrence_id AND t.id = m.min_id
-            WHERE t.user_id = ?
+            {_SERIES_AND_TRANSFER_JOINS}
+            WHERE m.user_id = ? AND t.user_id = ?
             ORDER BY t.date DESC
         """
         masters = conn.execute(query, (user_id, user_id)).fetchall()
-        return [dict(row) for row in masters]
+        return [_to_major(dict(row)) for row in masters]
     
 def get_pending_transactions_by_recurrence_id(recurrence_id: str, user_id: int):
     """Fetches all 'pending' transactions for a specific recurrence series, ordered by date."""
-    with get_db_connection() as conn:
-        query = "SELECT * FROM transactions WHERE recurrence_id = ? AND user_id = ? AND status = 'pending' ORDER BY date ASC"
+    with get_read_connection() as conn:
+        query = f"""
+            {_TRANSACTION_SELECT} FROM transactions t {_SERIES_AND_TRANSFER_JOINS}
+            WHERE s.public_id = ? AND t.user_id = ? AND t.status = 'pending' ORDER BY t.date ASC
+        """
         pending_txs = conn.execute(query, (recurrence_id, user_id)).fetchall()
-        return [dict(row) for row in pending_txs]
+        return [_to_major(dict(row)) for row in pending_txs]
     
 def count_confirmed_transactions_in_series(recurrence_id: str, user_id: int):
-    """Counts the number of 'confirmed' transactions in a given recurrence series."""
-    with get_db_connection() as conn:
-        count = conn.execute(
-            "SELECT COUNT(id) FROM transactions WHERE recurrence_id = ? AND user_id = ? AND status = 'confirmed'",
-            (recurrence_id, user_id)
-        ).fetchone()[0]
-        return count
+    """Returns the number of 'confirmed' transactions in a recurrence series, kept on the series row by triggers."""
+    with get_read_connection() as conn:
+        row = conn.execute(
+            "SELECT confirmed_count FROM recurrence_series WHERE public_id = ? AND user_id = ?", (recurrence_id, user_id)
+        ).fetchone()
+        return row[0] if row else 0
     
+def get_pending_transactions(user_id: int, until_date: str):
+    """Fetches all 'pending' transactions dated on or before until_date, ordered by date."""
+    with get_read_connection() as conn:
+        query = f"""
+            {_TRANSACTION_SELECT} FROM transactions t {_SERIES_AND_TRANSFER_JOINS}
+            WHERE t.user_id = ? AND t.status = 'pending' AND t.date <= ? ORDER BY t.date ASC
+        """
+        return [_to_major(dict(row)) for row in conn.execute(query, (user_id, until_date)).fetchall()]
+
 def get_due_pending_transactions(user_id: int):
     """Fetches all 'pending' transactions with a date on or before today, including category details."""
-    with get_db_connection() as conn:
-        query = """
-            SELECT t.*, c.name as category_name, c.i18n_key as category_i18n_key
+    with get_read_connection() as conn:
+        query = f"""
+            {_TRANSACTION_SELECT}, c.name as category_name, c.i18n_key as category_i18n_key
             FROM transactions t
             JOIN categories c ON t.category_id = c.id
+            {_SERIES_AND_TRANSFER_JOINS}
             WHERE t.user_id = ? AND t.status = 'pending' AND t.date <= date('now', 'localtime')
             ORDER BY t.date ASC
         """
         transactions = conn.execute(query, (user_id,)).fetchall()
-        return [dict(row) for row in transactions]
+        return [_to_major(dict(row)) for row in transactions]
+
+
+# --- Recurrence Rules ------------------------------------------------------------------------------------------------------
+# The rule part of a recurrence_series row; all NULL for a series without a rule.
+_RULE_COLUMNS = (
+    'start_date', 'recurrence_num', 'recurrence_unit', 'end_date', 'description', 'amount', 'currency',
+    'account_id', 'category_id', 'next_step', 'materialized_until',
+)
+_RULE_SELECT = f"SELECT id as series_id, public_id as recurrence_id, user_id, master_id, {', '.join(_RULE_COLUMNS)} FROM recurrence_series"
+
+def _drop_rules(conn, user_id: int, condition: str, params: tuple):
+    """Clears the rule of the user's series matching condition, and deletes the series left without any transaction."""
+    conn.execute(
+        f"UPDATE recurrence_series SET {', '.join(f'{c} = NULL' for c in _RULE_COLUMNS)} WHERE user_id = ? AND {condition}",
+        (user_id, *params)
+    )
+    conn.execute(
+        "DELETE FROM recurrence_series WHERE user_id = ? AND recurrence_unit IS NULL AND confirmed_count = 0 AND pending_count = 0",
+        (user_id,)
+    )
+
+def _delete_empty_series(conn, series_id: int):
+    """Deletes a series left without a rule or any transaction, e.g. after its master moved to another series."""
+    conn.execute(
+        "DELETE FROM recurrence_series WHERE id = ? AND recurrence_unit IS NULL AND confirmed_count = 0 AND pending_count = 0",
+        (series_id,)
+    )
+
+_PENDING_INSERT = """INSERT INTO transactions
+    (date, description, amount, currency, is_recurrent, account_id, category_id, user_id, series_id, status)
+    VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, 'pending')"""
+
+def _pending_rows(rule: dict, user_id: int, occurrence_dates: list):
+    return [
+        (d, rule['description'], money.to_minor(rule['amount'], rule['currency']), rule['currency'], rule['account_id'], rule['category_id'], user_id, rule['series_id'])
+        for d in occurrence_dates
+    ]
+
+def create_recurrence_series(master_tx: dict, user_id: int, rule: dict, occurrence_dates: list, next_step: int, materialized_until: str):
+    """
+    Stores the series rule, links the master to it and inserts the pending occurrences inside the
+    materialization window with a single executemany, all in one transaction. The series the master leaves has
+    its rule dropped, and is deleted when that leaves it empty. Returns the number of rows inserted.
+    """
+    rule = {
+        **rule,
+        "description": master_tx.get('description'), "amount": master_tx.get('amount'), "currency": master_tx.get('currency'),
+        "account_id": master_tx.get('account_id'), "category_id": master_tx.get('category_id'),
+    }
+    with get_db_connection() as conn:
+        try:
+            rule['series_id'] = conn.execute(
+                f"""INSERT INTO recurrence_series (public_id, user_id, {', '.join(_RULE_COLUMNS)})
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (rule['recurrence_id'], user_id, master_tx['date'], rule['recurrence_num'], rule['recurrence_unit'], rule['end_date'],
+                 rule['description'], money.to_minor(rule['amount'], rule['currency']), rule['currency'], rule['account_id'], rule['category_id'], next_step, materialized_until)
+            ).lastrowid
+            previous_series_id = conn.execute("SELECT series_id FROM transactions WHERE id = ? AND user_id = ?", (master_tx['id'], user_id)).fetchone()
+            # Moving the master into the series sets the series' master_id and counts through the triggers.
+            conn.execute("UPDATE transactions SET series_id = ? WHERE id = ? AND user_id = ?", (rule['series_id'], master_tx['id'], user_id))
+            if previous_series_id and previous_series_id[0] is not None:
+                _drop_rules(conn, user_id, "id = ?", (previous_series_id[0],))
+            rows = _pending_rows(rule, user_id, occurrence_dates)
+            conn.executemany(_PENDING_INSERT, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(rows)
+
+def get_recurrence_rules(user_id: int, recurrence_id: str | None = None):
+    """Fetches the user's recurrence rules, optionally only one series."""
+    with get_read_connection() as conn:
+        query = f"{_RULE_SELECT} WHERE user_id = ? AND recurrence_unit IS NOT NULL"
+        params = [user_id]
+        if recurrence_id:
+            query += " AND public_id = ?"
+            params.append(recurrence_id)
+        return [_to_major(dict(row)) for row in conn.execute(query, params).fetchall()]
+
+def get_recurrence_rules_to_materialize(user_id: int, until_date: str, recurrence_id: str | None = None):
+    """Fetches the rules whose materialized window ends before until_date and that have occurrences left."""
+    with get_read_connection() as conn:
+        query = f"""
+            {_RULE_SELECT}
+            WHERE user_id = ? AND recurrence_unit IS NOT NULL AND materialized_until < ? AND (end_date IS NULL OR materialized_until < end_date)
+        """
+        params = [user_id, until_date]
+        if recurrence_id:
+            query += " AND public_id = ?"
+            params.append(recurrence_id)
+        return [_to_major(dict(row)) for row in conn.execute(query, params).fetchall()]
+
+def materialize_recurrence_occurrences(rule: dict, user_id: int, occurrence_dates: list, next_step: int, materialized_until: str):
+    """
+    Extends a rule's materialized window and inserts the new pending rows in one transaction.
+    The update only applies if nobody else advanced the rule meanwhile, so concurrent top-ups never duplicate rows.
+    """
+    with get_db_connection() as conn:
+        try:
+            cursor = conn.execute(
+                "UPDATE recurrence_series SET next_step = ?, materialized_until = ? WHERE id = ? AND user_id = ? AND next_step = ?",
+                (next_step, materialized_until, rule['series_id'], user_id, rule['next_step'])
+            )
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return 0
+            conn.executemany(_PENDING_INSERT, _pending_rows(rule, user_id, occurrence_dates))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(occurrence_dates)
 
 
 # --- Transfer ------------------------------------------------------------------------------------------------------    
-def get_transfer(transfer_id: str, user_id: int):
+# Both legs of a transfer, read through the transfers row.
+_TRANSFER_LEGS = """
+    SELECT e.id as expense_id, e.account_id as from_account_id, i.id as income_id, i.account_id as to_account_id,
+           i.date, i.amount, i.currency
+    FROM transfers tr
+    JOIN transactions e ON e.id = tr.expense_id
+    JOIN transactions i ON i.id = tr.income_id
+    WHERE tr.public_id = ? AND tr.user_id = ?
+"""
+
+def create_transfer(transfer_id: str, date, description: str, amount: float, currency: str, from_account_id: int, to_account_id: int, category_id: int, user_id: int):
+    """Stores a transfer under the public id transfer_id together with its expense and income legs, in one transaction."""
     with get_db_connection() as conn:
-        transfer_rows = conn.execute("SELECT * FROM transactions WHERE transfer_id = ? AND user_id = ? ORDER BY amount DESC", (transfer_id, user_id)).fetchall()
-        
-        
-        if len(transfer_rows) != 2:
+        try:
+            transfer_key = _transfer_key(conn, transfer_id, user_id, create=True)
+            amount = money.to_minor(abs(amount), currency)
+            leg_ids = [
+                conn.execute(
+                    """INSERT INTO transactions (date, description, amount, currency, is_recurrent, account_id, category_id, user_id, transfer_ref_id)
+                       VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?)""",
+                    (date, description, leg_amount, currency, account_id, category_id, user_id, transfer_key)
+                ).lastrowid
+                for leg_amount, account_id in ((-amount, from_account_id), (amount, to_account_id))
+            ]
+            conn.execute("UPDATE transfers SET expense_id = ?, income_id = ? WHERE id = ?", (*leg_ids, transfer_key))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return transfer_id
+
+def get_transfer(transfer_id: str, user_id: int):
+    with get_read_connection() as conn:
+        legs = conn.execute(_TRANSFER_LEGS, (transfer_id, user_id)).fetchone()
+        if legs is None:
             return None
-            
-        income_tx = dict(transfer_rows[0])
-        expense_tx = dict(transfer_rows[1])
-        
         return {
             "transfer_id": transfer_id,
-            "date": income_tx['date'],
-            "amount": income_tx['amount'],
-            "from_account_id": expense_tx['account_id'],
-            "to_account_id": income_tx['account_id'],
+            "date": legs['date'],
+            "amount": money.to_major(legs['amount'], legs['currency']),
+            "from_account_id": legs['from_account_id'],
+            "to_account_id": legs['to_account_id'],
         }
 
 def update_transfer(transfer_id: str, date, amount: float, from_account_id: int, to_account_id: int, user_id: int):
     with get_db_connection() as conn:
-        transactions = conn.execute("SELECT id, amount FROM transactions WHERE transfer_id = ? AND user_id = ?", (transfer_id, user_id)).fetchall()
-        if len(transactions) != 2:
+        legs = conn.execute(_TRANSFER_LEGS, (transfer_id, user_id)).fetchone()
+        if legs is None:
             raise ValueError("Transfer not found or is inconsistent.")
-            
-        expense_tx_id = next(tx['id'] for tx in transactions if tx['amount'] < 0)
-        income_tx_id = next(tx['id'] for tx in transactions if tx['amount'] > 0)
+
+        expense_tx_id, income_tx_id = legs['expense_id'], legs['income_id']
+        amount = money.to_minor(abs(amount), legs['currency'])
 
         # Update the expense transaction
         conn.execute("UPDATE transactions SET date = ?, amount = ?, account_id = ? WHERE id = ?",
@@ -393,7 +811,6 @@ def process_batch_instructions(instructions: list, user_id: int):
     with get_db_connection() as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute("BEGIN TRANSACTION;")
             processed_ids = []
             for instruction in instructions:
                 action = instruction.get('action')
@@ -408,94 +825,315 @@ def process_batch_instructions(instructions: list, user_id: int):
                     )
                 processed_ids.append(tx_id)
             conn.commit()
-        except Exception as e:
+        except Exception:
             conn.rollback()
-            raise e
-        finally:
-            return {"status": "success", "processed_ids": processed_ids}
+            raise
+        return {"status": "success", "processed_ids": processed_ids}
+
+
+# --- Import ------------------------------------------------------------------------------------------------------
+# amount_base is computed in the statement itself, which saves the fill trigger's second write per row.
+_IMPORT_INSERT = f"""
+    INSERT INTO transactions (user_id, date, description, amount, currency, account_id, category_id, is_recurrent, status, amount_base)
+    VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, 0, 'confirmed', {migrations.base_amount_sql('?4', '?5', '?2')})
+"""
+
+def transaction_content_hash(date: str, description: str, amount: int, currency: str, account_id: int):
+    """
+    Identifies a transaction by its content, so re-importing the same statement does not duplicate rows.
+    amount is the stored integer of minor units.
+    """
+    key = f"{date}|{' '.join(description.split()).casefold()}|{amount}|{currency}|{account_id}"
+    return hashlib.sha1(key.encode()).digest()
+
+def get_last_transaction_id():
+    """The highest transaction id yet assigned. Ids are AUTOINCREMENT, so every row inserted later has a higher one."""
+    with get_read_connection() as conn:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+
+def import_transaction_rows(user_id: int, rows: list, last_existing_id: int):
+    """
+    Inserts validated (date, description, amount, currency, account_id, category_id) rows as confirmed
+    transactions with one executemany in one transaction. Rows whose content hash matches a confirmed
+    transaction that existed before the import, i.e. with an id up to last_existing_id, are skipped; rows
+    repeated within the file, or inserted by earlier chunks, are genuine repeats and kept. Existing rows are
+    only hashed when they share a date and amount with an incoming row. CROSS JOIN makes SQLite drive the lookup
+    from the temp table of those keys, and the unary + on date steers it to the more selective amount index.
+    Returns (inserted, duplicates).
+    """
+    rows = [(d, description, money.to_minor(amount, currency), currency, account_id, category_id)
+            for d, description, amount, currency, account_id, category_id in rows]
+    with get_db_connection() as conn:
+        try:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS import_keys (date TEXT NOT NULL, amount INTEGER NOT NULL, PRIMARY KEY (date, amount)) WITHOUT ROWID")
+            conn.execute("DELETE FROM temp.import_keys")
+            conn.executemany("INSERT OR IGNORE INTO temp.import_keys (date, amount) VALUES (?, ?)", ((row[0], row[2]) for row in rows))
+            existing = conn.execute(
+                """SELECT t.date, t.description, t.amount, t.currency, t.account_id
+                   FROM temp.import_keys k
+                   CROSS JOIN transactions t ON t.user_id = ? AND t.status = 'confirmed' AND t.amount = k.amount AND +t.date = k.date
+                   WHERE t.id <= ?""",
+                (user_id, last_existing_id)
+            )
+            seen = {transaction_content_hash(*row) for row in existing}
+            new_rows = [(user_id, *row) for row in rows if transaction_content_hash(*row[:5]) not in seen]
+            conn.executemany(_IMPORT_INSERT, new_rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(new_rows), len(rows) - len(new_rows)
+
+
+# --- Export ------------------------------------------------------------------------------------------------------
+EXPORT_TRANSACTION_COLUMNS = (
+    "id", "date", "description", "amount", "currency", "account", "account_id",
+    "category", "category_i18n_key", "category_id", "is_recurrent", "status", "recurrence_id", "transfer_id",
+)
+
+def iter_transactions(user_id, sort_by='date', sort_order='desc', batch_size=1000, **filters):
+    """
+    Yields the confirmed transactions matching the list filters as batches of tuples in EXPORT_TRANSACTION_COLUMNS
+    order. Rows are pulled from one server-side cursor with fetchmany on a dedicated connection, so the result
+    set is never held in memory and one statement gives a consistent snapshot however long the export takes.
+    """
+    where_clauses, params = _build_transaction_filters(user_id, **filters)
+    sort_column = TRANSACTION_SORT_COLUMNS.get(sort_by, 't.date')
+    order = 'DESC' if sort_order.lower() == 'desc' else 'ASC'
+    query = f"""
+        SELECT t.id, t.date, t.description, t.amount * 1.0 / {_scale_sql('t.currency')}, t.currency, a.name, t.account_id,
+               c.name, c.i18n_key, t.category_id, t.is_recurrent, t.status, s.public_id, tr.public_id
+        FROM transactions t JOIN categories c ON t.category_id = c.id JOIN accounts a ON t.account_id = a.id
+        {_SERIES_AND_TRANSFER_JOINS}
+        WHERE {" AND ".join(where_clauses)}
+        ORDER BY {sort_column} {order}, t.id {order}
+    """
+    with get_pool().dedicated_reader() as conn:
+        conn.row_factory = None
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
 
 
 # --- Reports & Charts ------------------------------------------------------------------------------------------------------
+def _account_balances(conn, user_id, today: str, divisor: float):
+    """Per-account balances from account_balances, each currency converted at its latest rate."""
+    query = f"""
+    SELECT
+        a.name,
+        COALESCE(SUM(
+            {migrations.base_amount_sql('b.balance', 'b.currency', '?')}
+        ), 0) / ? as balance
+    FROM accounts a
+    LEFT JOIN account_balances b ON a.id = b.account_id AND b.user_id = a.user_id
+    WHERE a.user_id = ?
+    GROUP BY a.name
+    ORDER BY a.name;
+    """
+    return _fetch_dicts(conn, query, [today, divisor, user_id])
+
 def get_balance_report(user_id):
+    """
+    Reads the trigger-maintained account_balances rows instead of aggregating every transaction.
+    Returns (balances, total balance, currency), in the user's preferred currency at today's rates.
+    """
+    with get_read_connection() as conn:
+        today = str(date_type.today())
+        currency, divisor = _report_currency(conn, user_id, today)
+        balances = _account_balances(conn, user_id, today, divisor)
+        total_balance = round(sum(row['balance'] for row in balances), money.minor_units(currency))
+        return balances, total_balance, currency
+
+def check_account_balances(user_id: int | None = None, fix: bool = False):
+    """
+    Recomputes every account balance from the confirmed transactions and compares it with account_balances.
+    Balances are integers of minor units, so any difference is drift. Returns the rows that drifted, with
+    decimal balances. With fix=True the stored balances are replaced by the recomputed ones.
+    """
+    user_filter = "AND user_id = ?" if user_id is not None else ""
+    params = [user_id] if user_id is not None else []
+    query = f"""
+        WITH expected AS (
+            SELECT user_id, account_id, currency, SUM(amount) as balance FROM transactions
+            WHERE status = 'confirmed' {user_filter} GROUP BY user_id, account_id, currency
+        ),
+        stored AS (
+            SELECT user_id, account_id, currency, balance FROM account_balances WHERE 1 = 1 {user_filter}
+        ),
+        keys AS (
+            SELECT user_id, account_id, currency FROM expected UNION SELECT user_id, account_id, currency FROM stored
+        )
+        SELECT k.user_id, k.account_id, k.currency, COALESCE(s.balance, 0) as stored_balance, COALESCE(e.balance, 0) as expected_balance
+        FROM keys k
+        LEFT JOIN expected e ON e.user_id = k.user_id AND e.account_id = k.account_id AND e.currency = k.currency
+        LEFT JOIN stored s ON s.user_id = k.user_id AND s.account_id = k.account_id AND s.currency = k.currency
+    """
     with get_db_connection() as conn:
+        rows = _fetch_dicts(conn, query, params + params)
+        drift = [r for r in rows if r['stored_balance'] != r['expected_balance']]
+        if fix and drift:
+            try:
+                conn.execute(f"DELETE FROM account_balances WHERE 1 = 1 {user_filter}", params)
+                conn.execute(
+                    f"""INSERT INTO account_balances (user_id, account_id, currency, balance)
+                        SELECT user_id, account_id, currency, SUM(amount) FROM transactions
+                        WHERE status = 'confirmed' {user_filter} GROUP BY user_id, account_id, currency""",
+                    params
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        for r in drift:
+            r['stored_balance'] = money.to_major(r['stored_balance'], r['currency'])
+            r['expected_balance'] = money.to_major(r['expected_balance'], r['currency'])
+        return drift
+
+def _opening_balance(conn, user_id, before_date: str):
+    """Base-currency balance of everything dated before before_date: monthly checkpoints plus the current month's tail."""
+    query = """
+        SELECT COALESCE(SUM(amount), 0) FROM (
+            SELECT change_base as amount FROM balance_checkpoints WHERE user_id = ? AND month < substr(?, 1, 7)
+            UNION ALL
+            SELECT amount_base FROM transactions
+            WHERE user_id = ? AND status = 'confirmed' AND date >= substr(?, 1, 7) || '-01' AND date < ?
+        )
+    """
+    return conn.execute(query, (user_id, before_date, user_id, before_date, before_date)).fetchone()[0]
+
+def get_balance_evolution_report(user_id, start_date: str | None = None, end_date: str | None = None, granularity: str = 'day'):
+    """
+    Cumulative balance per day (or per month end with granularity='month'), summed from the stored base-currency
+    amounts and converted into the user's preferred currency at today's rate.
+    With a start_date the opening balance comes from the checkpoints, so only transactions inside the range are read.
+    The monthly view is served from the checkpoints alone, so it opens on the first day of the start month: the
+    start month's checkpoint already holds the days before start_date.
+    """
+    with get_read_connection() as conn:
+        # One read transaction so the opening balance and the range see the same snapshot.
+        conn.execute("BEGIN;")
+        _, divisor = _report_currency(conn, user_id)
+        if start_date and granularity == 'month':
+            start_date = start_date[:7] + '-01'
+        opening_balance = _opening_balance(conn, user_id, start_date) if start_date else 0.0
+
+        if granularity == 'month':
+            where_clauses, params = ["user_id = ?"], [user_id]
+            if start_date: where_clauses.append("month >= substr(?, 1, 7)"); params.append(start_date)
+            if end_date: where_clauses.append("month <= substr(?, 1, 7)"); params.append(end_date)
+            query = f"""
+            WITH monthly_changes AS (
+                SELECT month, SUM(change_base) as change FROM balance_checkpoints
+                WHERE {" AND ".join(where_clauses)} GROUP BY month
+            )
+            SELECT date(month || '-01', '+1 month', '-1 day') as date, (? + SUM(change) OVER (ORDER BY month)) / ? as cumulative_balance
+            FROM monthly_changes ORDER BY month;
+            """
+        else:
+            where_clauses, params = ["user_id = ?", "status = 'confirmed'"], [user_id]
+            if start_date: where_clauses.append("date >= ?"); params.append(start_date)
+            if end_date: where_clauses.append("date <= ?"); params.append(end_date)
+            query = f"""
+            WITH daily_changes AS (
+                SELECT date, SUM(amount_base) as change FROM transactions
+                WHERE {" AND ".join(where_clauses)} GROUP BY date
+            )
+            SELECT date, (? + SUM(change) OVER (ORDER BY date)) / ? as cumulative_balance FROM daily_changes ORDER BY date;
+            """
+        return _fetch_dicts(conn, query, params + [opening_balance, divisor])
+
+def check_balance_evolution(user_id, start_date: str | None = None, end_date: str | None = None):
+    """
+    Compares the monthly balance evolution with the daily one at every month end of the range: each month's value
+    must equal the last daily value on or before its month end. The monthly series starts on the first day of the
+    start month, so only month ends on or after start_date are compared. Returns the month ends that disagree.
+    """
+    daily = get_balance_evolution_report(user_id, start_date, end_date)
+    monthly = get_balance_evolution_report(user_id, start_date, end_date, granularity='month')
+    mismatches, index, balance = [], 0, None
+    for row in monthly:
+        while index < len(daily) and daily[index]['date'] <= row['date']:
+            balance = daily[index]['cumulative_balance']
+            index += 1
+        if balance is not None and (not start_date or row['date'] >= start_date) and abs(row['cumulative_balance'] - balance) > 0.005:
+            mismatches.append({"date": row['date'], "monthly_balance": row['cumulative_balance'], "daily_balance": balance})
+    return mismatches
+
+def get_balance_as_of(user_id, as_of_date: str):
+    """
+    Per-account balances at the end of as_of_date, from the monthly checkpoints plus that month's tail, each
+    currency converted at the rate effective on that date. Returns (balances, total balance, currency).
+    """
+    with get_read_connection() as conn:
+        conn.execute("BEGIN;")
+        currency, divisor = _report_currency(conn, user_id, as_of_date)
         query = f"""
-        SELECT
-            a.name,
-            COALESCE(SUM(
-                t.amount * CASE t.currency
-                    WHEN 'EUR' THEN {EXCHANGE_RATES['EUR']}
-                    WHEN 'USD' THEN {EXCHANGE_RATES['USD']}
-                    WHEN 'GBP' THEN {EXCHANGE_RATES['GBP']}
-                    ELSE 1.0
-                END
-            ), 0) as balance
+        WITH changes AS (
+            SELECT account_id, currency, change as amount FROM balance_checkpoints WHERE user_id = ? AND month < substr(?, 1, 7)
+            UNION ALL
+            SELECT account_id, currency, amount FROM transactions
+            WHERE user_id = ? AND status = 'confirmed' AND date >= substr(?, 1, 7) || '-01' AND date <= ?
+        ),
+        per_currency AS (
+            SELECT account_id, currency, SUM(amount) as amount FROM changes GROUP BY account_id, currency
+        )
+        SELECT a.name, COALESCE(SUM({migrations.base_amount_sql('pc.amount', 'pc.currency', '?')}), 0) / ? as balance
         FROM accounts a
-        LEFT JOIN transactions t ON a.id = t.account_id AND t.user_id = a.user_id AND t.status = 'confirmed'
+        LEFT JOIN per_currency pc ON pc.account_id = a.id
         WHERE a.user_id = ?
         GROUP BY a.name
         ORDER BY a.name;
         """
-        df = pd.read_sql_query(query, conn, params=[user_id])
-        total_balance = df['balance'].sum() if not df.empty else 0
-        return df, total_balance
-
-def get_balance_evolution_report(user_id):
-    with get_db_connection() as conn:
-        query = f"""
-        WITH daily_changes AS (
-            SELECT date, SUM(amount * CASE currency
-                WHEN 'EUR' THEN {EXCHANGE_RATES['EUR']} WHEN 'USD' THEN {EXCHANGE_RATES['USD']}
-                WHEN 'GBP' THEN {EXCHANGE_RATES['GBP']} ELSE 1.0 END
-            ) as change FROM transactions WHERE user_id = ? AND status = 'confirmed' GROUP BY date
-        )
-        SELECT date, SUM(change) OVER (ORDER BY date) as cumulative_balance FROM daily_changes ORDER BY date;
-        """
-        df = pd.read_sql_query(query, conn, params=[user_id])
-        return df
+        balances = _fetch_dicts(conn, query, [user_id, as_of_date, user_id, as_of_date, as_of_date, as_of_date, divisor, user_id])
+        total_balance = round(sum(row['balance'] for row in balances), money.minor_units(currency))
+        return balances, total_balance, currency
 
 def get_category_summary_for_chart(user_id, start_date: str, end_date: str, transaction_type: str = 'expense'):
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         base_query = """
-            SELECT c.name, c.i18n_key, SUM(t.amount) as total
+            SELECT c.name, c.i18n_key, SUM(t.amount_base) / ? as total
             FROM transactions t INNER JOIN categories c ON t.category_id = c.id
         """
         where_clauses = ["t.user_id = ?", "t.status = 'confirmed'"]
-        params = [user_id]
+        _, divisor = _report_currency(conn, user_id)
+        params = [divisor, user_id]
         
         if start_date: where_clauses.append("t.date >= ?"); params.append(start_date)
         if end_date: where_clauses.append("t.date <= ?"); params.append(end_date)
         
-        transfer_category_id = get_setting('transfer_category_id', user_id)
+        transfer_category_id = _get_setting(conn, 'transfer_category_id', user_id)
         if transfer_category_id:
             where_clauses.append("t.category_id != ?"); params.append(transfer_category_id)
 
-        if transaction_type == 'income': where_clauses.append("t.amount > 0")
-        elif transaction_type == 'expense': where_clauses.append("t.amount < 0")
+        if transaction_type == 'income': where_clauses.append("t.amount_base > 0")
+        elif transaction_type == 'expense': where_clauses.append("t.amount_base < 0")
 
         where_statement = "WHERE " + " AND ".join(where_clauses)
         group_by_statement = " GROUP BY c.name, c.i18n_key HAVING total != 0 ORDER BY ABS(total) DESC"
         
         final_query = base_query + where_statement + group_by_statement
-        df = pd.read_sql_query(final_query, conn, params=params)
-        
-        return df
+        return _fetch_dicts(conn, final_query, params)
 
 def get_monthly_income_expense_summary(user_id, start_date: str, end_date: str):
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         base_query = """
             SELECT
                 strftime('%Y-%m', t.date) as month,
-                SUM(CASE WHEN t.amount > 0 THEN t.amount ELSE 0 END) as income,
-                SUM(CASE WHEN t.amount < 0 THEN ABS(t.amount) ELSE 0 END) as expenses
+                SUM(CASE WHEN t.amount_base > 0 THEN t.amount_base ELSE 0 END) / ? as income,
+                SUM(CASE WHEN t.amount_base < 0 THEN ABS(t.amount_base) ELSE 0 END) / ? as expenses
             FROM transactions t
         """
         where_clauses = ["t.user_id = ?", "t.status = 'confirmed'"]
-        params = [user_id]
+        _, divisor = _report_currency(conn, user_id)
+        params = [divisor, divisor, user_id]
 
         if start_date: where_clauses.append("t.date >= ?"); params.append(start_date)
         if end_date: where_clauses.append("t.date <= ?"); params.append(end_date)
 
-        transfer_category_id = get_setting('transfer_category_id', user_id)
+        transfer_category_id = _get_setting(conn, 'transfer_category_id', user_id)
         if transfer_category_id:
             where_clauses.append("t.category_id != ?"); params.append(transfer_category_id)
             
@@ -504,25 +1142,24 @@ def get_monthly_income_expense_summary(user_id, start_date: str, end_date: str):
         group_by_statement = " GROUP BY strftime('%Y-%m', t.date) ORDER BY strftime('%Y-%m', t.date)"
         
         final_query = base_query + where_statement + group_by_statement
-        df = pd.read_sql_query(final_query, conn, params=params)
-        
-        return df
+        return _fetch_dicts(conn, final_query, params)
 
 def get_recurrent_summary(user_id, start_date: str, end_date: str):
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         base_query = """
             SELECT c.name as category,
-                SUM(CASE WHEN t.amount > 0 THEN t.amount ELSE 0 END) as income,
-                SUM(CASE WHEN t.amount < 0 THEN ABS(t.amount) ELSE 0 END) as expenses
+                SUM(CASE WHEN t.amount_base > 0 THEN t.amount_base ELSE 0 END) / ? as income,
+                SUM(CASE WHEN t.amount_base < 0 THEN ABS(t.amount_base) ELSE 0 END) / ? as expenses
             FROM transactions t INNER JOIN categories c ON t.category_id = c.id
         """
         where_clauses = ["t.is_recurrent = 1", "t.user_id = ?", "t.status = 'confirmed'"]
-        params = [user_id]
+        _, divisor = _report_currency(conn, user_id)
+        params = [divisor, divisor, user_id]
 
         if start_date: where_clauses.append("t.date >= ?"); params.append(start_date)
         if end_date: where_clauses.append("t.date <= ?"); params.append(end_date)
 
-        transfer_category_id = get_setting('transfer_category_id', user_id)
+        transfer_category_id = _get_setting(conn, 'transfer_category_id', user_id)
         if transfer_category_id:
             where_clauses.append("t.category_id != ?"); params.append(transfer_category_id)
 
@@ -530,6 +1167,121 @@ def get_recurrent_summary(user_id, start_date: str, end_date: str):
         group_by_statement = " GROUP BY c.name HAVING income > 0 OR expenses > 0 ORDER BY expenses DESC, income DESC"
 
         final_query = base_query + where_statement + group_by_statement
-        df = pd.read_sql_query(final_query, conn, params=params)
-        
-        return df
\ No newline at end of file
+        return _fetch_dicts(conn, final_query, params)
+
+def _dashboard_balance_evolution(daily_changes: dict, opening_balance: float, divisor: float, granularity: str):
+    evolution, balance = [], opening_balance
+    for day in sorted(daily_changes):
+        balance += daily_changes[day]
+        evolution.append({"date": day, "cumulative_balance": balance / divisor})
+    if granularity != 'month':
+        return evolution
+    # Keep the last day of each month, labelled with the month's end like the checkpoint-based monthly view.
+    month_ends = {}
+    for point in evolution:
+        month_ends[point["date"][:7]] = point["cumulative_balance"]
+    return [
+        {"date": _month_end(month), "cumulative_balance": balance}
+        for month, balance in month_ends.items()
+    ]
+
+def _month_end(month: str):
+    year, month_number = int(month[:4]), int(month[5:7])
+    return f"{month}-{calendar.monthrange(year, month_number)[1]:02d}"
+
+def get_dashboard_report(user_id, start_date: str, end_date: str, transaction_type: str = 'expense', granularity: str = 'day'):
+    """
+    Computes the balance, balance evolution, category, monthly income/expense and recurrent summaries in one go.
+    Everything is read in a single read transaction, so all sections see the same snapshot, and the range is
+    scanned once through the covering report index: base-currency amounts are grouped by day, category, recurrence
+    and sign, and every range section is aggregated from those groups. Amounts are in the user's preferred currency.
+    Returns the sections plus the time each one took in milliseconds.
+    """
+    timings = {}
+
+    def timed(section, started):
+        timings[section] = round((time.perf_counter() - started) * 1000, 3)
+
+    with get_read_connection() as conn:
+        conn.execute("BEGIN;")
+
+        started = time.perf_counter()
+        transfer_category_id = _get_setting(conn, 'transfer_category_id', user_id)
+        transfer_category_id = int(transfer_category_id) if transfer_category_id else None
+        today = str(date_type.today())
+        currency, divisor = _report_currency(conn, user_id, today)
+        categories = {row[0]: (row[1], row[2]) for row in conn.execute("SELECT id, name, i18n_key FROM categories WHERE user_id = ?", (user_id,))}
+        opening_balance = _opening_balance(conn, user_id, start_date)
+        timed("setup", started)
+
+        started = time.perf_counter()
+        balances = _account_balances(conn, user_id, today, divisor)
+        balance = {"balances_by_account": balances, "total_balance": round(sum(row['balance'] for row in balances), money.minor_units(currency))}
+        timed("balance", started)
+
+        started = time.perf_counter()
+        groups = conn.execute("""
+            SELECT date, category_id, is_recurrent, amount_base > 0, SUM(amount_base) FROM transactions
+            WHERE user_id = ? AND status = 'confirmed' AND date >= ? AND date <= ?
+            GROUP BY date, category_id, is_recurrent, amount_base > 0
+        """, (user_id, start_date, end_date)).fetchall()
+        timed("scan", started)
+
+    started = time.perf_counter()
+    daily_changes = {}
+    for day, _, _, _, total in groups:
+        daily_changes[day] = daily_changes.get(day, 0.0) + total
+    balance_evolution = _dashboard_balance_evolution(daily_changes, opening_balance, divisor, granularity)
+    timed("balance_evolution", started)
+
+    # The summaries below leave out transfers, like their SQL versions.
+    summary_groups = [g for g in groups if g[1] != transfer_category_id and g[1] in categories]
+
+    started = time.perf_counter()
+    category_totals = {}
+    for _, category_id, _, positive, total in summary_groups:
+        if total == 0 or (transaction_type == 'income' and not positive) or (transaction_type == 'expense' and positive):
+            continue
+        key = categories[category_id]
+        category_totals[key] = category_totals.get(key, 0.0) + total
+    category_summary = [
+        {"name": name, "i18n_key": i18n_key, "total": total / divisor}
+        for (name, i18n_key), total in sorted(category_totals.items(), key=lambda item: abs(item[1]), reverse=True)
+        if total != 0
+    ]
+    timed("category_summary", started)
+
+    started = time.perf_counter()
+    months = {}
+    for day, _, _, positive, total in summary_groups:
+        income, expenses = months.get(day[:7], (0, 0))
+        months[day[:7]] = (income + total, expenses) if positive else (income, expenses + abs(total))
+    monthly_income_expense = [
+        {"month": month, "income": income / divisor, "expenses": expenses / divisor}
+        for month, (income, expenses) in sorted(months.items())
+    ]
+    timed("monthly_income_expense", started)
+
+    started = time.perf_counter()
+    recurrent = {}
+    for _, category_id, is_recurrent, positive, total in summary_groups:
+        if not is_recurrent:
+            continue
+        name = categories[category_id][0]
+        income, expenses = recurrent.get(name, (0, 0))
+        recurrent[name] = (income + total, expenses) if positive else (income, expenses + abs(total))
+    recurrent_summary = sorted(
+        ({"category": name, "income": income / divisor, "expenses": expenses / divisor} for name, (income, expenses) in recurrent.items() if income > 0 or expenses > 0),
+        key=lambda row: (row["expenses"], row["income"]), reverse=True
+    )
+    timed("recurrent_summary", started)
+
+    return {
+        "currency": currency,
+        "balance": balance,
+        "balance_evolution": balance_evolution,
+        "category_summary": category_summary,
+        "monthly_income_expense": monthly_income_expense,
+        "recurrent_summary": recurrent_summary,
+        "timings_ms": timings,
+    }
@@ -0,0 +1,336 @@
+# app/db.py
+import sys
+import json
+import sqlite3
+import threading
+import time
+import queue
+import logging
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from . import metrics
+from .config import (
+    DB_PATH, DB_READER_POOL_SIZE, DB_BUSY_TIMEOUT, DB_MMAP_SIZE, DB_CACHE_SIZE_KB,
+    SQL_METRICS, SLOW_QUERY_MS, SLOW_QUERY_LOG, SLOW_QUERY_KEEP,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+# --- SQL instrumentation ---
+_slow_queries = deque(maxlen=SLOW_QUERY_KEEP)
+_slow_query_lock = threading.Lock()
+
+# Code object -> (name, attributable), worked out once per function; name is None for the instrumentation itself.
+_code_names = {}
+
+def _describe(frame):
+    module, qualname = frame.f_globals.get("__name__", ""), frame.f_code.co_qualname
+    if module == __name__ and qualname.startswith("Instrumented"):
+        return None, False
+    public = not any(part[0] in "_<" for part in qualname.split("."))
+    return f"{module.removeprefix('app.')}.{qualname}", module.startswith("app.") and public
+
+def _caller():
+    """
+    Names the function a statement is attributed to: the innermost public function of the app outside the
+    instrumented classes (so crud helpers like _fetch_dicts count towards the crud function calling them), else
+    the innermost function outside them.
+    """
+    frame = sys._getframe(1)
+    fallback = None
+    while frame is not None:
+        described = _code_names.get(frame.f_code)
+        if described is None:
+            described = _code_names[frame.f_code] = _describe(frame)
+        name, attributable = described
+        if attributable:
+            return name
+        if fallback is None:
+            fallback = name
+        frame = frame.f_back
+    return fallback or "unknown"
+
+def _log_slow_query(conn, sql: str, parameters, caller: str, elapsed: float):
+    """Records a slow statement with its EXPLAIN QUERY PLAN, run on the same connection with the same parameters."""
+    plan = None
+    if parameters is not None:
+        try:
+            plan = [row[3] for row in sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", parameters)]
+        except sqlite3.Error:
+            pass
+    entry = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "function": caller,
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "sql": " ".join(sql.split()),
+        "plan": plan,
+    }
+    metrics.SQL_SLOW.inc(caller)
+    with _slow_query_lock:
+        _slow_queries.append(entry)
+        if SLOW_QUERY_LOG:
+            with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            return
+    logger.warning("Slow query (%s ms) in %s: %s", entry['elapsed_ms'], caller, entry['sql'], extra={"plan": plan})
+
+def get_slow_queries():
+    """The most recent slow statements of this process, newest first."""
+    with _slow_query_lock:
+        return list(reversed(_slow_queries))
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    A cursor that times its statements, fetches included, and records each one in metrics once it is done:
+    when its rows run out, the cursor runs another statement or is closed or collected.
+    """
+    _statement = None
+    _elapsed = 0.0
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        except sqlite3.Error:
+            metrics.SQL_ERRORS.inc(self._statement[2] if self._statement else _caller())
+            self._statement = None
+            raise
+        finally:
+            self._elapsed += time.perf_counter() - started
+
+    def _start(self, sql, parameters):
+        self._record()
+        self._statement = (sql, parameters, _caller())
+        self._elapsed = 0.0
+
+    def _record(self):
+        statement, elapsed = self._statement, self._elapsed
+        if statement is None:
+            return
+        self._statement = None
+        self._elapsed = 0.0
+        sql, parameters, caller = statement
+        metrics.SQL_DURATION.observe(elapsed, caller)
+        if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+            _log_slow_query(self.connection, sql, parameters, caller, elapsed)
+
+    def execute(self, sql, parameters=(), /):
+        self._start(sql, parameters)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, parameters, /):
+        # The parameters may be a generator, already consumed by the time a plan could be asked for.
+        self._start(sql, None)
+        result = self._timed(super().executemany, sql, parameters)
+        self._record()
+        return result
+
+    def executescript(self, sql_script, /):
+        self._start(sql_script, None)
+        result = self._timed(super().executescript, sql_script)
+        self._record()
+        return result
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._record()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        if len(rows) < size:
+            self._record()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._record()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._timed(super().__next__)
+        except StopIteration:
+            self._record()
+            raise
+
+    def close(self):
+        self._record()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._record()
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """A connection whose cursors, including those of its execute shortcuts, are InstrumentedCursors."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters, /):
+        return self.cursor().executemany(sql, parameters)
+
+    def executescript(self, sql_script, /):
+        return self.cursor().executescript(sql_script)
+
+
+def _configure_connection(conn: sqlite3.Connection, read_only: bool):
+    """Applies the per-connection PRAGMAs every pooled connection shares."""
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE};")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB};")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    if read_only:
+        conn.execute("PRAGMA query_only = 1;")
+
+
+class ConnectionPool:
+    """
+    A fixed set of reader connections plus a single writer connection, opened once.
+    The database runs in WAL mode, so readers never block the writer and vice versa.
+    """
+
+    def __init__(self, db_path: str, reader_count: int = 4, timeout: float = 10.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "reader": {"checkouts": 0, "in_use": 0, "waits": 0, "wait_time_total": 0.0, "wait_time_max": 0.0},
+            "writer": {"checkouts": 0, "in_use": 0, "waits": 0, "wait_time_total": 0.0, "wait_time_max": 0.0},
+        }
+
+        # The writer is opened first so that WAL mode is set before any reader attaches.
+        self._writer = self._connect(read_only=False)
+        self._writer.execute("PRAGMA journal_mode = WAL;")
+        self._writer_lock = threading.Lock()
+
+        self._readers = queue.LifoQueue()
+        self._reader_count = reader_count
+        for _ in range(reader_count):
+            self._readers.put(self._connect(read_only=True))
+
+    def _connect(self, read_only: bool):
+        factory = InstrumentedConnection if SQL_METRICS else sqlite3.Connection
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False, factory=factory)
+        _configure_connection(conn, read_only)
+        return conn
+
+    def _record_checkout(self, kind: str, waited: float, contended: bool):
+        with self._stats_lock:
+            s = self._stats[kind]
+            s["checkouts"] += 1
+            s["in_use"] += 1
+            if contended:
+                s["waits"] += 1
+            s["wait_time_total"] += waited
+            s["wait_time_max"] = max(s["wait_time_max"], waited)
+
+    def _record_checkin(self, kind: str):
+        with self._stats_lock:
+            self._stats[kind]["in_use"] -= 1
+
+    @contextmanager
+    def reader(self):
+        """Checks out a read-only connection, waiting if all readers are busy."""
+        start = time.perf_counter()
+        contended = False
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            contended = True
+            try:
+                conn = self._readers.get(timeout=self.timeout)
+            except queue.Empty:
+                raise sqlite3.OperationalError("Timed out waiting for a reader connection from the pool.")
+        self._record_checkout("reader", time.perf_counter() - start, contended)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+            self._record_checkin("reader")
+
+    @contextmanager
+    def writer(self):
+        """Checks out the single writer connection. Uncommitted work is rolled back on return."""
+        start = time.perf_counter()
+        contended = not self._writer_lock.acquire(blocking=False)
+        if contended and not self._writer_lock.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("Timed out waiting for the writer connection.")
+        self._record_checkout("writer", time.perf_counter() - start, contended)
+        try:
+            yield self._writer
+        finally:
+            if self._writer.in_transaction:
+                self._writer.rollback()
+            self._writer_lock.release()
+            self._record_checkin("writer")
+
+    @contextmanager
+    def dedicated_reader(self):
+        """
+        Opens a read-only connection outside the pool for long-running reads, such as streaming exports,
+        which would otherwise pin a pooled reader for as long as the client takes to download.
+        """
+        conn = self._connect(read_only=True)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Returns a snapshot of checkout and wait-time counters for both sides of the pool."""
+        with self._stats_lock:
+            snapshot = {kind: dict(values) for kind, values in self._stats.items()}
+        for kind, values in snapshot.items():
+            values["wait_time_avg"] = values["wait_time_total"] / values["checkouts"] if values["checkouts"] else 0.0
+        snapshot["reader"]["size"] = self._reader_count
+        snapshot["reader"]["available"] = self._readers.qsize()
+        snapshot["writer"]["size"] = 1
+        return snapshot
+
+    def close(self):
+        """Closes every pooled connection. The pool cannot be used afterwards."""
+        with self._writer_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Returns the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH, reader_count=DB_READER_POOL_SIZE, timeout=DB_BUSY_TIMEOUT)
+    return _pool
+
+def close_pool():
+    """Closes the process-wide pool, if one was opened."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
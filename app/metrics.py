@@ -0,0 +1,172 @@
+# app/metrics.py
+"""
+In-process metrics rendered in the Prometheus text exposition format, with no client library or network
+dependency. Counters, gauges and histograms keep their values in dicts keyed by label values, each under its
+own lock, so recording one is a dict update. Every worker process reports its own values and Prometheus adds
+them up across scrape targets.
+"""
+import bisect
+import threading
+import time
+
+_registry = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labels: tuple = (), collect=None):
+        """collect, when given, is called at render time and returns {label values: value}, replacing set()."""
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _samples(self):
+        if self._collect is not None:
+            return [(self.name, values, (), value) for values, value in self._collect().items()]
+        with self._lock:
+            return [(self.name, values, (), value) for values, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, values, extra, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labels, values, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def dec(self, *values, amount=1):
+        self.inc(*values, amount=-amount)
+
+    def set(self, value, *values):
+        with self._lock:
+            self._values[values] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = ()):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(values)
+            if series is None:
+                # Per-bucket counts (the last one past every bound), then the sum of the observed values.
+                series = self._values[values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _samples(self):
+        with self._lock:
+            snapshot = [(values, list(counts), total) for values, (counts, total) in self._values.items()]
+        samples = []
+        for values, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", values, (("le", _format_value(float(bound))),), cumulative))
+            samples.append((f"{self.name}_sum", values, (), total))
+            samples.append((f"{self.name}_count", values, (), cumulative))
+        return samples
+
+
+def render():
+    """Every registered metric in the Prometheus text format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- Metrics ---
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_SQL_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+HTTP_REQUESTS = Counter("trakfin_http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = Histogram(
+    "trakfin_http_request_duration_seconds", "HTTP request latency by route, until the last byte of the response.",
+    ("method", "route"), _LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("trakfin_http_requests_in_flight", "HTTP requests being handled.", ("method",))
+SQL_DURATION = Histogram(
+    "trakfin_sql_statement_duration_seconds", "Time of each SQL statement, fetches included, by the function that ran it.",
+    ("function",), _SQL_BUCKETS
+)
+SQL_ERRORS = Counter("trakfin_sql_statement_errors_total", "SQL statements that raised, by the function that ran them.", ("function",))
+SQL_SLOW = Counter("trakfin_sql_slow_statements_total", "SQL statements over the slow-query threshold, by the function that ran them.", ("function",))
+AI_SQL_DURATION = Histogram(
+    "trakfin_ai_sql_duration_seconds", "Time of the assistant's queries in the SQL sandbox, by outcome.", ("outcome",), _SQL_BUCKETS
+)
+
+
+# --- HTTP middleware ---
+class MetricsMiddleware:
+    """
+    ASGI middleware recording every HTTP request's latency, status code and the number in flight. Requests are
+    labelled by their route template, e.g. /transactions/{transaction_id}, or 'unmatched' when no route matched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc(method)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_REQUESTS_IN_FLIGHT.dec(method)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.observe(elapsed, method, route)
+            HTTP_REQUESTS.inc(method, route, str(status))
@@ -0,0 +1,688 @@
+# app/migrations.py
+"""
+Versioned schema migrations.
+
+The current schema version is stored in the database header (PRAGMA user_version).
+Each migration runs inside its own transaction together with the version bump,
+so a failed migration leaves the database at the previous version.
+"""
+import re
+import sqlite3
+from datetime import date, timedelta
+from .config import RECURRENCE_WINDOW_DAYS
+from dateutil.relativedelta import relativedelta
+from .recurrence import occurrence_dates
+
+
+def _column_names(conn, table_name):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table_name});").fetchall()}
+
+def _add_column_if_missing(conn, table_name, column_name, definition):
+    if column_name not in _column_names(conn, table_name):
+        conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition};")
+
+def rate_lookup_sql(currency_sql: str, date_sql: str):
+    """
+    SQL expression for the exchange_rates rate of a currency effective on a date: the latest rate dated on or
+    before it, else the earliest one, else 1.0. Shared with crud so backfills compute exactly what the triggers do.
+    """
+    return f"""COALESCE(
+        (SELECT rate FROM exchange_rates WHERE currency = {currency_sql} AND effective_date <= {date_sql} ORDER BY effective_date DESC LIMIT 1),
+        (SELECT rate FROM exchange_rates WHERE currency = {currency_sql} ORDER BY effective_date LIMIT 1),
+        1.0
+    )"""
+
+def scale_lookup_sql(currency_sql: str):
+    """SQL expression for the minor units per major unit of a currency (100 unless listed in currencies)."""
+    return f"COALESCE((SELECT scale FROM currencies WHERE code = {currency_sql}), 100)"
+
+def decimal_amount_sql(amount_sql: str, currency_sql: str):
+    """
+    SQL expression for the decimal value of an amount in minor units of its currency. Index expressions cannot
+    read currencies, so the scales are spelled out from the seeded ones; crud sorts by this same expression so
+    SQLite matches it to idx_transactions_user_status_amount_value.
+    """
+    cases = " ".join(f"WHEN '{code}' THEN {scale}" for code, scale in sorted(_SEED_CURRENCY_SCALES.items()) if scale != 100)
+    return f"{amount_sql} * 1.0 / CASE {currency_sql} {cases} ELSE 100 END"
+
+# amount_base is always kept in EUR.
+_BASE_SCALE_SQL = scale_lookup_sql("'EUR'")
+
+def base_amount_sql(amount_sql: str, currency_sql: str, date_sql: str):
+    """SQL expression converting an amount in minor units of its currency to minor units of the base currency (EUR)."""
+    return (
+        f"CAST(ROUND({amount_sql} * {rate_lookup_sql(currency_sql, date_sql)} * {_BASE_SCALE_SQL}"
+        f" / {scale_lookup_sql(currency_sql)}) AS INTEGER)"
+    )
+
+def _rebuild_table(conn, table_name: str, integer_columns: dict, skip_objects: tuple = ()):
+    """
+    Rebuilds a table with the given REAL columns declared INTEGER, filling them with the given SQL expressions
+    over the old row, following SQLite's create-copy-drop-rename procedure. Indexes and triggers are recreated
+    from their stored SQL, except those named in skip_objects. The AUTOINCREMENT counter is carried over.
+    """
+    create_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()[0]
+    for column_name in integer_columns:
+        create_sql, replaced = re.subn(rf"\b{column_name}\s+REAL\b", f"{column_name} INTEGER", create_sql)
+        if not replaced:
+            raise sqlite3.OperationalError(f"Column {table_name}.{column_name} is not declared REAL.")
+    create_sql = re.sub(rf"^CREATE TABLE\s+(IF NOT EXISTS\s+)?\"?{table_name}\"?", f"CREATE TABLE {table_name}_new", create_sql)
+    dependents = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table_name,)
+    ).fetchall()
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table_name,)).fetchone() if _table_exists(conn, "sqlite_sequence") else None
+
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name});").fetchall()]
+    select_list = ", ".join(integer_columns.get(column, column) for column in columns)
+    conn.execute(create_sql)
+    conn.execute(f"INSERT INTO {table_name}_new ({', '.join(columns)}) SELECT {select_list} FROM {table_name}")
+    conn.execute(f"DROP TABLE {table_name}")
+    conn.execute(f"ALTER TABLE {table_name}_new RENAME TO {table_name}")
+    if sequence:
+        conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (sequence[0], table_name))
+    for name, sql in dependents:
+        if name not in skip_objects:
+            conn.execute(sql)
+
+def _table_exists(conn, table_name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone() is not None
+
+
+# --- Migrations ------------------------------------------------------------------------------------------------------
+def _m0001_baseline_columns(conn):
+    """Adds the columns that were added by hand to databases created by scripts/initialize_db.py."""
+    _add_column_if_missing(conn, "categories", "i18n_key", "TEXT")
+    _add_column_if_missing(conn, "transactions", "recurrence_end_date", "TEXT")
+    _add_column_if_missing(conn, "transactions", "recurrence_id", "TEXT")
+    _add_column_if_missing(conn, "transactions", "status", "TEXT NOT NULL DEFAULT 'confirmed'")
+    _add_column_if_missing(conn, "transactions", "recurrence_num", "INTEGER")
+    _add_column_if_missing(conn, "transactions", "recurrence_unit", "TEXT")
+
+def _m0002_transaction_indexes(conn):
+    """Indexes chosen from the query shapes in crud.get_all_transactions and the report functions."""
+    statements = [
+        # Listing sorted by date, date-ranged reports and the balance evolution GROUP BY date.
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_status_date ON transactions (user_id, status, date)",
+        # Listing sorted by amount.
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_status_amount ON transactions (user_id, status, amount)",
+        # Due pending transactions: only a small fraction of rows, so a partial index keeps it tiny.
+        "CREATE INDEX IF NOT EXISTS idx_transactions_pending ON transactions (user_id, date) WHERE status = 'pending'",
+        # Series lookups (counts, masters, pending rows, deletes).
+        "CREATE INDEX IF NOT EXISTS idx_transactions_recurrence ON transactions (recurrence_id, user_id, status) WHERE recurrence_id IS NOT NULL",
+        # Both legs of a transfer.
+        "CREATE INDEX IF NOT EXISTS idx_transactions_transfer ON transactions (transfer_id, user_id) WHERE transfer_id IS NOT NULL",
+        # Covers the balance report join and the per-account count/reassign/delete statements.
+        "CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions (account_id, user_id, status, currency, amount)",
+        # Per-category count/recategorize/delete statements.
+        "CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions (category_id, user_id)",
+    ]
+    for statement in statements:
+        conn.execute(statement)
+    conn.execute("ANALYZE;")
+
+def _m0003_user_data_versions(conn):
+    """A per-user counter bumped by triggers on every write, so caches in any worker process can detect changes."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_data_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    bump = "INSERT INTO user_data_versions (user_id, version) VALUES ({ref}.user_id, 1) ON CONFLICT(user_id) DO UPDATE SET version = version + 1;"
+    for table_name in ("transactions", "accounts", "categories", "settings"):
+        for event, ref in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table_name}_{event.lower()}_data_version
+                AFTER {event} ON {table_name}
+                BEGIN
+                    {bump.format(ref=ref)}
+                END
+            """)
+
+def _infer_legacy_rule(master, pending_dates):
+    """Finds a (unit, num) rule whose occurrences after the master's date hit every pending date, or None."""
+    start_date = date.fromisoformat(master['date'])
+    candidates = []
+    if master['recurrence_unit']:
+        candidates.append((master['recurrence_unit'], master['recurrence_num'] or 1))
+
+    # The gap between two consecutive occurrences gives the interval.
+    first, second = (pending_dates[0], pending_dates[1]) if len(pending_dates) > 1 else (start_date, pending_dates[0])
+    gap = relativedelta(second, first)
+    if gap.days == 0 and (gap.years or gap.months):
+        total_months = gap.years * 12 + gap.months
+        if total_months % 12 == 0:
+            candidates.append(('years', total_months // 12))
+        candidates.append(('months', total_months))
+    gap_days = (second - first).days
+    if gap_days > 0:
+        if gap_days % 7 == 0:
+            candidates.append(('weeks', gap_days // 7))
+        candidates.append(('days', gap_days))
+
+    expected = set(pending_dates)
+    for unit, num in candidates:
+        dates, _ = occurrence_dates(start_date, unit, num, pending_dates[-1])
+        if expected.issubset(dates):
+            return unit, num
+    return None
+
+def _m0004_recurrence_rules(conn):
+    """
+    Stores each recurrence rule once. Pending rows are only kept inside a rolling window and the rest are
+    generated from the rule on demand. Legacy series whose rows can be regenerated exactly from an inferred rule
+    are converted and trimmed to the window. Any other series keeps all of its materialized rows.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS recurrence_rules (
+            recurrence_id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            master_id INTEGER,
+            start_date TEXT NOT NULL,
+            recurrence_num INTEGER NOT NULL DEFAULT 1,
+            recurrence_unit TEXT NOT NULL,
+            end_date TEXT,
+            description TEXT NOT NULL,
+            amount REAL NOT NULL,
+            currency TEXT NOT NULL,
+            account_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            next_step INTEGER NOT NULL,
+            materialized_until TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recurrence_rules_user ON recurrence_rules (user_id, materialized_until)")
+
+    window_end = date.today() + timedelta(days=RECURRENCE_WINDOW_DAYS)
+    series = conn.execute("""
+        SELECT recurrence_id, user_id, MIN(CASE WHEN status = 'confirmed' THEN id END) as master_id
+        FROM transactions WHERE recurrence_id IS NOT NULL
+        GROUP BY recurrence_id, user_id
+        HAVING SUM(status = 'pending') > 0 AND master_id IS NOT NULL
+    """).fetchall()
+    for recurrence_id, user_id, master_id in series:
+        master = conn.execute(
+            "SELECT id, date, description, amount, currency, account_id, category_id, recurrence_num, recurrence_unit FROM transactions WHERE id = ?",
+            (master_id,)
+        ).fetchone()
+        master = dict(zip(("id", "date", "description", "amount", "currency", "account_id", "category_id", "recurrence_num", "recurrence_unit"), master))
+        pending_dates = sorted(
+            date.fromisoformat(row[0]) for row in conn.execute(
+                "SELECT date FROM transactions WHERE recurrence_id = ? AND user_id = ? AND status = 'pending'", (recurrence_id, user_id)
+            ).fetchall()
+        )
+        rule = _infer_legacy_rule(master, pending_dates)
+        if rule is None:
+            continue
+        unit, num = rule
+        start_date = date.fromisoformat(master['date'])
+        end_date = pending_dates[-1]
+        until = min(window_end, end_date)
+        _, next_step = occurrence_dates(start_date, unit, num, until)
+        # Only trim when the rows beyond the window are exactly what the rule would regenerate.
+        future_expected, _ = occurrence_dates(start_date, unit, num, end_date, first_step=next_step)
+        if [d for d in pending_dates if d > until] != future_expected:
+            continue
+        conn.execute(
+            "DELETE FROM transactions WHERE recurrence_id = ? AND user_id = ? AND status = 'pending' AND date > ?",
+            (recurrence_id, user_id, str(until))
+        )
+        conn.execute(
+            """INSERT INTO recurrence_rules
+               (recurrence_id, user_id, master_id, start_date, recurrence_num, recurrence_unit, end_date, description, amount, currency, account_id, category_id, next_step, materialized_until)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (recurrence_id, user_id, master['id'], master['date'], num, unit, str(end_date), master['description'], master['amount'],
+             master['currency'], master['account_id'], master['category_id'], next_step, str(until))
+        )
+
+def _m0005_account_balances(conn):
+    """
+    Per-account, per-currency sums of confirmed transactions. Triggers keep them exact on every write path,
+    so the balance report reads a handful of rows instead of aggregating the whole history.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS account_balances (
+            account_id INTEGER NOT NULL,
+            currency TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            balance REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, account_id, currency)
+        )
+    """)
+
+    apply = """
+        INSERT INTO account_balances (account_id, currency, user_id, balance)
+        SELECT {ref}.account_id, {ref}.currency, {ref}.user_id, {sign}{ref}.amount WHERE {ref}.status = 'confirmed'
+        ON CONFLICT(user_id, account_id, currency) DO UPDATE SET balance = balance + excluded.balance;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_insert_balance AFTER INSERT ON transactions
+        BEGIN {apply.format(ref="NEW", sign="")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_delete_balance AFTER DELETE ON transactions
+        BEGIN {apply.format(ref="OLD", sign="-")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_update_balance
+        AFTER UPDATE OF amount, account_id, currency, status, user_id ON transactions
+        BEGIN
+            {apply.format(ref="OLD", sign="-")}
+            {apply.format(ref="NEW", sign="")}
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_accounts_delete_balance AFTER DELETE ON accounts
+        BEGIN
+            DELETE FROM account_balances WHERE account_id = OLD.id;
+        END
+    """)
+
+    conn.execute("DELETE FROM account_balances")
+    conn.execute("""
+        INSERT INTO account_balances (account_id, currency, user_id, balance)
+        SELECT account_id, currency, user_id, SUM(amount) FROM transactions
+        WHERE status = 'confirmed' GROUP BY user_id, account_id, currency
+    """)
+
+def _m0006_balance_checkpoints(conn):
+    """
+    Monthly net change per (user, account, currency), maintained by triggers. A cumulative balance at any
+    month boundary is a prefix sum over these rows, so balance-as-of queries only scan a short tail of transactions.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS balance_checkpoints (
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            account_id INTEGER NOT NULL,
+            currency TEXT NOT NULL,
+            change REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, month, account_id, currency)
+        )
+    """)
+
+    apply = """
+        INSERT INTO balance_checkpoints (user_id, month, account_id, currency, change)
+        SELECT {ref}.user_id, substr({ref}.date, 1, 7), {ref}.account_id, {ref}.currency, {sign}{ref}.amount WHERE {ref}.status = 'confirmed'
+        ON CONFLICT(user_id, month, account_id, currency) DO UPDATE SET change = change + excluded.change;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_insert_checkpoint AFTER INSERT ON transactions
+        BEGIN {apply.format(ref="NEW", sign="")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_delete_checkpoint AFTER DELETE ON transactions
+        BEGIN {apply.format(ref="OLD", sign="-")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_update_checkpoint
+        AFTER UPDATE OF amount, account_id, currency, status, user_id, date ON transactions
+        BEGIN
+            {apply.format(ref="OLD", sign="-")}
+            {apply.format(ref="NEW", sign="")}
+        END
+    """)
+
+    conn.execute("DELETE FROM balance_checkpoints")
+    conn.execute("""
+        INSERT INTO balance_checkpoints (user_id, month, account_id, currency, change)
+        SELECT user_id, substr(date, 1, 7), account_id, currency, SUM(amount) FROM transactions
+        WHERE status = 'confirmed' GROUP BY user_id, substr(date, 1, 7), account_id, currency
+    """)
+
+def _m0007_transactions_fts(conn):
+    """External-content FTS5 index over transactions.description, kept in sync by triggers."""
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+            description, content='transactions', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_insert_fts AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_delete_fts AFTER DELETE ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_update_fts AFTER UPDATE OF description ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+            INSERT INTO transactions_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END
+    """)
+    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+# The rates that were hardcoded in crud before they moved to exchange_rates, in EUR per unit.
+_SEED_EXCHANGE_RATES = {'EUR': 1.0, 'USD': 0.92, 'GBP': 1.18}
+
+def _m0008_exchange_rates(conn):
+    """
+    Date-effective exchange rates (base-currency value of one unit, base = EUR) and a stored amount_base on each
+    transaction, filled by triggers at write time with the rate effective on its date. balance_checkpoints gains
+    change_base, the same monthly change in the base currency, so range reports are plain SUMs without a per-row CASE.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS exchange_rates (
+            currency TEXT NOT NULL,
+            effective_date TEXT NOT NULL,
+            rate REAL NOT NULL CHECK (rate > 0),
+            PRIMARY KEY (currency, effective_date)
+        ) WITHOUT ROWID
+    """)
+    conn.executemany(
+        "INSERT OR IGNORE INTO exchange_rates (currency, effective_date, rate) VALUES (?, '1900-01-01', ?)",
+        _SEED_EXCHANGE_RATES.items()
+    )
+
+    _add_column_if_missing(conn, "transactions", "amount_base", "REAL")
+    _add_column_if_missing(conn, "balance_checkpoints", "change_base", "REAL NOT NULL DEFAULT 0")
+    conn.execute(f"UPDATE transactions SET amount_base = amount * {rate_lookup_sql('currency', 'date')}")
+
+    # Writers may supply amount_base themselves (bulk imports do); otherwise it is filled in right after the write.
+    fill = f"UPDATE transactions SET amount_base = NEW.amount * {rate_lookup_sql('NEW.currency', 'NEW.date')} WHERE id = NEW.id;"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_insert_amount_base AFTER INSERT ON transactions
+        WHEN NEW.amount_base IS NULL
+        BEGIN {fill} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_update_amount_base AFTER UPDATE OF amount, currency, date ON transactions
+        BEGIN {fill} END
+    """)
+
+    # The checkpoint triggers now carry change_base too; an amount_base change is one more update they follow.
+    for event in ("insert", "delete", "update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_transactions_{event}_checkpoint")
+    apply = """
+        INSERT INTO balance_checkpoints (user_id, month, account_id, currency, change, change_base)
+        SELECT {ref}.user_id, substr({ref}.date, 1, 7), {ref}.account_id, {ref}.currency, {sign}{ref}.amount, {sign}COALESCE({ref}.amount_base, 0)
+        WHERE {ref}.status = 'confirmed'
+        ON CONFLICT(user_id, month, account_id, currency) DO UPDATE SET
+            change = change + excluded.change, change_base = change_base + excluded.change_base;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER trg_transactions_insert_checkpoint AFTER INSERT ON transactions
+        BEGIN {apply.format(ref="NEW", sign="")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER trg_transactions_delete_checkpoint AFTER DELETE ON transactions
+        BEGIN {apply.format(ref="OLD", sign="-")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER trg_transactions_update_checkpoint
+        AFTER UPDATE OF amount, amount_base, account_id, currency, status, user_id, date ON transactions
+        BEGIN
+            {apply.format(ref="OLD", sign="-")}
+            {apply.format(ref="NEW", sign="")}
+        END
+    """)
+    conn.execute("DELETE FROM balance_checkpoints")
+    conn.execute("""
+        INSERT INTO balance_checkpoints (user_id, month, account_id, currency, change, change_base)
+        SELECT user_id, substr(date, 1, 7), account_id, currency, SUM(amount), SUM(amount_base) FROM transactions
+        WHERE status = 'confirmed' GROUP BY user_id, substr(date, 1, 7), account_id, currency
+    """)
+
+    # Covers every range report: the date range, the category and recurrence groupings and the sign of amount_base.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_reports
+        ON transactions (user_id, status, date, category_id, is_recurrent, amount_base)
+    """)
+    conn.execute("ANALYZE;")
+
+# Minor units per major unit of the currencies that do not use two decimals (ISO 4217), as of this migration.
+_SEED_CURRENCY_SCALES = {
+    'BIF': 1, 'CLP': 1, 'DJF': 1, 'GNF': 1, 'ISK': 1, 'JPY': 1, 'KMF': 1, 'KRW': 1, 'PYG': 1,
+    'RWF': 1, 'UGX': 1, 'UYI': 1, 'VND': 1, 'VUV': 1, 'XAF': 1, 'XOF': 1, 'XPF': 1,
+    'BHD': 1000, 'IQD': 1000, 'JOD': 1000, 'KWD': 1000, 'LYD': 1000, 'OMR': 1000, 'TND': 1000,
+    'EUR': 100, 'USD': 100, 'GBP': 100,
+}
+
+def _m0009_integer_amounts(conn):
+    """
+    Stores every amount as an integer of minor units of its currency (cents for EUR), with the scale per currency
+    in a currencies table. transactions and recurrence_rules are rebuilt with INTEGER amount columns, amount_base
+    becomes minor units of EUR, and the trigger-maintained aggregates are rebuilt as integers, so sums are exact.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS currencies (
+            code TEXT PRIMARY KEY,
+            scale INTEGER NOT NULL CHECK (scale > 0)
+        ) WITHOUT ROWID
+    """)
+    conn.executemany("INSERT OR IGNORE INTO currencies (code, scale) VALUES (?, ?)", _SEED_CURRENCY_SCALES.items())
+
+    to_minor = f"CAST(ROUND(amount * {scale_lookup_sql('currency')}) AS INTEGER)"
+    base_minor = f"CAST(ROUND(amount_base * {_BASE_SCALE_SQL}) AS INTEGER)"
+    fill_triggers = ("trg_transactions_insert_amount_base", "trg_transactions_update_amount_base")
+    _rebuild_table(conn, "transactions", {"amount": to_minor, "amount_base": base_minor}, skip_objects=fill_triggers)
+    _rebuild_table(conn, "recurrence_rules", {"amount": to_minor})
+
+    fill = f"UPDATE transactions SET amount_base = {base_amount_sql('NEW.amount', 'NEW.currency', 'NEW.date')} WHERE id = NEW.id;"
+    conn.execute(f"""
+        CREATE TRIGGER trg_transactions_insert_amount_base AFTER INSERT ON transactions
+        WHEN NEW.amount_base IS NULL
+        BEGIN {fill} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER trg_transactions_update_amount_base AFTER UPDATE OF amount, currency, date ON transactions
+        BEGIN {fill} END
+    """)
+
+    # Derived from transactions, so recreated empty with INTEGER columns and summed again.
+    conn.execute("DROP TABLE account_balances")
+    conn.execute("""
+        CREATE TABLE account_balances (
+            account_id INTEGER NOT NULL,
+            currency TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            balance INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, account_id, currency)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO account_balances (account_id, currency, user_id, balance)
+        SELECT account_id, currency, user_id, SUM(amount) FROM transactions
+        WHERE status = 'confirmed' GROUP BY user_id, account_id, currency
+    """)
+    conn.execute("DROP TABLE balance_checkpoints")
+    conn.execute("""
+        CREATE TABLE balance_checkpoints (
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            account_id INTEGER NOT NULL,
+            currency TEXT NOT NULL,
+            change INTEGER NOT NULL DEFAULT 0,
+            change_base INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, month, account_id, currency)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO balance_checkpoints (user_id, month, account_id, currency, change, change_base)
+        SELECT user_id, substr(date, 1, 7), account_id, currency, SUM(amount), SUM(amount_base) FROM transactions
+        WHERE status = 'confirmed' GROUP BY user_id, substr(date, 1, 7), account_id, currency
+    """)
+    conn.execute("ANALYZE;")
+
+
+def _m0010_series_and_transfers(conn):
+    """
+    Moves series and transfers into their own tables keyed by integers. recurrence_series replaces
+    recurrence_rules and also holds the master id and the confirmed/pending counts (kept by triggers);
+    transfers holds both legs. Transactions reference them through series_id and transfer_ref_id instead of
+    repeating a UUID string on every row. The UUIDs are kept as public_id, which is what the API exposes.
+    """
+    conn.execute("""
+        CREATE TABLE recurrence_series (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            public_id TEXT NOT NULL UNIQUE,
+            user_id INTEGER NOT NULL,
+            master_id INTEGER,
+            confirmed_count INTEGER NOT NULL DEFAULT 0,
+            pending_count INTEGER NOT NULL DEFAULT 0,
+            start_date TEXT,
+            recurrence_num INTEGER,
+            recurrence_unit TEXT,
+            end_date TEXT,
+            description TEXT,
+            amount INTEGER,
+            currency TEXT,
+            account_id INTEGER,
+            category_id INTEGER,
+            next_step INTEGER,
+            materialized_until TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    # Series with a rule first, then the legacy series that only exist as a shared recurrence_id.
+    conn.execute("""
+        INSERT INTO recurrence_series
+            (public_id, user_id, start_date, recurrence_num, recurrence_unit, end_date, description, amount, currency, account_id, category_id, next_step, materialized_until)
+        SELECT recurrence_id, user_id, start_date, recurrence_num, recurrence_unit, end_date, description, amount, currency, account_id, category_id, next_step, materialized_until
+        FROM recurrence_rules
+    """)
+    conn.execute("""
+        INSERT INTO recurrence_series (public_id, user_id)
+        SELECT recurrence_id, MIN(user_id) FROM transactions WHERE recurrence_id IS NOT NULL GROUP BY recurrence_id
+        ON CONFLICT (public_id) DO NOTHING
+    """)
+    conn.execute("""
+        CREATE TABLE transfers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            public_id TEXT NOT NULL UNIQUE,
+            user_id INTEGER NOT NULL,
+            expense_id INTEGER,
+            income_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO transfers (public_id, user_id, expense_id, income_id)
+        SELECT transfer_id, MIN(user_id), MIN(CASE WHEN amount < 0 THEN id END), MIN(CASE WHEN amount > 0 THEN id END)
+        FROM transactions WHERE transfer_id IS NOT NULL GROUP BY transfer_id
+    """)
+
+    _add_column_if_missing(conn, "transactions", "series_id", "INTEGER REFERENCES recurrence_series (id)")
+    _add_column_if_missing(conn, "transactions", "transfer_ref_id", "INTEGER REFERENCES transfers (id)")
+    conn.execute("""
+        UPDATE transactions SET series_id = s.id FROM recurrence_series s WHERE s.public_id = transactions.recurrence_id
+    """)
+    conn.execute("""
+        UPDATE transactions SET transfer_ref_id = tr.id FROM transfers tr WHERE tr.public_id = transactions.transfer_id
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_transactions_recurrence")
+    conn.execute("DROP INDEX IF EXISTS idx_transactions_transfer")
+    conn.execute("ALTER TABLE transactions DROP COLUMN recurrence_id")
+    conn.execute("ALTER TABLE transactions DROP COLUMN transfer_id")
+    conn.execute("DROP TABLE recurrence_rules")
+
+    # Series lookups (counts, pending rows, deletes) and both legs of a transfer.
+    conn.execute("CREATE INDEX idx_transactions_series ON transactions (series_id, status) WHERE series_id IS NOT NULL")
+    conn.execute("CREATE INDEX idx_transactions_transfer_ref ON transactions (transfer_ref_id) WHERE transfer_ref_id IS NOT NULL")
+    conn.execute("CREATE INDEX idx_recurrence_series_user ON recurrence_series (user_id, materialized_until) WHERE recurrence_unit IS NOT NULL")
+    conn.execute("CREATE INDEX idx_transfers_user ON transfers (user_id)")
+
+    conn.execute("""
+        UPDATE recurrence_series SET
+            confirmed_count = (SELECT COUNT(*) FROM transactions WHERE series_id = recurrence_series.id AND status = 'confirmed'),
+            pending_count = (SELECT COUNT(*) FROM transactions WHERE series_id = recurrence_series.id AND status = 'pending'),
+            master_id = (SELECT MIN(id) FROM transactions WHERE series_id = recurrence_series.id AND status = 'confirmed')
+    """)
+    # The master is the series' first confirmed transaction; it only has to be searched for when it leaves.
+    add = """
+        UPDATE recurrence_series SET
+            confirmed_count = confirmed_count + (NEW.status = 'confirmed'),
+            pending_count = pending_count + (NEW.status = 'pending'),
+            master_id = CASE WHEN NEW.status = 'confirmed' AND (master_id IS NULL OR NEW.id < master_id) THEN NEW.id ELSE master_id END
+        WHERE id = NEW.series_id;
+    """
+    remove = """
+        UPDATE recurrence_series SET
+            confirmed_count = confirmed_count - (OLD.status = 'confirmed'),
+            pending_count = pending_count - (OLD.status = 'pending'),
+            master_id = CASE WHEN master_id = OLD.id
+                THEN (SELECT MIN(id) FROM transactions WHERE series_id = OLD.series_id AND status = 'confirmed')
+                ELSE master_id END
+        WHERE id = OLD.series_id;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER trg_transactions_insert_series AFTER INSERT ON transactions
+        WHEN NEW.series_id IS NOT NULL
+        BEGIN {add} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER trg_transactions_delete_series AFTER DELETE ON transactions
+        WHEN OLD.series_id IS NOT NULL
+        BEGIN {remove} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER trg_transactions_update_series AFTER UPDATE OF series_id, status ON transactions
+        WHEN OLD.series_id IS NOT NEW.series_id OR OLD.status IS NOT NEW.status
+        BEGIN {remove} {add} END
+    """)
+    conn.execute("ANALYZE;")
+
+
+def _m0011_decimal_amount_index(conn):
+    """
+    Amounts are minor units of their own currency, so sorting by the stored integer ranks ¥30 below €1.00. The
+    listing sorts by the decimal amount instead, and this index serves that order and its keyset seek.
+    """
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_status_amount_value
+        ON transactions (user_id, status, ({decimal_amount_sql('amount', 'currency')}))
+    """)
+    conn.execute("ANALYZE;")
+
+
+MIGRATIONS = [
+    (1, "Add hand-added columns to the baseline schema", _m0001_baseline_columns),
+    (2, "Add composite and partial indexes on transactions", _m0002_transaction_indexes),
+    (3, "Add per-user data versions maintained by triggers", _m0003_user_data_versions),
+    (4, "Store recurrence rules and trim pending rows to a rolling window", _m0004_recurrence_rules),
+    (5, "Maintain per-account balances with triggers", _m0005_account_balances),
+    (6, "Maintain monthly balance checkpoints with triggers", _m0006_balance_checkpoints),
+    (7, "Add an FTS5 index over transaction descriptions", _m0007_transactions_fts),
+    (8, "Add date-effective exchange rates and a stored base-currency amount", _m0008_exchange_rates),
+    (9, "Store amounts as integer minor units", _m0009_integer_amounts),
+    (10, "Move series and transfers into tables with integer keys", _m0010_series_and_transfers),
+    (11, "Index transactions by their decimal amount", _m0011_decimal_amount_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# --- Runner ------------------------------------------------------------------------------------------------------
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+def get_pending_migrations(conn):
+    current_version = get_schema_version(conn)
+    return [m for m in MIGRATIONS if m[0] > current_version]
+
+def apply_migrations(conn, target_version=None):
+    """Applies every pending migration up to target_version (default: latest) and returns the applied ones."""
+    if conn.in_transaction:
+        conn.commit()
+    applied = []
+    for version, description, migrate in get_pending_migrations(conn):
+        if target_version is not None and version > target_version:
+            break
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {version};")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    return applied
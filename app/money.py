@@ -0,0 +1,39 @@
+# app/money.py
+"""
+Amounts are stored as integers in the minor unit of their currency (cents for EUR) and converted
+to and from decimal amounts only where they enter or leave the crud layer.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+# ISO 4217 minor units of the currencies that do not use two decimals; any other currency uses two.
+MINOR_UNITS = {
+    'BIF': 0, 'CLP': 0, 'DJF': 0, 'GNF': 0, 'ISK': 0, 'JPY': 0, 'KMF': 0, 'KRW': 0, 'PYG': 0,
+    'RWF': 0, 'UGX': 0, 'UYI': 0, 'VND': 0, 'VUV': 0, 'XAF': 0, 'XOF': 0, 'XPF': 0,
+    'BHD': 3, 'IQD': 3, 'JOD': 3, 'KWD': 3, 'LYD': 3, 'OMR': 3, 'TND': 3,
+}
+DEFAULT_MINOR_UNITS = 2
+
+
+def minor_units(currency: str | None):
+    """Number of decimals of a currency."""
+    return MINOR_UNITS.get((currency or '').upper(), DEFAULT_MINOR_UNITS)
+
+def scale(currency: str | None):
+    """Minor units per major unit of a currency, e.g. 100 for EUR."""
+    return 10 ** minor_units(currency)
+
+def quantize(amount, currency: str | None):
+    """Rounds a decimal amount to the minor unit of its currency, half away from zero, as a Decimal."""
+    return Decimal(str(amount)).quantize(Decimal(1).scaleb(-minor_units(currency)), rounding=ROUND_HALF_UP)
+
+def to_minor(amount, currency: str | None):
+    """Converts a decimal amount to an integer of minor units, rounding half away from zero."""
+    if amount is None:
+        return None
+    return int((Decimal(str(amount)) * scale(currency)).to_integral_value(rounding=ROUND_HALF_UP))
+
+def to_major(value, currency: str | None):
+    """Converts an integer of minor units back to a decimal amount."""
+    if value is None:
+        return None
+    return value / scale(currency)
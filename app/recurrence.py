@@ -0,0 +1,31 @@
+# app/recurrence.py
+from datetime import date
+from dateutil.relativedelta import relativedelta
+
+RECURRENCE_UNITS = ('days', 'weeks', 'months', 'years')
+
+
+def normalize_unit(frequency_unit: str):
+    return 'years' if frequency_unit == 'yearly' else frequency_unit # Handles your frontend change
+
+def occurrence_date(start_date: date, frequency_unit: str, frequency_num: int, step: int):
+    """
+    Returns the date of the step-th occurrence after start_date.
+    Each date is offset from the start rather than from the previous occurrence, so a series
+    starting on the 31st lands on the last day of short months without drifting afterwards.
+    """
+    return start_date + relativedelta(**{normalize_unit(frequency_unit): frequency_num * step})
+
+def occurrence_dates(start_date: date, frequency_unit: str, frequency_num: int, until: date, first_step: int = 1):
+    """
+    Computes in memory every occurrence from first_step up to and including `until`.
+    Returns the dates and the step of the first occurrence after `until`.
+    """
+    dates = []
+    step = first_step
+    current_date = occurrence_date(start_date, frequency_unit, frequency_num, step)
+    while current_date <= until:
+        dates.append(current_date)
+        step += 1
+        current_date = occurrence_date(start_date, frequency_unit, frequency_num, step)
+    return dates, step
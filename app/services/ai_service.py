@@ -1,27 +1,175 @@
 # app/services/ai_service.py
+import time
+import logging
+import random
+import asyncio
+import importlib.util
 import httpx
+import orjson
 import pandas as pd
 from datetime import datetime
-from .. import crud
-from ..config import GEMINI_API_URL, GEMINI_API_KEY
+from .. import acrud, sql_sandbox
+from ..cache import VersionedLRUCache
+from ..config import (
+    GEMINI_API_URL, GEMINI_STREAM_URL, GEMINI_API_KEY, GEMINI_TIMEOUT, GEMINI_MAX_CONNECTIONS, GEMINI_KEEPALIVE_EXPIRY,
+    GEMINI_MAX_RETRIES, GEMINI_RETRY_BACKOFF, CHAT_CACHE_MAX_ENTRIES, CHAT_CACHE_MAX_BYTES, CHAT_CACHE_TTL,
+)
+
+# Rate limits and transient server errors are worth another attempt; other statuses are not.
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_MAX_BACKOFF = 8.0
+logger = logging.getLogger(__name__)
+
+# httpx only speaks HTTP/2 when the optional h2 package is installed (httpx[http2] in requirements.txt).
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+_http_client = None
+
+# The model's first reply (a [SQL] query or a direct answer) keyed by (user_id, question, history), versioned by date,
+# and the final answer keyed by (user_id, SQL), versioned by the user's data version so any write invalidates it.
+_sql_cache = VersionedLRUCache(max_entries=CHAT_CACHE_MAX_ENTRIES, max_bytes=CHAT_CACHE_MAX_BYTES, ttl=CHAT_CACHE_TTL)
+_answer_cache = VersionedLRUCache(max_entries=CHAT_CACHE_MAX_ENTRIES, max_bytes=CHAT_CACHE_MAX_BYTES, ttl=CHAT_CACHE_TTL)
+
+
+# --- HTTP client ---
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the application-wide Gemini client, creating it on first use. Its pool keeps connections alive
+    between calls, so only the first call of a chat turn (or after the keep-alive expiry) pays TCP and TLS setup.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=_HTTP2,
+            timeout=httpx.Timeout(GEMINI_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=GEMINI_MAX_CONNECTIONS,
+                max_keepalive_connections=GEMINI_MAX_CONNECTIONS,
+                keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+            ),
+            headers={'Content-Type': 'application/json'},
+        )
+        logger.info("Gemini client created with %s.", "HTTP/2" if _HTTP2 else "HTTP/1.1, h2 is not installed")
+    return _http_client
+
+async def close_http_client():
+    """Closes the pooled client, if one was created."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def _retry_delay(attempt: int, response: httpx.Response | None = None):
+    """Seconds to wait before retry number attempt + 1: the server's Retry-After if given, else capped backoff with jitter."""
+    if response is not None:
+        try:
+            return min(float(response.headers.get('Retry-After', '')), _MAX_BACKOFF)
+        except ValueError:
+            pass
+    return random.uniform(0, min(_MAX_BACKOFF, GEMINI_RETRY_BACKOFF * 2 ** attempt))
+
+async def _post_with_retries(url: str, payload: dict, stream: bool = False):
+    """
+    POSTs the payload, retrying transport errors and retryable statuses up to GEMINI_MAX_RETRIES times.
+    With stream=True the response is returned once its headers arrive, and the caller must close it.
+    """
+    client = get_http_client()
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        last_attempt = attempt == GEMINI_MAX_RETRIES
+        try:
+            response = await client.send(client.build_request("POST", url, json=payload), stream=stream)
+        except httpx.TransportError:
+            if last_attempt:
+                raise
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+        if response.status_code in _RETRY_STATUSES and not last_attempt:
+            await response.aclose()
+            await asyncio.sleep(_retry_delay(attempt, response))
+            continue
+        if response.is_error:
+            await response.aclose()
+        response.raise_for_status()
+        return response
 
 async def call_gemini_api(payload):
     if not GEMINI_API_KEY:
         return "Error: GEMINI_API_KEY is not set."
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            headers = {'Content-Type': 'application/json'}
-            response = await client.post(f"{GEMINI_API_URL}?key={GEMINI_API_KEY}", json=payload, headers=headers)
-            response.raise_for_status()
-            response_json = response.json()
-            return response_json['candidates'][0]['content']['parts'][0]['text']
-        except (httpx.RequestError, KeyError, IndexError) as e:
-            print(f"Error calling Gemini API: {e}")
-            return "Error: Could not get a response from the AI model."
+    try:
+        response = await _post_with_retries(f"{GEMINI_API_URL}?key={GEMINI_API_KEY}", payload)
+        response_json = response.json()
+        return response_json['candidates'][0]['content']['parts'][0]['text']
+    except (httpx.HTTPError, KeyError, IndexError) as e:
+        logger.warning("Error calling Gemini API: %s", e)
+        return "Error: Could not get a response from the AI model."
 
-async def execute_natural_language_query(user_query: str, history: list, user_id: int):
-    db_schema = crud.get_db_schema_string() # Calls the correct function name
-    today = datetime.today().strftime('%Y-%m-%d')
+async def stream_gemini_api(payload):
+    """
+    Yields the model's reply piece by piece as it is generated, read from the Server-Sent Events of the
+    streaming endpoint. Raises httpx.HTTPError, or KeyError/IndexError/ValueError on a malformed chunk.
+    """
+    response = await _post_with_retries(f"{GEMINI_STREAM_URL}?alt=sse&key={GEMINI_API_KEY}", payload, stream=True)
+    try:
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            chunk = orjson.loads(line[len("data:"):])
+            for part in chunk['candidates'][0]['content'].get('parts', ()):
+                if part.get('text'):
+                    yield part['text']
+    finally:
+        await response.aclose()
+
+def _render_rows(columns, rows, truncated: bool):
+    """Renders a sandbox result as the text table the formatting prompt quotes."""
+    if not rows:
+        return "No results found."
+    text = pd.DataFrame(rows, columns=columns).to_string(index=False)
+    if truncated:
+        text += f"\n(Only the first {len(rows)} rows are shown.)"
+    return text
+
+
+# --- Chat ---
+def _normalize(text: str):
+    """Case-folds a message and collapses its whitespace and trailing punctuation, so rephrasings of a question cache alike."""
+    return " ".join(str(text).casefold().split()).rstrip("?!. ")
+
+def _is_error(text: str):
+    return text.startswith("Error:")
+
+def _question_key(user_id: int, user_query: str, history: list):
+    return (user_id, _normalize(user_query), tuple((item['sender'], _normalize(item['text'])) for item in history))
+
+def _extract_sql(reply: str):
+    """Returns the query of a [SQL]...[/SQL] reply, or None when the model answered directly."""
+    if reply.startswith("[SQL]") and reply.endswith("[/SQL]"):
+        return reply.replace("[SQL]", "").replace("[/SQL]", "").strip()
+    return None
+
+def _formatting_payload(user_query: str, sql_query: str, data_result: str):
+    """Builds the second request of a chat turn, which turns the query result into the final answer."""
+    formatting_prompt = f"The user originally asked: '{user_query}'. You decided to run the SQL query: '{sql_query}'. The result from the database is: \n{data_result}\n. Based on this data, please present a final, friendly answer to the user. Format all currency amounts in Euros (e.g., 1,234.56 €)."
+    # A new, clean payload for the final formatting step
+    return {"contents": [{"role": "user", "parts": [{"text": formatting_prompt}]}]}
+
+def _turn_result(text: str, cached: dict, timings: dict, started: float, error: dict | None = None):
+    timings["total"] = time.perf_counter() - started
+    response = {"response": text, "cached": cached, "timings_ms": {phase: round(seconds * 1000, 3) for phase, seconds in timings.items()}}
+    if error:
+        response["error"] = error
+    return response
+
+def _sql_error_text(error: sql_sandbox.SqlSandboxError):
+    return f"I tried to run a query, but it failed. Please ask your question differently. (Error: {error.message})"
+
+def get_chat_cache_stats():
+    """Hit/miss counters and memory use of both chat caches."""
+    return {"sql": _sql_cache.stats(), "answers": _answer_cache.stats()}
+
+async def _build_payload(user_query: str, history: list, user_id: int, today: str):
+    """Builds the first request of a chat turn: the system prompt with schema and history, then the question."""
+    db_schema = await acrud.get_db_schema_string()
     
     # Format history for the prompt
     history_string = "\n".join([f"{item['sender']}: {item['text']}" for item in history])
@@ -36,6 +184,8 @@ The user you are helping has the user_id: {user_id}.
 
 **INTERPRETATION RULE:** In the `transactions` table, a negative `amount` signifies an **expense** (money spent), and a positive `amount` signifies **income** (money received). When reporting on total 'spending' or 'expenses', you should look for negative amounts but present the final sum as a positive number (e.g., "You spent 453.00 €").
 
+**AMOUNT RULE:** `amount`, `amount_base` and every balance column are stored as integers of the currency's minor unit (cents for EUR). Divide by the `scale` of the currency in the `currencies` table (100 when it is not listed) to get the real amount, e.g. `SUM(amount) / 100.0` for EUR. `amount_base` is always in EUR cents.
+
 DATABASE SCHEMA:
 {db_schema}
 
@@ -57,28 +207,170 @@ Chat History (for context):
     # Add the current user query last
     contents.append({"role": "user", "parts": [{"text": user_query}]})
     
-    payload = {"contents": contents}
-    
-    ai_response = await call_gemini_api(payload)
-    ai_response = ai_response.strip()
+    return {"contents": contents}
 
-    if ai_response.startswith("[SQL]") and ai_response.endswith("[/SQL]"):
-        sql_query = ai_response.replace("[SQL]", "").replace("[/SQL]", "").strip()
-        print(f"🤖 TrakFin AI Generated SQL: {sql_query}")
-        
-        try:
-            conn = crud.get_db_connection()
-            result_df = pd.read_sql_query(sql_query, conn)
-            conn.close()
-            data_result = result_df.to_string(index=False) if not result_df.empty else "No results found."
-        except Exception as e:
-            return f"I tried to run a query, but it failed. Please ask your question differently. (Error: {e})"
-            
-        formatting_prompt = f"The user originally asked: '{user_query}'. You decided to run the SQL query: '{sql_query}'. The result from the database is: \n{data_result}\n. Based on this data, please present a final, friendly answer to the user. Format all currency amounts in Euros (e.g., 1,234.56 €)."
-        
-        # Create a new, clean payload for the final formatting step
-        final_payload = {"contents": [{"role": "user", "parts": [{"text": formatting_prompt}]}]}
-        final_answer = await call_gemini_api(final_payload)
-        return final_answer
+async def execute_natural_language_query(user_query: str, history: list, user_id: int):
+    """
+    Answers a chat message, letting the model query the user's data first when it needs to.
+    The model's first reply is cached per question and history, and the final answer per query and data
+    version, so a repeated question about unchanged data is answered without calling the model.
+    Returns the answer, which cache levels it came from and its latency split into prompt building,
+    model calls and SQL execution.
+    """
+    # Seconds per phase; the model phase adds up both calls of a turn.
+    timings = {"prompt_build": 0.0, "model": 0.0, "sql": 0.0}
+    cached = {"sql": False, "answer": False}
+    started = time.perf_counter()
+    today = datetime.today().strftime('%Y-%m-%d')
+
+    def result(text: str, error: dict | None = None):
+        return _turn_result(text, cached, timings, started, error)
+
+    # Relative dates in the question resolve against today, so the first level is versioned by the date.
+    question_key = _question_key(user_id, user_query, history)
+    ai_response = _sql_cache.get(question_key, today)
+    if ai_response is not None:
+        cached["sql"] = True
     else:
-        return ai_response
\ No newline at end of file
+        payload = await _build_payload(user_query, history, user_id, today)
+        timings["prompt_build"] = time.perf_counter() - started
+        model_started = time.perf_counter()
+        ai_response = (await call_gemini_api(payload)).strip()
+        timings["model"] += time.perf_counter() - model_started
+        if not _is_error(ai_response):
+            _sql_cache.set(question_key, today, ai_response)
+
+    sql_query = _extract_sql(ai_response)
+    if sql_query is None:
+        return result(ai_response)
+    logger.info("Generated SQL: %s", sql_query)
+
+    # Read before the query runs, so a write landing meanwhile leaves the answer tagged with the older version.
+    answer_key = (user_id, sql_query)
+    data_version = await acrud.get_data_version(user_id)
+    final_answer = _answer_cache.get(answer_key, data_version)
+    if final_answer is not None:
+        cached["answer"] = True
+        return result(final_answer)
+
+    sql_started = time.perf_counter()
+    try:
+        columns, rows, truncated = await sql_sandbox.run_query(sql_query, user_id)
+    except sql_sandbox.SqlSandboxError as e:
+        timings["sql"] = time.perf_counter() - sql_started
+        return result(_sql_error_text(e), e.to_dict())
+    timings["sql"] = time.perf_counter() - sql_started
+
+    model_started = time.perf_counter()
+    final_answer = await call_gemini_api(_formatting_payload(user_query, sql_query, _render_rows(columns, rows, truncated)))
+    timings["model"] += time.perf_counter() - model_started
+    if not _is_error(final_answer):
+        _answer_cache.set(answer_key, data_version, final_answer)
+    return result(final_answer)
+
+
+# --- Streaming chat ---
+_MODEL_ERROR = {"code": "model_unavailable", "message": "Could not get a response from the AI model."}
+
+def _sse(event: str, data: dict):
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+async def _chat_events(user_query: str, history: list, user_id: int):
+    """The steps of execute_natural_language_query as (event, data) pairs, with the model's reply streamed."""
+    timings = {"prompt_build": 0.0, "model": 0.0, "sql": 0.0}
+    cached = {"sql": False, "answer": False}
+    started = time.perf_counter()
+    today = datetime.today().strftime('%Y-%m-%d')
+    if not GEMINI_API_KEY:
+        yield "error", {"code": "model_unavailable", "message": "GEMINI_API_KEY is not set."}
+        return
+
+    question_key = _question_key(user_id, user_query, history)
+    ai_response = _sql_cache.get(question_key, today)
+    if ai_response is not None:
+        cached["sql"] = True
+        if _extract_sql(ai_response) is None:
+            yield "token", {"text": ai_response}
+    else:
+        yield "progress", {"stage": "thinking"}
+        payload = await _build_payload(user_query, history, user_id, today)
+        timings["prompt_build"] = time.perf_counter() - started
+        model_started = time.perf_counter()
+        pieces, forwarding = [], False
+        try:
+            async for piece in stream_gemini_api(payload):
+                pieces.append(piece)
+                if forwarding:
+                    yield "token", {"text": piece}
+                    continue
+                # Held back until it is clear whether the reply is a [SQL] query or an answer for the user.
+                head = "".join(pieces).lstrip()
+                if len(head) >= len("[SQL]") or not "[SQL]".startswith(head):
+                    if not head.startswith("[SQL]"):
+                        forwarding = True
+                        yield "token", {"text": head}
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            logger.warning("Error streaming from Gemini API: %s", e)
+            yield "error", _MODEL_ERROR
+            return
+        timings["model"] += time.perf_counter() - model_started
+        ai_response = "".join(pieces).strip()
+        if not forwarding and ai_response and _extract_sql(ai_response) is None:
+            yield "token", {"text": ai_response}
+        if ai_response:
+            _sql_cache.set(question_key, today, ai_response)
+
+    sql_query = _extract_sql(ai_response)
+    if sql_query is None:
+        yield "done", _turn_result(ai_response, cached, timings, started)
+        return
+    logger.info("Generated SQL: %s", sql_query)
+
+    yield "progress", {"stage": "running_query"}
+    answer_key = (user_id, sql_query)
+    data_version = await acrud.get_data_version(user_id)
+    final_answer = _answer_cache.get(answer_key, data_version)
+    if final_answer is not None:
+        cached["answer"] = True
+        yield "token", {"text": final_answer}
+        yield "done", _turn_result(final_answer, cached, timings, started)
+        return
+
+    sql_started = time.perf_counter()
+    try:
+        columns, rows, truncated = await sql_sandbox.run_query(sql_query, user_id)
+    except sql_sandbox.SqlSandboxError as e:
+        timings["sql"] = time.perf_counter() - sql_started
+        yield "error", e.to_dict()
+        return
+    timings["sql"] = time.perf_counter() - sql_started
+
+    yield "progress", {"stage": "answering"}
+    model_started = time.perf_counter()
+    pieces = []
+    try:
+        async for piece in stream_gemini_api(_formatting_payload(user_query, sql_query, _render_rows(columns, rows, truncated))):
+            pieces.append(piece)
+            yield "token", {"text": piece}
+    except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+        logger.warning("Error streaming from Gemini API: %s", e)
+        yield "error", _MODEL_ERROR
+        return
+    timings["model"] += time.perf_counter() - model_started
+    final_answer = "".join(pieces)
+    _answer_cache.set(answer_key, data_version, final_answer)
+    yield "done", _turn_result(final_answer, cached, timings, started)
+
+async def stream_natural_language_query(user_query: str, history: list, user_id: int):
+    """
+    Answers a chat message like execute_natural_language_query, as Server-Sent Events encoded to bytes.
+    'progress' events name the stage being worked on (thinking, running_query, answering) and 'token' events
+    carry the answer as the model generates it. The stream ends with 'done', holding the same dict
+    execute_natural_language_query returns, or with 'error', holding a code and message.
+    """
+    try:
+        async for event, data in _chat_events(user_query, history, user_id):
+            yield _sse(event, data)
+    except Exception:
+        logger.exception("Unexpected error in the chat stream")
+        yield _sse("error", {"code": "internal", "message": "An internal server error occurred."})
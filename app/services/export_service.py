@@ -0,0 +1,123 @@
+# app/services/export_service.py
+import io
+import csv
+import asyncio
+import tempfile
+from datetime import date
+import orjson
+from openpyxl import Workbook
+from .. import acrud, crud
+from . import report_service
+
+EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+EXPORT_REPORTS = ('balance', 'balance-as-of', 'balance-evolution', 'category-summary', 'monthly-income-expense', 'recurrent-summary')
+_XLSX_READ_SIZE = 64 * 1024
+
+
+def check_format(export_format: str):
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise ValueError(f"Unsupported export format '{export_format}'. Use one of: {', '.join(EXPORT_MEDIA_TYPES)}.")
+    return export_format
+
+
+# --- Encoders ---
+# Each takes the column names and an async iterator of row-tuple batches, and yields the encoded bytes batch by batch.
+async def _encode_csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+async def _encode_ndjson(columns, batches):
+    async for batch in batches:
+        yield b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in batch)
+
+def _append_rows(worksheet, rows):
+    for row in rows:
+        worksheet.append(row)
+
+async def _encode_xlsx(columns, batches, sheet_title: str):
+    """
+    A workbook is a zip archive that can only be finished once every row is known, so rows go through
+    openpyxl's write-only mode (which spools the sheet to disk) and the saved file is streamed from disk.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=sheet_title)
+    worksheet.append(list(columns))
+    async for batch in batches:
+        await asyncio.to_thread(_append_rows, worksheet, batch)
+    with tempfile.TemporaryFile() as f:
+        await asyncio.to_thread(workbook.save, f)
+        f.seek(0)
+        while True:
+            chunk = await asyncio.to_thread(f.read, _XLSX_READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+def _encode(export_format: str, columns, batches, sheet_title: str):
+    if export_format == 'xlsx':
+        return _encode_xlsx(columns, batches, sheet_title)
+    if export_format == 'ndjson':
+        return _encode_ndjson(columns, batches)
+    return _encode_csv(columns, batches)
+
+
+# --- Exports ---
+def export_transactions(user_id: int, export_format: str, sort_by: str = 'date', sort_order: str = 'desc', **filters):
+    """
+    Streams every confirmed transaction matching the same filters as the transaction list, in the given format.
+    Returns an async iterator of bytes; memory use does not depend on how many rows are exported.
+    """
+    check_format(export_format)
+    if sort_by not in crud.TRANSACTION_SORT_COLUMNS:
+        sort_by = 'date'
+    sort_order = 'desc' if (sort_order or 'desc').lower() == 'desc' else 'asc'
+    batches = acrud.iter_transactions(user_id, sort_by=sort_by, sort_order=sort_order, **filters)
+    return _encode(export_format, crud.EXPORT_TRANSACTION_COLUMNS, batches, "Transactions")
+
+async def _report_rows(name: str, user_id: int, start_date: date | None, end_date: date | None, as_of: date | None, transaction_type: str, granularity: str):
+    if name in ('category-summary', 'monthly-income-expense', 'recurrent-summary') and not (start_date and end_date):
+        raise ValueError(f"The '{name}' report needs start_date and end_date.")
+    if name == 'balance':
+        return (await report_service.get_balance_report(user_id))["balances_by_account"]
+    if name == 'balance-as-of':
+        if not as_of:
+            raise ValueError("The 'balance-as-of' report needs a date.")
+        return (await report_service.get_balance_as_of_report(user_id, as_of))["balances_by_account"]
+    if name == 'balance-evolution':
+        return await report_service.get_balance_evolution_report(user_id, start_date=start_date, end_date=end_date, granularity=granularity)
+    if name == 'category-summary':
+        return await report_service.get_category_summary_report(user_id, start_date, end_date, transaction_type)
+    if name == 'monthly-income-expense':
+        return await report_service.get_monthly_income_expense_report(user_id, start_date, end_date)
+    if name == 'recurrent-summary':
+        return await report_service.get_recurrent_summary_report(user_id, start_date, end_date)
+    raise ValueError(f"Unknown report '{name}'. Use one of: {', '.join(EXPORT_REPORTS)}.")
+
+async def _single_batch(rows):
+    yield rows
+
+async def export_report(
+    name: str, user_id: int, export_format: str, start_date: date | None = None, end_date: date | None = None,
+    as_of: date | None = None, transaction_type: str = 'expense', granularity: str = 'day'
+):
+    """
+    Computes a report through the cached report service and returns it as an async iterator of bytes.
+    Report rows are already aggregated, so they are encoded from one batch.
+    """
+    check_format(export_format)
+    rows = await _report_rows(name, user_id, start_date, end_date, as_of, transaction_type, granularity)
+    columns = tuple(rows[0].keys()) if rows else ()
+    batch = [tuple(row[c] for c in columns) for row in rows]
+    return _encode(export_format, columns, _single_batch(batch), name[:31])
@@ -0,0 +1,229 @@
+# app/services/import_service.py
+import io
+import csv
+import json
+import time
+import asyncio
+import zipfile
+import functools
+from decimal import Decimal, InvalidOperation
+from datetime import date, datetime
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from .. import acrud, money
+from ..config import IMPORT_CHUNK_SIZE, IMPORT_MAX_REJECTED_REPORTED
+
+IMPORT_FORMATS = ('csv', 'xlsx')
+IMPORT_FIELDS = ('date', 'description', 'amount', 'currency', 'account', 'category')
+# Maps each transaction field to the column header it is read from.
+DEFAULT_COLUMN_MAPPING = {field: field for field in IMPORT_FIELDS}
+
+
+def detect_format(filename: str | None, file_format: str | None = None):
+    """Returns the import format, taken from `file_format` or else from the file extension."""
+    file_format = (file_format or (filename or '').rsplit('.', 1)[-1]).lower()
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format '{file_format}'. Use one of: {', '.join(IMPORT_FORMATS)}.")
+    return file_format
+
+def parse_column_mapping(mapping: str | dict | None):
+    """
+    Accepts a mapping as a dict, a JSON object or 'field=Column,field=Column' and merges it over the defaults.
+    """
+    if not mapping:
+        return dict(DEFAULT_COLUMN_MAPPING)
+    if isinstance(mapping, str):
+        text = mapping.strip()
+        if text.startswith('{'):
+            mapping = json.loads(text)
+        else:
+            try:
+                mapping = dict(pair.split('=', 1) for pair in text.split(','))
+            except ValueError:
+                raise ValueError("Column mapping must be a JSON object or 'field=Column,field=Column'.")
+    unknown = set(mapping) - set(IMPORT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields in column mapping: {', '.join(sorted(unknown))}.")
+    return {**DEFAULT_COLUMN_MAPPING, **{field: str(column).strip() for field, column in mapping.items()}}
+
+def iter_csv_rows(fileobj, delimiter: str = ','):
+    """Yields each data row of a binary CSV file object as a dict keyed by header, reading lazily."""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.DictReader(text, delimiter=delimiter)
+    except csv.Error as e:
+        raise ValueError(f"Malformed CSV file: {e}")
+    finally:
+        text.detach()
+
+def iter_xlsx_rows(fileobj, sheet: str | None = None):
+    """Yields each data row of a worksheet as a dict keyed by the header row, using openpyxl's read-only mode."""
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException):
+        raise ValueError("The file is not a valid XLSX workbook.")
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(h).strip() if h is not None else '' for h in header]
+        for values in rows:
+            if all(v is None for v in values):
+                continue
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+def open_rows(fileobj, file_format: str, delimiter: str = ',', sheet: str | None = None):
+    if file_format == 'xlsx':
+        return iter_xlsx_rows(fileobj, sheet)
+    return iter_csv_rows(fileobj, delimiter)
+
+
+# --- Validation ---
+def _parse_date(value, date_format: str | None):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or '').strip()
+    if not text:
+        raise ValueError("Missing date.")
+    try:
+        return datetime.strptime(text, date_format).date() if date_format else date.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"Invalid date '{text}'.")
+
+def _parse_amount(value, decimal_comma: bool, currency: str):
+    """Parses an amount as a Decimal rounded to the currency's minor unit, the way crud stores it."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        text = str(value)
+    else:
+        text = str(value or '').strip().replace(' ', '').replace('\u00a0', '')
+        if not text:
+            raise ValueError("Missing amount.")
+        text = text.replace('.', '').replace(',', '.') if decimal_comma else text.replace(',', '')
+    try:
+        amount = Decimal(text)
+        if amount.is_finite():
+            return money.quantize(amount, currency)
+    except InvalidOperation:
+        pass
+    raise ValueError(f"Invalid amount '{value}'.")
+
+def _lookup_table(items: list, *name_keys):
+    """Maps ids (as ints and strings) and case-folded names to ids."""
+    table = {}
+    for item in items:
+        table[item['id']] = item['id']
+        table[str(item['id'])] = item['id']
+        for key in name_keys:
+            if item.get(key):
+                table[item[key].strip().casefold()] = item['id']
+    return table
+
+def _resolve(table: dict, value, label: str):
+    key = value.strip().casefold() if isinstance(value, str) else value
+    if isinstance(key, float) and key.is_integer():
+        key = int(key)
+    resolved = table.get(key)
+    if resolved is None:
+        raise ValueError(f"Unknown {label} '{value}'." if value not in (None, '') else f"Missing {label}.")
+    return resolved
+
+def _validate_row(raw: dict, mapping: dict, options: dict):
+    """Turns one source row into an import tuple, raising ValueError with the reason it is rejected."""
+    description = str(raw.get(mapping['description']) or '').strip()
+    if not description:
+        raise ValueError("Missing description.")
+    currency = str(raw.get(mapping['currency']) or options['currency']).strip().upper()
+    if len(currency) != 3 or not currency.isalpha():
+        raise ValueError(f"Invalid currency '{currency}'.")
+    account_id = options['account_id'] or _resolve(options['accounts'], raw.get(mapping['account']), 'account')
+    category_id = options['category_id'] or _resolve(options['categories'], raw.get(mapping['category']), 'category')
+    return (
+        str(_parse_date(raw.get(mapping['date']), options['date_format'])),
+        description,
+        _parse_amount(raw.get(mapping['amount']), options['decimal_comma'], currency),
+        currency,
+        account_id,
+        category_id,
+    )
+
+def _read_chunk(numbered_rows, chunk_size: int, mapping: dict, options: dict):
+    """Reads and validates up to chunk_size rows. Returns (valid rows, rejections, rows read)."""
+    valid, rejected, read = [], [], 0
+    for row_number, raw in numbered_rows:
+        read += 1
+        try:
+            valid.append(_validate_row(raw, mapping, options))
+        except ValueError as e:
+            rejected.append({"row": row_number, "reason": str(e), "data": {k: v for k, v in raw.items() if k}})
+        if read >= chunk_size:
+            break
+    return valid, rejected, read
+
+
+async def import_transactions(
+    rows, user_id: int, mapping: dict | None = None, account: str | None = None, category: str | None = None,
+    currency: str | None = None, date_format: str | None = None, decimal_comma: bool = False,
+    chunk_size: int = IMPORT_CHUNK_SIZE, on_rejected=None
+):
+    """
+    Imports an iterable of source rows (dicts keyed by column header) as confirmed transactions.
+    Rows are validated and inserted chunk by chunk, each chunk in its own transaction, while the next chunk
+    is read in a worker thread, so memory stays flat however long the file is. `account`/`category` apply to
+    every row and override their columns. Rows identical to a transaction that existed before the import started
+    are skipped as duplicates; rows repeated within the file are all imported.
+    Each rejected row is passed to `on_rejected`; the first IMPORT_MAX_REJECTED_REPORTED are also returned.
+    """
+    started = time.perf_counter()
+    mapping = parse_column_mapping(mapping)
+    accounts = _lookup_table(await acrud.get_accounts(user_id), 'name')
+    categories = _lookup_table(await acrud.get_categories(user_id), 'name', 'i18n_key')
+    options = {
+        "accounts": accounts,
+        "categories": categories,
+        "account_id": _resolve(accounts, account, 'account') if account else None,
+        "category_id": _resolve(categories, category, 'category') if category else None,
+        "currency": currency or await acrud.get_setting('preferred_currency', user_id) or 'EUR',
+        "date_format": date_format,
+        "decimal_comma": decimal_comma,
+    }
+    last_existing_id = await acrud.get_last_transaction_id()
+    read_chunk = functools.partial(_read_chunk, enumerate(rows, start=2), chunk_size, mapping, options)
+
+    report = {"rows_read": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "rejected_rows": []}
+    next_chunk = asyncio.ensure_future(asyncio.to_thread(read_chunk))
+    try:
+        while True:
+            valid, rejected, read = await next_chunk
+            if not read:
+                break
+            next_chunk = asyncio.ensure_future(asyncio.to_thread(read_chunk))
+            if valid:
+                inserted, duplicates = await acrud.import_transaction_rows(user_id, valid, last_existing_id)
+                report["inserted"] += inserted
+                report["duplicates"] += duplicates
+            report["rows_read"] += read
+            report["rejected"] += len(rejected)
+            for rejection in rejected:
+                if on_rejected:
+                    on_rejected(rejection)
+                if len(report["rejected_rows"]) < IMPORT_MAX_REJECTED_REPORTED:
+                    report["rejected_rows"].append(rejection)
+    finally:
+        # A worker thread cannot be interrupted; let an in-flight read finish before the file is closed.
+        await asyncio.gather(next_chunk, return_exceptions=True)
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_s"] = round(elapsed, 3)
+    report["rows_per_sec"] = round(report["rows_read"] / elapsed, 1) if elapsed else 0.0
+    return report
+
+async def import_file(fileobj, filename: str | None, user_id: int, file_format: str | None = None, delimiter: str = ',', sheet: str | None = None, **options):
+    """Streams a CSV or XLSX file object into import_transactions."""
+    rows = open_rows(fileobj, detect_format(filename, file_format), delimiter=delimiter, sheet=sheet)
+    return await import_transactions(rows, user_id, **options)
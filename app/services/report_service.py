@@ -1,43 +1,105 @@
-from .. import crud
+import time
+from .. import acrud
+from ..cache import VersionedLRUCache
+from ..config import REPORT_CACHE_MAX_ENTRIES, REPORT_CACHE_MAX_BYTES
 from datetime import date
 
-def get_balance_report(user_id: int):
+# Report results keyed by (user_id, report, effective rates date, parameters). Entries are tagged with the user's
+# data version, which triggers bump on every write, so a change made through any worker process invalidates them.
+# Reports convert at today's rates, so the key also moves when a rate loaded with a future date takes effect.
+_report_cache = VersionedLRUCache(max_entries=REPORT_CACHE_MAX_ENTRIES, max_bytes=REPORT_CACHE_MAX_BYTES)
+
+async def _cached_report(user_id: int, report_name: str, params: tuple, compute):
+    """Returns the cached report, or awaits `compute()` and caches it. None results are never cached."""
+    key = (user_id, report_name, await acrud.get_effective_rates_date()) + params
+    version = await acrud.get_data_version(user_id)
+    value = _report_cache.get(key, version)
+    if value is None:
+        value = await compute()
+        if value is not None:
+            _report_cache.set(key, version, value)
+    return value
+
+def get_report_cache_stats():
+    """Hit/miss counters and memory use of the report cache."""
+    return _report_cache.stats()
+
+async def get_balance_report(user_id: int):
     """Generates the balance report for a user."""
-    report_df, total_balance = crud.get_balance_report(user_id)
-    
-    final_total_balance = float(total_balance)
-    
-    return {"balances_by_account": report_df.to_dict(orient="records"), "total_balance": final_total_balance}
+    async def compute():
+        balances, total_balance, currency = await acrud.get_balance_report(user_id)
+        
+        final_total_balance = float(total_balance)
+        
+        return {"balances_by_account": balances, "total_balance": final_total_balance, "currency": currency}
+    return await _cached_report(user_id, "balance", (), compute)
 
-def get_balance_evolution_report(user_id: int):
+async def get_balance_evolution_report(user_id: int, start_date: date | None = None, end_date: date | None = None, granularity: str = 'day'):
     """Generates the balance evolution report for a user."""
-    report_df = crud.get_balance_evolution_report(user_id)
-    return report_df.to_dict(orient="records")
+    if granularity not in ('day', 'month'):
+        raise ValueError("Granularity must be 'day' or 'month'.")
+    start_date = str(start_date) if start_date else None
+    end_date = str(end_date) if end_date else None
+    return await _cached_report(
+        user_id, "balance_evolution", (start_date, end_date, granularity),
+        lambda: acrud.get_balance_evolution_report(user_id, start_date=start_date, end_date=end_date, granularity=granularity)
+    )
+
+async def get_balance_as_of_report(user_id: int, as_of_date: date):
+    """Generates the per-account balances at the end of a given date."""
+    async def compute():
+        balances, total_balance, currency = await acrud.get_balance_as_of(user_id, str(as_of_date))
+        return {"date": str(as_of_date), "balances_by_account": balances, "total_balance": float(total_balance), "currency": currency}
+    return await _cached_report(user_id, "balance_as_of", (str(as_of_date),), compute)
 
-def get_category_summary_report(user_id: int, start_date: date, end_date: date, transaction_type: str):
+async def get_category_summary_report(user_id: int, start_date: date, end_date: date, transaction_type: str):
     """Generates the category summary report."""
-    report_df = crud.get_category_summary_for_chart(
-        user_id=user_id, 
-        start_date=str(start_date), 
-        end_date=str(end_date), 
-        transaction_type=transaction_type
+    return await _cached_report(
+        user_id, "category_summary", (str(start_date), str(end_date), transaction_type),
+        lambda: acrud.get_category_summary_for_chart(
+            user_id=user_id, 
+            start_date=str(start_date), 
+            end_date=str(end_date), 
+            transaction_type=transaction_type
+        )
     )
-    return report_df.to_dict(orient="records")
 
-def get_monthly_income_expense_report(user_id: int, start_date: date, end_date: date):
+async def get_monthly_income_expense_report(user_id: int, start_date: date, end_date: date):
     """Generates the monthly income vs. expense report."""
-    report_df = crud.get_monthly_income_expense_summary(
-        user_id=user_id, 
-        start_date=str(start_date), 
-        end_date=str(end_date)
+    return await _cached_report(
+        user_id, "monthly_income_expense", (str(start_date), str(end_date)),
+        lambda: acrud.get_monthly_income_expense_summary(
+            user_id=user_id, 
+            start_date=str(start_date), 
+            end_date=str(end_date)
+        )
     )
-    return report_df.to_dict(orient="records")
 
-def get_recurrent_summary_report(user_id: int, start_date: date, end_date: date):
+async def get_recurrent_summary_report(user_id: int, start_date: date, end_date: date):
     """Generates the recurrent transaction summary report."""
-    report_df = crud.get_recurrent_summary(
-        user_id=user_id, 
-        start_date=str(start_date), 
-        end_date=str(end_date)
+    return await _cached_report(
+        user_id, "recurrent_summary", (str(start_date), str(end_date)),
+        lambda: acrud.get_recurrent_summary(
+            user_id=user_id, 
+            start_date=str(start_date), 
+            end_date=str(end_date)
+        )
     )
-    return report_df.to_dict(orient="records")
\ No newline at end of file
+
+async def get_dashboard_report(user_id: int, start_date: date, end_date: date, transaction_type: str = 'expense', granularity: str = 'day'):
+    """
+    Generates every dashboard report for one date range from a single snapshot and scan.
+    `cached` tells whether the result came from the report cache; `timings_ms` are from when it was computed.
+    """
+    if granularity not in ('day', 'month'):
+        raise ValueError("Granularity must be 'day' or 'month'.")
+    key = (user_id, "dashboard", await acrud.get_effective_rates_date(), str(start_date), str(end_date), transaction_type, granularity)
+    version = await acrud.get_data_version(user_id)
+    value = _report_cache.get(key, version)
+    if value is not None:
+        return {**value, "cached": True}
+    started = time.perf_counter()
+    value = await acrud.get_dashboard_report(user_id, str(start_date), str(end_date), transaction_type, granularity)
+    value["timings_ms"]["total"] = round((time.perf_counter() - started) * 1000, 3)
+    _report_cache.set(key, version, value)
+    return {**value, "cached": False}
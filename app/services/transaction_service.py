@@ -1,41 +1,102 @@
 import uuid
-from datetime import date
-from dateutil.relativedelta import relativedelta
-from .. import crud
+import json
+import time
+import base64
+from datetime import date, timedelta
+from .. import acrud, crud
+from ..cache import VersionedLRUCache
+from ..config import RECURRENCE_WINDOW_DAYS
+from ..recurrence import RECURRENCE_UNITS, normalize_unit, occurrence_dates
 
-def get_all_transactions(user_id: int, page: int, page_size: int, **filters):
-    """Applies filtering and pagination to retrieve transactions."""
-    df, total_count = crud.get_all_transactions(
+# Total counts keyed by (user_id, filter signature), valid until the user's data version changes.
+_count_cache = VersionedLRUCache(max_entries=2048)
+
+_COUNT_FILTER_KEYS = ('account_ids', 'category_ids', 'start_date', 'end_date', 'search_query', 'is_recurrent', 'amount_min', 'amount_max')
+
+def get_count_cache_stats():
+    """Hit/miss counters of the transaction count cache."""
+    return _count_cache.stats()
+
+def _encode_cursor(sort_by: str, sort_order: str, last_tx: dict):
+    payload = {"s": sort_by, "o": sort_order, "v": last_tx[sort_by], "id": last_tx['id']}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor: str, sort_by: str, sort_order: str):
+    """Decodes an opaque cursor into the (sort value, id) pair to seek after."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, last_id = payload['v'], int(payload['id'])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid pagination cursor.")
+    if payload.get('s') != sort_by or payload.get('o') != sort_order:
+        raise ValueError("The pagination cursor does not match the requested sort order.")
+    return value, last_id
+
+async def _get_total_count(user_id: int, count_filters: dict):
+    """Returns the total for a filter signature, recounting only after the user's data changed."""
+    signature = (user_id,) + tuple(
+        tuple(sorted(v)) if isinstance(v, list) else v for v in (count_filters.get(k) for k in _COUNT_FILTER_KEYS)
+    )
+    version = await acrud.get_data_version(user_id)
+    total_count = _count_cache.get(signature, version)
+    if total_count is None:
+        total_count = await acrud.count_transactions(user_id, **count_filters)
+        _count_cache.set(signature, version, total_count)
+    return total_count
+
+async def get_all_transactions(user_id: int, page: int, page_size: int, cursor: str | None = None, use_cursor: bool = False, include_total: bool = True, **filters):
+    """
+    Applies filtering and pagination to retrieve transactions.
+    Offset mode (the default) returns `page`/`total_count`. Cursor mode (`use_cursor` or a `cursor`)
+    returns `next_cursor`/`has_more`, plus `total_count` unless `include_total` is False.
+    A search can be ordered by relevance with sort_by='relevance' in offset mode.
+    """
+    sort_by = filters.get('sort_by') or 'date'
+    if sort_by == 'relevance' and not filters.get('search_query'):
+        sort_by = 'date'
+    if sort_by not in crud.TRANSACTION_SORT_COLUMNS and sort_by != 'relevance':
+        sort_by = 'date'
+    sort_order = 'desc' if (filters.get('sort_order') or 'desc').lower() == 'desc' else 'asc'
+    count_filters = {k: filters.get(k) for k in _COUNT_FILTER_KEYS}
+
+    use_cursor = use_cursor or cursor is not None
+    if use_cursor and sort_by == 'relevance':
+        raise ValueError("Relevance sorting is only available with offset pagination.")
+    after = _decode_cursor(cursor, sort_by, sort_order) if cursor else None
+    transactions_list = await acrud.get_all_transactions(
         user_id=user_id,
         page=page,
-        page_size=page_size,
-        account_ids=filters.get('account_ids'),
-        category_ids=filters.get('category_ids'),
-        start_date=filters.get('start_date'),
-        end_date=filters.get('end_date'),
-        search_query=filters.get('search_query'),
-        is_recurrent=filters.get('is_recurrent'),
-        amount_min=filters.get('amount_min'),
-        amount_max=filters.get('amount_max'),
-        sort_by=filters.get('sort_by', 'date'),
-        sort_order=filters.get('sort_order', 'desc')
+        # In cursor mode one extra row tells us whether another page exists without counting.
+        page_size=page_size + 1 if use_cursor else page_size,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        after=after,
+        **count_filters
     )
-    
-    transactions_list = df.to_dict(orient="records")
-    for tx in transactions_list:
-        tx['category'] = {
-            'name': tx.pop('category_name', None),
-            'i18n_key': tx.pop('category_i18n_key', None)
+
+
+    if use_cursor:
+        has_more = len(transactions_list) > page_size
+        transactions_list = transactions_list[:page_size]
+        result = {
+            "transactions": transactions_list,
+            "page_size": page_size,
+            "has_more": has_more,
+            "next_cursor": _encode_cursor(sort_by, sort_order, transactions_list[-1]) if has_more else None
         }
+        if include_total:
+            result["total_count"] = await _get_total_count(user_id, count_filters)
+        return result
         
     return {
         "transactions": transactions_list,
-        "total_count": total_count,
+        "total_count": await _get_total_count(user_id, count_filters),
         "page": page,
         "page_size": page_size
     }
 
-def create_transaction_with_recurrence(transaction_data: dict, user_id: int):
+async def create_transaction_with_recurrence(transaction_data: dict, user_id: int):
     """
     Handles all transaction creation logic: simple, claiming a pending one,
     linking to a series, or creating a new series.
@@ -47,8 +108,8 @@ def create_transaction_with_recurrence(transaction_data: dict, user_id: int):
         updates = transaction_data.copy()
         updates['status'] = 'confirmed'
         updates.pop('update_pending_id', None)
-        crud.update_transaction(transaction_id=update_id, user_id=user_id, updates=updates)
-        return crud.get_transaction_by_id(update_id, user_id)
+        await acrud.update_transaction(transaction_id=update_id, user_id=user_id, updates=updates)
+        return await acrud.get_transaction_by_id(update_id, user_id)
 
     # --- FLOW 2: User is creating a new transaction (recurrent or not) ---
     is_recurrent = transaction_data.get('is_recurrent', False)
@@ -66,18 +127,19 @@ def create_transaction_with_recurrence(transaction_data: dict, user_id: int):
         "recurrence_id": transaction_data.get('recurrence_id')
     }
 
-    new_id = crud.add_transaction(**master_data)
+    new_id = await acrud.add_transaction(**master_data)
     
     is_new_series = is_recurrent and not transaction_data.get('recurrence_id')
     if is_new_series:
-        master_tx = crud.get_transaction_by_id(new_id, user_id)
-        _generate_series_from_master(master_tx, user_id, transaction_data)
+        master_tx = await acrud.get_transaction_by_id(new_id, user_id)
+        series_generation = await _generate_series_from_master(master_tx, user_id, transaction_data)
+        return {**await acrud.get_transaction_by_id(new_id, user_id), "series_generation": series_generation}
     
-    return crud.get_transaction_by_id(new_id, user_id)
+    return await acrud.get_transaction_by_id(new_id, user_id)
 
-def update_transaction_with_recurrence(transaction_id: int, transaction_data: dict, user_id: int):
+async def update_transaction_with_recurrence(transaction_id: int, transaction_data: dict, user_id: int):
     """Updates a transaction, handling all recurrence toggle logic based on user specification."""
-    original_tx = crud.get_transaction_by_id(transaction_id, user_id)
+    original_tx = await acrud.get_transaction_by_id(transaction_id, user_id)
     if not original_tx:
         raise ValueError("Transaction not found.")
 
@@ -86,8 +148,8 @@ def update_transaction_with_recurrence(transaction_id: int, transaction_data: di
     # CASE 1: The user is simply confirming a pending transaction.
     if original_tx.get('status') == 'pending' and not is_rule_change:
         transaction_data['status'] = 'confirmed'
-        crud.update_transaction(transaction_id, user_id, transaction_data)
-        return crud.get_transaction_by_id(transaction_id, user_id)
+        await acrud.update_transaction(transaction_id, user_id, transaction_data)
+        return await acrud.get_transaction_by_id(transaction_id, user_id)
 
     was_recurrent = original_tx.get('is_recurrent', False)
     recurrence_id = original_tx.get('recurrence_id')
@@ -102,127 +164,132 @@ def update_transaction_with_recurrence(transaction_id: int, transaction_data: di
         transaction_data['recurrence_end_date'] = None
         
         if recurrence_id:
-            confirmed_count = crud.count_confirmed_transactions_in_series(recurrence_id, user_id)
+            confirmed_count = await acrud.count_confirmed_transactions_in_series(recurrence_id, user_id)
             if confirmed_count <= 1:
                 # This was the last confirmed one, so delete the pending series
-                crud.delete_pending_transactions_by_recurrence_id(recurrence_id, user_id)
+                await acrud.delete_pending_transactions_by_recurrence_id(recurrence_id, user_id)
     # Update the main transaction record in the database
-    crud.update_transaction(transaction_id, user_id, transaction_data)
+    await acrud.update_transaction(transaction_id, user_id, transaction_data)
     
     if (is_now_recurrent and not was_recurrent) or (was_recurrent and is_now_recurrent and is_rule_change):
-        confirmed_count = crud.count_confirmed_transactions_in_series(recurrence_id, user_id) if recurrence_id else 0
+        confirmed_count = await acrud.count_confirmed_transactions_in_series(recurrence_id, user_id) if recurrence_id else 0
         if confirmed_count <= 1:
             if recurrence_id:
-                crud.delete_pending_transactions_by_recurrence_id(recurrence_id, user_id)
+                await acrud.delete_pending_transactions_by_recurrence_id(recurrence_id, user_id)
             
-            updated_tx = crud.get_transaction_by_id(transaction_id, user_id)
+            updated_tx = await acrud.get_transaction_by_id(transaction_id, user_id)
             if updated_tx:
-                _generate_series_from_master(updated_tx, user_id, transaction_data)
-    return crud.get_transaction_by_id(transaction_id, user_id)
+                series_generation = await _generate_series_from_master(updated_tx, user_id, transaction_data)
+                return {**await acrud.get_transaction_by_id(transaction_id, user_id), "series_generation": series_generation}
+    return await acrud.get_transaction_by_id(transaction_id, user_id)
 
-def _generate_series_from_master(master_tx: dict, user_id: int, recurrence_rules: dict):
-    """Internal helper to generate and save a series of pending transactions."""
+def _materialization_horizon():
+    return date.today() + timedelta(days=RECURRENCE_WINDOW_DAYS)
+
+async def _generate_series_from_master(master_tx: dict, user_id: int, recurrence_rules: dict):
+    """
+    Internal helper to store a series rule and its pending transactions inside the rolling window.
+    Later occurrences are materialized from the rule on demand by _materialize_pending.
+    Returns how many rows were generated and how long it took.
+    """
+    started = time.perf_counter()
     new_recurrence_id = str(uuid.uuid4())
-    frequency_num = recurrence_rules.get('recurrence_num', 1)
+    frequency_num = recurrence_rules.get('recurrence_num') or 1
     frequency_unit = recurrence_rules.get('recurrence_unit')
     end_date_str = recurrence_rules.get('recurrence_end_date')
 
     if not frequency_unit:
-        crud.update_transaction(master_tx['id'], user_id, {"recurrence_id": new_recurrence_id})
-        return
+        await acrud.update_transaction(master_tx['id'], user_id, {"recurrence_id": new_recurrence_id})
+        return {"generated_count": 0, "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+    if normalize_unit(frequency_unit) not in RECURRENCE_UNITS:
+        raise ValueError(f"Invalid recurrence unit '{frequency_unit}'.")
 
     start_date = date.fromisoformat(master_tx['date'])
+    until = _materialization_horizon()
     if end_date_str:
-        end_date = date.fromisoformat(end_date_str)
-    else:
-        # If no end date is provided, default to generating for the next 5 years.
-        end_date = start_date + relativedelta(years=5)
+        until = min(until, date.fromisoformat(end_date_str))
 
-    unit = 'years' if frequency_unit == 'yearly' else frequency_unit # Handles your frontend change
-    delta_args = {unit: frequency_num}
-    delta = relativedelta(**delta_args)
+    occurrences, next_step = occurrence_dates(start_date, frequency_unit, frequency_num, until)
+    rule = {
+        "recurrence_id": new_recurrence_id,
+        "recurrence_num": frequency_num,
+        "recurrence_unit": normalize_unit(frequency_unit),
+        "end_date": end_date_str or None,
+    }
+    generated_count = await acrud.create_recurrence_series(master_tx, user_id, rule, [str(d) for d in occurrences], next_step, str(until))
+    return {"generated_count": generated_count, "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)}
 
-    crud.update_transaction(
-        master_tx['id'],
-        user_id,
-        {"recurrence_id": new_recurrence_id}
-    )
+def _rule_limit(rule: dict, until: date):
+    return min(until, date.fromisoformat(rule['end_date'])) if rule['end_date'] else until
 
-    current_date = start_date + delta
-    while current_date <= end_date:
-        crud.add_transaction(
-            date=str(current_date),
-            description=master_tx.get('description'),
-            amount=master_tx.get('amount'),
-            currency=master_tx.get('currency'),
-            is_recurrent=True,
-            account_id=master_tx.get('account_id'),
-            category_id=master_tx.get('category_id'),
-            user_id=user_id,
-            recurrence_id=new_recurrence_id,
-            status='pending'
+async def _materialize_pending(user_id: int, recurrence_id: str | None = None):
+    """Tops up the pending rows of the user's series to the rolling window. Only a read when every rule is current."""
+    until = _materialization_horizon()
+    for rule in await acrud.get_recurrence_rules_to_materialize(user_id, str(until), recurrence_id):
+        limit = _rule_limit(rule, until)
+        occurrences, next_step = occurrence_dates(
+            date.fromisoformat(rule['start_date']), rule['recurrence_unit'], rule['recurrence_num'], limit, first_step=rule['next_step']
         )
-        current_date += delta
+        await acrud.materialize_recurrence_occurrences(rule, user_id, [str(d) for d in occurrences], next_step, str(limit))
 
-def delete_transaction(transaction_id: int, user_id: int):
+async def delete_transaction(transaction_id: int, user_id: int):
     """Handles the business logic for deleting a transaction based on the new rules."""
-    original_tx = crud.get_transaction_by_id(transaction_id, user_id)
+    original_tx = await acrud.get_transaction_by_id(transaction_id, user_id)
     if not original_tx:
         return True # Already deleted, so success
 
     # Handle transfers first, as they are a special case
     if original_tx.get('transfer_id'):
-        crud.delete_entire_transfer(original_tx['transfer_id'], user_id)
+        await acrud.delete_entire_transfer(original_tx['transfer_id'], user_id)
         return True
 
     recurrence_id = original_tx.get('recurrence_id')
     if recurrence_id:
-        confirmed_count = crud.count_confirmed_transactions_in_series(recurrence_id, user_id)
+        confirmed_count = await acrud.count_confirmed_transactions_in_series(recurrence_id, user_id)
         
         # If this is the last confirmed transaction in the series
         if confirmed_count <= 1 and original_tx.get('status') == 'confirmed':
             # Delete the entire series (this transaction + all pending)
-            crud.delete_entire_series(recurrence_id, user_id)
+            await acrud.delete_entire_series(recurrence_id, user_id)
         else:
             # Just delete this single transaction, leave the rest of the series
-            crud.delete_transaction_by_id(transaction_id, user_id)
+            await acrud.delete_transaction_by_id(transaction_id, user_id)
     else:
         # It's a simple non-recurrent, non-transfer transaction
-        crud.delete_transaction_by_id(transaction_id, user_id)
+        await acrud.delete_transaction_by_id(transaction_id, user_id)
         
     return True
 
 # --- Transfers ---
-def get_transfer_details(transfer_id: str, user_id: int):
+async def get_transfer_details(transfer_id: str, user_id: int):
     """Retrieves the details of a specific transfer."""
-    transfer = crud.get_transfer(transfer_id, user_id)
+    transfer = await acrud.get_transfer(transfer_id, user_id)
     if not transfer:
         raise ValueError("Transfer not found.")
     return transfer
 
-def create_transfer(date: str, description: str, amount: float, from_account_id: int, to_account_id: int, user_id: int):
+async def create_transfer(date: str, description: str, amount: float, from_account_id: int, to_account_id: int, user_id: int):
     if from_account_id == to_account_id:
         raise ValueError("Cannot transfer to the same account.")
-    transfer_category_id_str = crud.get_setting('transfer_category_id', user_id)
+    transfer_category_id_str = await acrud.get_setting('transfer_category_id', user_id)
     if not transfer_category_id_str:
         raise ValueError("Transfer category is not configured.")
     transfer_category_id = int(transfer_category_id_str)
-    transfer_id = str(uuid.uuid4())
-    crud.add_transaction(date=date, description=description, amount=-abs(amount), currency='EUR', is_recurrent=False, account_id=from_account_id, category_id=transfer_category_id, user_id=user_id, transfer_id=transfer_id)
-    crud.add_transaction(date=date, description=description, amount=abs(amount), currency='EUR', is_recurrent=False, account_id=to_account_id, category_id=transfer_category_id, user_id=user_id, transfer_id=transfer_id)
+    await acrud.create_transfer(str(uuid.uuid4()), date, description, amount, 'EUR', from_account_id, to_account_id, transfer_category_id, user_id)
     return {"status": "success", "message": "Transfer created."}
 
-def update_transfer(transfer_id: str, date: date, amount: float, from_account_id: int, to_account_id: int, user_id: int):
+async def update_transfer(transfer_id: str, date: date, amount: float, from_account_id: int, to_account_id: int, user_id: int):
     """Updates an existing transfer."""
-    return crud.update_transfer(transfer_id, date, amount, from_account_id, to_account_id, user_id)
+    return await acrud.update_transfer(transfer_id, date, amount, from_account_id, to_account_id, user_id)
 
-def batch_process_transactions(instructions: list, user_id: int):
+async def batch_process_transactions(instructions: list, user_id: int):
     """Processes a batch of instructions (e.g., delete, recategorize) for transactions."""
-    return crud.process_batch_instructions(instructions, user_id)
+    return await acrud.process_batch_instructions(instructions, user_id)
 
-def get_all_recurrence_series(user_id: int):
+async def get_all_recurrence_series(user_id: int):
     """Retrieves all master recurrent transactions and formats the category data."""
-    series_list = crud.get_master_recurrent_transactions(user_id)
+    series_list = await acrud.get_master_recurrent_transactions(user_id)
     for series in series_list:
         # Create the nested category object the frontend expects
         series['category'] = {
@@ -231,18 +298,44 @@ def get_all_recurrence_series(user_id: int):
         }
     return series_list
 
-def get_pending_transactions_for_series(recurrence_id: str, user_id: int):
-    """Retrieves all pending transactions for a given recurrence series."""
-    return crud.get_pending_transactions_by_recurrence_id(recurrence_id, user_id)
+async def get_pending_transactions_for_series(recurrence_id: str, user_id: int):
+    """Retrieves the pending transactions of a recurrence series within the rolling window."""
+    await _materialize_pending(user_id, recurrence_id)
+    return await acrud.get_pending_transactions_by_recurrence_id(recurrence_id, user_id)
+
+async def get_recurrence_forecast(user_id: int, until: date):
+    """
+    Lists every pending occurrence up to `until`: the materialized rows plus occurrences generated
+    on the fly from the rules beyond their window. Generated ones have no id and are not stored.
+    """
+    await _materialize_pending(user_id)
+    forecast = await acrud.get_pending_transactions(user_id, str(until))
+    for tx in forecast:
+        tx['materialized'] = True
+    for rule in await acrud.get_recurrence_rules(user_id):
+        occurrences, _ = occurrence_dates(
+            date.fromisoformat(rule['start_date']), rule['recurrence_unit'], rule['recurrence_num'], _rule_limit(rule, until), first_step=rule['next_step']
+        )
+        forecast.extend(
+            {
+                "id": None, "user_id": user_id, "date": str(d), "description": rule['description'], "amount": rule['amount'],
+                "currency": rule['currency'], "account_id": rule['account_id'], "category_id": rule['category_id'],
+                "is_recurrent": 1, "recurrence_id": rule['recurrence_id'], "status": 'pending', "materialized": False,
+            }
+            for d in occurrences
+        )
+    forecast.sort(key=lambda tx: tx['date'])
+    return forecast
 
-def get_confirmed_count_for_series(recurrence_id: str, user_id: int):
+async def get_confirmed_count_for_series(recurrence_id: str, user_id: int):
     """Gets the count of confirmed transactions in a specific recurrence series."""
-    count = crud.count_confirmed_transactions_in_series(recurrence_id, user_id)
+    count = await acrud.count_confirmed_transactions_in_series(recurrence_id, user_id)
     return {"count": count}
 
-def get_due_pending_transactions(user_id: int):
+async def get_due_pending_transactions(user_id: int):
     """Retrieves all due pending transactions and formats the category data."""
-    transactions_list = crud.get_due_pending_transactions(user_id)
+    await _materialize_pending(user_id)
+    transactions_list = await acrud.get_due_pending_transactions(user_id)
     for tx in transactions_list:
         tx['category'] = {
             'name': tx.pop('category_name', None),
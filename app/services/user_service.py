@@ -1,15 +1,15 @@
-from .. import crud
+from .. import acrud
 from typing import Optional
 
-def get_all_users():
+async def get_all_users():
     """Retrieves all users."""
-    return crud.get_users()
+    return await acrud.get_users()
 
-def create_new_user(first_name: str, second_name: Optional[str], surname: str, preferred_currency: str):
+async def create_new_user(first_name: str, second_name: Optional[str], surname: str, preferred_currency: str):
     """Creates a new user, sets currency, and populates default hybrid categories."""
-    user_id = crud.create_user(first_name, second_name, surname)
+    user_id = await acrud.create_user(first_name, second_name, surname)
     
-    crud.update_setting(user_id=user_id, key='preferred_currency', value=preferred_currency)
+    await acrud.update_setting(user_id=user_id, key='preferred_currency', value=preferred_currency)
     
     default_categories = [
         {"name": "Groceries", "key": "category_groceries"},
@@ -25,7 +25,7 @@ def create_new_user(first_name: str, second_name: Optional[str], surname: str, p
     
     transfer_category_id = None
     for cat in default_categories:
-        new_cat_id = crud.add_category(
+        new_cat_id = await acrud.add_category(
             category_name=cat["name"], 
             user_id=user_id, 
             i18n_key=cat["key"]
@@ -34,6 +34,6 @@ def create_new_user(first_name: str, second_name: Optional[str], surname: str, p
             transfer_category_id = new_cat_id
             
     if transfer_category_id:
-        crud.update_setting(user_id=user_id, key='transfer_category_id', value=str(transfer_category_id))
+        await acrud.update_setting(user_id=user_id, key='transfer_category_id', value=str(transfer_category_id))
     
     return {"id": user_id, "first_name": first_name, "second_name": second_name, "surname": surname}
\ No newline at end of file
@@ -0,0 +1,179 @@
+# app/sql_sandbox.py
+"""
+Sandbox for the SQL the assistant generates.
+
+Queries run on a small pool of dedicated threads, never on the event loop or the reader threads. Each thread keeps
+its own read-only connection: an empty in-memory main database with the real one attached under a random schema
+name, and a TEMP view for every table the assistant may read, the per-user ones filtered on the calling user.
+An authorizer only lets SELECTs read those views, and the real tables only on a view's behalf. A progress handler
+aborts a query once its wall-clock budget is spent, and at most AI_SQL_MAX_ROWS rows are returned.
+"""
+import asyncio
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import metrics
+from .config import DB_PATH, DB_BUSY_TIMEOUT, AI_SQL_WORKERS, AI_SQL_TIMEOUT, AI_SQL_MAX_ROWS
+
+# Per-user tables, each shadowed by a view holding only the calling user's rows.
+USER_TABLES = {
+    'users': 'id',
+    'accounts': 'user_id',
+    'categories': 'user_id',
+    'settings': 'user_id',
+    'transactions': 'user_id',
+    'recurrence_series': 'user_id',
+    'transfers': 'user_id',
+    'account_balances': 'user_id',
+    'balance_checkpoints': 'user_id',
+}
+# Tables with no owner, readable as they are.
+SHARED_TABLES = ('currencies', 'exchange_rates')
+# Unknown to the generated SQL, so it can only name the views, which shadow nothing else.
+_DATA_SCHEMA = f"data_{secrets.token_hex(8)}"
+# SQLite virtual machine instructions between two deadline checks.
+_PROGRESS_INTERVAL = 1000
+
+_VIEWS = {*USER_TABLES, *SHARED_TABLES}
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+_ACTION_NAMES = {
+    value: name[len('SQLITE_'):].lower()
+    for name, value in vars(sqlite3).items()
+    if name.startswith('SQLITE_') and isinstance(value, int) and name not in ('SQLITE_OK', 'SQLITE_DENY', 'SQLITE_IGNORE')
+}
+
+
+class SqlSandboxError(Exception):
+    """
+    A query the sandbox refused or stopped. `code` is 'rejected' (it touched something outside the user's data
+    or tried to write), 'timeout' (it ran past its budget) or 'invalid' (SQLite could not run it).
+    """
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+    def to_dict(self):
+        return {"code": self.code, "message": self.message}
+
+
+# --- Worker connections ---
+class _Worker(threading.local):
+    conn = None
+    user_id = None
+    deadline = 0.0
+    denied = None
+
+_worker = _Worker()
+_connections = []
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _authorize(action, arg1, arg2, database, source):
+    if action in _ALLOWED_ACTIONS:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_READ:
+        # A view reads the table it is named after on the caller's behalf, already filtered. Reads outside any
+        # schema are of CTEs and subqueries, whose own reads were authorized.
+        if database is None and arg1 not in ('sqlite_master', 'sqlite_temp_master'):
+            return sqlite3.SQLITE_OK
+        if database == 'temp' and arg1 in _VIEWS or database == _DATA_SCHEMA and source == arg1 and arg1 in _VIEWS:
+            return sqlite3.SQLITE_OK
+        _worker.denied = f"reading '{arg1}'"
+    else:
+        _worker.denied = f"{_ACTION_NAMES.get(action, action)} {arg1 or ''}".strip()
+    return sqlite3.SQLITE_DENY
+
+def _past_deadline():
+    return time.monotonic() > _worker.deadline
+
+def _open_connection():
+    """Opens this worker thread's connection and installs the user views, authorizer and deadline check."""
+    conn = sqlite3.connect(":memory:", uri=True, timeout=DB_BUSY_TIMEOUT, check_same_thread=False)
+    conn.execute(f"ATTACH DATABASE ? AS {_DATA_SCHEMA}", (f"file:{DB_PATH}?mode=ro",))
+    # Deterministic, so SQLite evaluates it once per statement and can still search the user_id indexes.
+    conn.create_function("sandbox_user_id", 0, lambda: _worker.user_id, deterministic=True)
+    for table, owner_column in USER_TABLES.items():
+        conn.execute(f"CREATE TEMP VIEW {table} AS SELECT * FROM {_DATA_SCHEMA}.{table} WHERE {owner_column} = sandbox_user_id()")
+    for table in SHARED_TABLES:
+        conn.execute(f"CREATE TEMP VIEW {table} AS SELECT * FROM {_DATA_SCHEMA}.{table}")
+    conn.execute("PRAGMA query_only = 1;")
+    conn.set_authorizer(_authorize)
+    conn.set_progress_handler(_past_deadline, _PROGRESS_INTERVAL)
+    _worker.conn = conn
+    with _executor_lock:
+        _connections.append(conn)
+
+def _get_executor():
+    """Returns the sandbox executor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=AI_SQL_WORKERS, thread_name_prefix="trakfin-ai-sql", initializer=_open_connection)
+    return _executor
+
+def shutdown():
+    """Stops the sandbox threads and closes their connections."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+    with _executor_lock:
+        while _connections:
+            _connections.pop().close()
+
+
+# --- Queries ---
+def execute(sql: str, user_id: int, timeout: float = AI_SQL_TIMEOUT, max_rows: int = AI_SQL_MAX_ROWS):
+    """
+    Runs one SELECT for a user on the calling sandbox thread. Returns (columns, rows, truncated), where
+    truncated tells that the query had more than max_rows rows. Raises SqlSandboxError.
+    """
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        return _execute(sql, user_id, timeout, max_rows)
+    except SqlSandboxError as e:
+        outcome = e.code
+        raise
+    finally:
+        metrics.AI_SQL_DURATION.observe(time.perf_counter() - started, outcome)
+
+def _execute(sql: str, user_id: int, timeout: float, max_rows: int):
+    conn = _worker.conn
+    _worker.user_id = user_id
+    _worker.denied = None
+    _worker.deadline = time.monotonic() + timeout
+    cursor = None
+    try:
+        cursor = conn.execute(sql)
+        if cursor.description is None:
+            raise SqlSandboxError('rejected', "Only SELECT queries are allowed.")
+        columns = [col[0] for col in cursor.description]
+        rows = cursor.fetchmany(max_rows + 1)
+    except sqlite3.DatabaseError as e:
+        if _worker.denied:
+            raise SqlSandboxError('rejected', f"The query is not allowed: {_worker.denied}.")
+        if getattr(e, 'sqlite_errorname', None) == 'SQLITE_INTERRUPT':
+            raise SqlSandboxError('timeout', f"The query did not finish within {timeout:g} seconds.")
+        raise SqlSandboxError('invalid', str(e))
+    except sqlite3.Error as e:
+        raise SqlSandboxError('invalid', str(e))
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn.in_transaction:
+            conn.rollback()
+        _worker.user_id = None
+    return columns, rows[:max_rows], len(rows) > max_rows
+
+async def run_query(sql: str, user_id: int, timeout: float = AI_SQL_TIMEOUT, max_rows: int = AI_SQL_MAX_ROWS):
+    """Awaitable variant of execute, run on the sandbox threads."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), execute, sql, user_id, timeout, max_rows)
@@ -0,0 +1,229 @@
+# app/writer.py
+"""
+Single-writer queue with group commit.
+
+Every mutation is submitted as a job. One thread drains the queue, runs the jobs that arrived
+within a short window inside a single BEGIN IMMEDIATE transaction (each job in its own savepoint),
+commits once and then resolves every job's future with its own result or error.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from .db import get_pool
+from .config import WRITE_BATCH_WINDOW_MS, WRITE_BATCH_MAX_JOBS
+
+_job_state = threading.local()
+
+
+def current_connection():
+    """Returns the savepoint connection of the job running on this thread, or None outside a batch."""
+    return getattr(_job_state, "connection", None)
+
+
+class _SavepointConnection:
+    """
+    The writer connection as one job of a batch sees it. commit() only marks the job's work so far
+    as kept and rollback() undoes the job's work since then; the batch decides when to really commit.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, savepoint: str):
+        self._conn = conn
+        self._savepoint = savepoint
+
+    def commit(self):
+        self._conn.execute(f"RELEASE {self._savepoint}")
+        self._conn.execute(f"SAVEPOINT {self._savepoint}")
+
+    def rollback(self):
+        self._conn.execute(f"ROLLBACK TO {self._savepoint}")
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "exclusive", "future", "enqueued_at")
+
+    def __init__(self, fn, args, kwargs, exclusive):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.exclusive = exclusive
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class WriteQueue:
+    """
+    Serializes all writes through one thread and commits concurrent ones together.
+    Exclusive jobs run alone on the raw writer connection in their own transaction: migrations, which manage
+    their own transactions, and bulk writes, for which a savepoint would copy every touched page into the
+    sub-journal and cost more than group commit saves.
+    """
+
+    _STOP = object()
+
+    def __init__(self, window_ms: float = 2.0, max_batch: int = 64):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "jobs": 0, "failed_jobs": 0, "batches": 0, "failed_batches": 0,
+            "queue_depth_max": 0, "batch_size_max": 0,
+            "commit_time_total": 0.0, "commit_time_max": 0.0,
+            "queue_wait_total": 0.0, "queue_wait_max": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name="trakfin-db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, args=(), kwargs=None, exclusive: bool = False) -> Future:
+        """Queues fn(*args, **kwargs) for the writer thread and returns a future for its result."""
+        job = _Job(fn, args, kwargs or {}, exclusive)
+        self._queue.put(job)
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats["queue_depth_max"] = max(self._stats["queue_depth_max"], depth)
+        return job.future
+
+    def _next_batch(self, first: _Job):
+        """Collects the jobs already queued plus those arriving within the window, stopping at an exclusive job."""
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if job is self._STOP or job.exclusive:
+                return batch, job
+            batch.append(job)
+        return batch, None
+
+    def _run(self):
+        held = None
+        while True:
+            job = held if held is not None else self._queue.get()
+            held = None
+            if job is self._STOP:
+                return
+            if job.exclusive:
+                self._run_exclusive(job)
+                continue
+            batch, held = self._next_batch(job)
+            self._run_batch(batch)
+
+    def _run_exclusive(self, job: _Job):
+        self._record_wait([job])
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+        except BaseException as e:
+            self._record_batch(1, 0.0, failed_jobs=1)
+            job.future.set_exception(e)
+            return
+        self._record_batch(1, 0.0)
+        job.future.set_result(result)
+
+    def _run_job(self, conn: sqlite3.Connection, index: int, job: _Job):
+        savepoint = f"job_{index}"
+        conn.execute(f"SAVEPOINT {savepoint}")
+        _job_state.connection = _SavepointConnection(conn, savepoint)
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+        except Exception as e:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+            return False, e
+        finally:
+            _job_state.connection = None
+        conn.execute(f"RELEASE {savepoint}")
+        return True, result
+
+    def _run_batch(self, batch: list):
+        self._record_wait(batch)
+        try:
+            with get_pool().writer() as conn:
+                conn.execute("BEGIN IMMEDIATE;")
+                outcomes = [self._run_job(conn, i, job) for i, job in enumerate(batch)]
+                commit_started = time.perf_counter()
+                conn.commit()
+                commit_time = time.perf_counter() - commit_started
+        except BaseException as e:
+            # The whole transaction is gone, so no job in it took effect.
+            self._record_batch(len(batch), 0.0, failed_jobs=len(batch), failed_batch=True)
+            for job in batch:
+                job.future.set_exception(e)
+            return
+        failed = sum(1 for ok, _ in outcomes if not ok)
+        self._record_batch(len(batch), commit_time, failed_jobs=failed)
+        for job, (ok, value) in zip(batch, outcomes):
+            if ok:
+                job.future.set_result(value)
+            else:
+                job.future.set_exception(value)
+
+    def _record_wait(self, batch: list):
+        now = time.perf_counter()
+        with self._stats_lock:
+            for job in batch:
+                waited = now - job.enqueued_at
+                self._stats["queue_wait_total"] += waited
+                self._stats["queue_wait_max"] = max(self._stats["queue_wait_max"], waited)
+
+    def _record_batch(self, size: int, commit_time: float, failed_jobs: int = 0, failed_batch: bool = False):
+        with self._stats_lock:
+            s = self._stats
+            s["jobs"] += size
+            s["failed_jobs"] += failed_jobs
+            s["batches"] += 1
+            s["failed_batches"] += int(failed_batch)
+            s["batch_size_max"] = max(s["batch_size_max"], size)
+            s["commit_time_total"] += commit_time
+            s["commit_time_max"] = max(s["commit_time_max"], commit_time)
+
+    def stats(self):
+        """Returns queue depth, batch size, commit latency and queue wait counters."""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        batches, jobs = snapshot["batches"], snapshot["jobs"]
+        snapshot["queue_depth"] = self._queue.qsize()
+        snapshot["batch_size_avg"] = jobs / batches if batches else 0.0
+        snapshot["commit_time_avg"] = snapshot["commit_time_total"] / batches if batches else 0.0
+        snapshot["queue_wait_avg"] = snapshot["queue_wait_total"] / jobs if jobs else 0.0
+        snapshot["window_ms"] = self.window * 1000
+        snapshot["max_batch"] = self.max_batch
+        return snapshot
+
+    def close(self):
+        """Finishes the queued jobs and stops the writer thread."""
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+def get_write_queue() -> WriteQueue:
+    """Returns the process-wide write queue, starting its thread on first use."""
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue(window_ms=WRITE_BATCH_WINDOW_MS, max_batch=WRITE_BATCH_MAX_JOBS)
+    return _write_queue
+
+def close_write_queue():
+    """Drains and stops the process-wide write queue, if one was started."""
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is not None:
+            _write_queue.close()
+            _write_queue = None
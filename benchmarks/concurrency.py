@@ -0,0 +1,130 @@
+# benchmarks/concurrency.py
+"""
+Measures API throughput and latency with many concurrent clients issuing a mixed workload
+(transaction pages, reports, account lists and a share of writes).
+
+Usage: python benchmarks/concurrency.py [--clients 50 200] [--duration 10] [--rows 100000] [--write-ratio 0.1]
+By default the app runs in-process on a throwaway database through httpx's ASGI transport.
+Pass --url http://127.0.0.1:8000 to load a running server instead (it must serve user 1).
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from datetime import date, timedelta
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from dataset import build_dataset
+
+HEADERS = {"X-User-ID": "1"}
+
+
+def _read_request(rng: random.Random):
+    today = date.today()
+    start_date, end_date = str(today - timedelta(days=365)), str(today)
+    return rng.choice((
+        ("GET", "/transactions/", {"page": rng.randint(1, 20), "page_size": 20}),
+        ("GET", "/transactions/", {"pagination": "cursor", "include_total": "false", "page_size": 50}),
+        ("GET", "/reports/balance/", None),
+        ("GET", "/reports/monthly-income-expense-summary/", {"start_date": start_date, "end_date": end_date}),
+        ("GET", "/reports/category-summary/", {"start_date": start_date, "end_date": end_date}),
+        ("GET", "/accounts/", None),
+    ))
+
+def _write_request(rng: random.Random):
+    payload = {
+        "date": str(date.today() - timedelta(days=rng.randrange(365))),
+        "description": "Benchmark write",
+        "amount": round(rng.uniform(-200, -1), 2),
+        "currency": "EUR",
+        "is_recurrent": False,
+        "account_id": rng.randint(1, 5),
+        "category_id": rng.randint(1, 20),
+    }
+    return "POST", "/transactions/", payload
+
+
+async def _client_loop(client: httpx.AsyncClient, seed: int, deadline: float, write_ratio: float, results: dict):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        method, path, data = _write_request(rng) if rng.random() < write_ratio else _read_request(rng)
+        started = time.perf_counter()
+        try:
+            if method == "GET":
+                response = await client.get(path, params=data, headers=HEADERS)
+            else:
+                response = await client.post(path, json=data, headers=HEADERS)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        results["latencies"].append((time.perf_counter() - started) * 1000)
+        if not ok:
+            results["errors"] += 1
+
+async def run_level(client: httpx.AsyncClient, clients: int, duration: float, write_ratio: float):
+    results = {"latencies": [], "errors": 0}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(_client_loop(client, i, deadline, write_ratio, results) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(results["latencies"])
+    p99_index = min(len(latencies) - 1, int(round(0.99 * (len(latencies) - 1))))
+    return {
+        "requests": len(latencies),
+        "errors": results["errors"],
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p99": latencies[p99_index] if latencies else 0.0,
+    }
+
+
+async def main_async(args):
+    limits = httpx.Limits(max_connections=max(args.clients), max_keepalive_connections=max(args.clients))
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60.0)
+    else:
+        from app.api import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", limits=limits, timeout=60.0)
+
+    async with client:
+        await client.get("/accounts/", headers=HEADERS)  # warm up the pool and the executors
+        print(f"\n{'clients':>8}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for clients in args.clients:
+            level = await run_level(client, clients, args.duration, args.write_ratio)
+            print(f"{clients:>8}{level['requests']:>10}{level['errors']:>8}{level['throughput']:>10.1f}{level['p50']:>10.2f}{level['p99']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run each concurrency level.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app.")
+    args = parser.parse_args()
+
+    if not args.url:
+        tmp_dir = tempfile.mkdtemp(prefix="trakfin-bench-")
+        db_path = os.path.join(tmp_dir, "bench.db")
+        os.environ["TRAKFIN_DB_PATH"] = db_path
+        print(f"Building dataset with {args.rows:,} transactions in {db_path}...")
+        build_dataset(db_path, args.rows)
+
+    asyncio.run(main_async(args))
+
+    if not args.url:
+        from app import acrud, db
+        acrud.shutdown()
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# benchmarks/dataset.py
+"""Builds the throwaway databases the benchmarks run against; trakfin.db is never touched."""
+import random
+import sqlite3
+from datetime import date, timedelta
+
+
+def build_dataset(db_path: str, rows: int, seed: int = 42):
+    """
+    Creates the schema through the migrations and bulk-loads `rows` transactions for user 1. Amounts are minor
+    units, and the zero- and three-decimal JPY and KWD sit next to the two-decimal currencies.
+    """
+    from app import migrations
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, first_name TEXT NOT NULL, second_name TEXT, surname TEXT NOT NULL);
+        CREATE TABLE accounts (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, name TEXT NOT NULL, UNIQUE(user_id, name));
+        CREATE TABLE categories (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, name TEXT NOT NULL, UNIQUE(user_id, name));
+        CREATE TABLE transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, date TEXT NOT NULL, description TEXT NOT NULL,
+            amount REAL NOT NULL, currency TEXT NOT NULL, account_id INTEGER NOT NULL, category_id INTEGER NOT NULL,
+            is_recurrent BOOLEAN DEFAULT 0, transfer_id TEXT
+        );
+        CREATE TABLE settings (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, key TEXT NOT NULL, value TEXT, UNIQUE(user_id, key));
+    """)
+    migrations.apply_migrations(conn)
+    conn.execute("INSERT INTO users (first_name, surname) VALUES ('Bench', 'User')")
+    conn.executemany("INSERT INTO accounts (user_id, name) VALUES (1, ?)", [(f"Account {i}",) for i in range(5)])
+    conn.executemany("INSERT INTO categories (user_id, name) VALUES (1, ?)", [(f"Category {i}",) for i in range(20)])
+    start = date.today() - timedelta(days=5 * 365)
+    conn.executemany(
+        "INSERT INTO transactions (user_id, date, description, amount, currency, account_id, category_id, is_recurrent) VALUES (1, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                str(start + timedelta(days=rng.randrange(5 * 365))),
+                f"Transaction {i}",
+                rng.randint(-50000, 300000) if rng.random() < 0.1 else rng.randint(-20000, -100),
+                rng.choice(("EUR", "EUR", "EUR", "USD", "GBP", "JPY", "KWD")),
+                rng.randint(1, 5),
+                rng.randint(1, 20),
+                int(rng.random() < 0.2),
+            )
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.execute("ANALYZE;")
+    conn.close()
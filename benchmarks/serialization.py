@@ -0,0 +1,116 @@
+# benchmarks/serialization.py
+"""
+Compares p50/p99 latency of the legacy pandas serialization path with the direct
+cursor-to-dict + orjson path, for the transaction list and the report queries.
+
+Usage: python benchmarks/serialization.py [--rows 200000] [--iterations 200]
+A throwaway database is created in a temporary directory; trakfin.db is never touched.
+"""
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from datetime import date, timedelta
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from dataset import build_dataset
+
+
+# --- Legacy path (pandas DataFrame + to_dict + second nesting loop + stdlib JSON) ---------------------------
+def legacy_transactions_page(conn, user_id, page_size):
+    query = """
+        SELECT t.id, t.date, t.description, c.name as category_name, c.i18n_key as category_i18n_key, a.name as account,
+               t.amount, t.currency, t.account_id, t.category_id, t.is_recurrent, t.transfer_ref_id, t.status, t.series_id
+        FROM transactions t JOIN categories c ON t.category_id = c.id JOIN accounts a ON t.account_id = a.id
+        WHERE t.user_id = ? AND t.status = 'confirmed' ORDER BY t.date DESC, t.id DESC LIMIT ? OFFSET 0
+    """
+    df = pd.read_sql_query(query, conn, params=[user_id, page_size])
+    transactions_list = df.to_dict(orient="records")
+    for tx in transactions_list:
+        tx['category'] = {'name': tx.pop('category_name', None), 'i18n_key': tx.pop('category_i18n_key', None)}
+    return {"transactions": transactions_list}
+
+def legacy_query(conn, query, params):
+    return pd.read_sql_query(query, conn, params=params).to_dict(orient="records")
+
+
+def measure(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p99_index = min(len(timings) - 1, int(round(0.99 * (len(timings) - 1))))
+    return statistics.median(timings), timings[p99_index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=10)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="trakfin-bench-")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    os.environ["TRAKFIN_DB_PATH"] = db_path
+    print(f"Building dataset with {args.rows:,} transactions in {db_path}...")
+    build_dataset(db_path, args.rows)
+
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from app import acrud, crud, db
+    from app.services import report_service, transaction_service
+
+    # The services are coroutines; one long-lived loop keeps loop setup out of the timings.
+    run = asyncio.new_event_loop().run_until_complete
+    start_date, end_date = str(date.today() - timedelta(days=365)), str(date.today())
+    legacy_conn = sqlite3.connect(db_path)
+    ex = {'EUR': 1.0, 'USD': 0.92, 'GBP': 1.18}  # the rates the app used to hardcode
+    rate_case = f"CASE t.currency WHEN 'EUR' THEN {ex['EUR']} WHEN 'USD' THEN {ex['USD']} WHEN 'GBP' THEN {ex['GBP']} ELSE 1.0 END"
+
+    cases = [
+        (
+            "transactions page",
+            lambda: JSONResponse(legacy_transactions_page(legacy_conn, 1, args.page_size)),
+            lambda: ORJSONResponse(run(transaction_service.get_all_transactions(1, 1, args.page_size, include_total=False, use_cursor=True))),
+        ),
+        (
+            "balance report",
+            lambda: JSONResponse(legacy_query(legacy_conn, f"SELECT a.name, COALESCE(SUM(t.amount * {rate_case}), 0) as balance FROM accounts a LEFT JOIN transactions t ON a.id = t.account_id AND t.user_id = a.user_id AND t.status = 'confirmed' WHERE a.user_id = ? GROUP BY a.name ORDER BY a.name", [1])),
+            lambda: ORJSONResponse(run(report_service.get_balance_report(1))),
+        ),
+        (
+            "balance evolution",
+            lambda: JSONResponse(legacy_query(legacy_conn, f"WITH daily_changes AS (SELECT t.date, SUM(t.amount * {rate_case}) as change FROM transactions t WHERE t.user_id = ? AND t.status = 'confirmed' GROUP BY t.date) SELECT date, SUM(change) OVER (ORDER BY date) as cumulative_balance FROM daily_changes ORDER BY date", [1])),
+            lambda: ORJSONResponse(run(report_service.get_balance_evolution_report(1))),
+        ),
+        (
+            "monthly income/expense",
+            lambda: JSONResponse(legacy_query(legacy_conn, "SELECT strftime('%Y-%m', t.date) as month, SUM(CASE WHEN t.amount > 0 THEN t.amount ELSE 0 END) as income, SUM(CASE WHEN t.amount < 0 THEN ABS(t.amount) ELSE 0 END) as expenses FROM transactions t WHERE t.user_id = ? AND t.status = 'confirmed' AND t.date >= ? AND t.date <= ? GROUP BY strftime('%Y-%m', t.date) ORDER BY strftime('%Y-%m', t.date)", [1, start_date, end_date])),
+            lambda: ORJSONResponse(run(report_service.get_monthly_income_expense_report(1, start_date, end_date))),
+        ),
+    ]
+
+    print(f"\n{'case':<24}{'legacy p50':>12}{'legacy p99':>12}{'new p50':>12}{'new p99':>12}  (ms)")
+    for name, legacy_fn, new_fn in cases:
+        legacy_fn(); new_fn()  # warm up caches and the pool
+        legacy_p50, legacy_p99 = measure(legacy_fn, args.iterations)
+        new_p50, new_p99 = measure(new_fn, args.iterations)
+        print(f"{name:<24}{legacy_p50:>12.3f}{legacy_p99:>12.3f}{new_p50:>12.3f}{new_p99:>12.3f}")
+
+    legacy_conn.close()
+    acrud.shutdown()
+    db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
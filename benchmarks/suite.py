@@ -0,0 +1,325 @@
+# benchmarks/suite.py
+"""
+Drives every service function (the transaction list under each filter, sort and pagination, every report,
+series, transfers and batch processing) against throwaway datasets of increasing size, records latency
+percentiles and peak memory per case, writes them to JSON and compares them with a stored baseline.
+
+Usage: python benchmarks/suite.py [--sizes 10000 100000 1000000 10000000] [--iterations 20] [--cases REGEX]
+                                  [--output results.json] [--baseline baseline.json] [--threshold 0.2]
+Each size runs in its own process on its own database, so caches, the pool and peak RSS start fresh.
+Reads run with the report and count caches cleared before every call; '(cached)' cases measure a warm hit.
+Pass --fail-on-regression to exit with status 1 when a case is slower than the baseline by more than the threshold.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import sqlite3
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import statistics
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from dataset import build_dataset
+
+USER_ID = 1
+DEFAULT_SIZES = [10_000, 100_000]
+# Differences below this many milliseconds are noise, however large the ratio.
+NOISE_FLOOR_MS = 0.2
+
+
+# --- Cases ---
+def _transaction_filters(today: date):
+    year_ago = str(today - timedelta(days=365))
+    return {
+        "none": {},
+        "account": {"account_ids": [1]},
+        "categories": {"category_ids": [2, 3, 4]},
+        "date range": {"start_date": year_ago, "end_date": str(today)},
+        "search": {"search_query": "Transaction 42"},
+        "amount range": {"amount_min": -50.0, "amount_max": -10.0},
+        "recurrent": {"is_recurrent": True},
+        "combined": {"account_ids": [1, 2], "category_ids": [2, 3, 4, 5], "start_date": year_ago, "end_date": str(today), "amount_max": 0.0},
+    }
+
+def build_cases(rows: int, rng: random.Random):
+    """Returns (name, kind, factory) triples; factory() returns a fresh awaitable. kind is 'read', 'cached' or 'write'."""
+    from app.services import transaction_service, report_service
+
+    today = date.today()
+    year_ago = today - timedelta(days=365)
+    cases = []
+
+    def read(name, factory):
+        cases.append((name, "read", factory))
+
+    def write(name, factory):
+        cases.append((name, "write", factory))
+
+    for filter_name, filters in _transaction_filters(today).items():
+        for sort_by in ("date", "amount"):
+            for sort_order in ("desc", "asc"):
+                read(
+                    f"transactions [{filter_name}] {sort_by} {sort_order}",
+                    lambda f=filters, s=sort_by, o=sort_order: transaction_service.get_all_transactions(USER_ID, 1, 20, sort_by=s, sort_order=o, **f),
+                )
+    read("transactions deep offset page 50", lambda: transaction_service.get_all_transactions(USER_ID, 50, 20))
+    read("transactions cursor first page", lambda: transaction_service.get_all_transactions(USER_ID, 1, 50, use_cursor=True, include_total=False))
+
+    async def cursor_tenth_page():
+        page = await transaction_service.get_all_transactions(USER_ID, 1, 50, use_cursor=True, include_total=False)
+        for _ in range(9):
+            page = await transaction_service.get_all_transactions(USER_ID, 1, 50, cursor=page["next_cursor"], include_total=False)
+        return page
+    read("transactions cursor 10 pages", cursor_tenth_page)
+
+    async def cursor_amount_pages():
+        # The dataset mixes zero-, two- and three-decimal currencies; pages must follow the decimal amounts returned.
+        page = await transaction_service.get_all_transactions(USER_ID, 1, 50, use_cursor=True, include_total=False, sort_by="amount")
+        amounts = [tx["amount"] for tx in page["transactions"]]
+        for _ in range(9):
+            page = await transaction_service.get_all_transactions(USER_ID, 1, 50, cursor=page["next_cursor"], include_total=False, sort_by="amount")
+            amounts.extend(tx["amount"] for tx in page["transactions"])
+        if amounts != sorted(amounts, reverse=True):
+            raise AssertionError("Transactions sorted by amount are out of order across currencies.")
+        return page
+    read("transactions cursor 10 pages by amount", cursor_amount_pages)
+    read("transactions search by relevance", lambda: transaction_service.get_all_transactions(USER_ID, 1, 20, sort_by="relevance", search_query="Transaction 42"))
+
+    read("report balance", lambda: report_service.get_balance_report(USER_ID))
+    read("report balance as of", lambda: report_service.get_balance_as_of_report(USER_ID, year_ago))
+    read("report balance evolution day", lambda: report_service.get_balance_evolution_report(USER_ID, start_date=year_ago, end_date=today))
+    read("report balance evolution month", lambda: report_service.get_balance_evolution_report(USER_ID, granularity="month"))
+    read("report category summary expense", lambda: report_service.get_category_summary_report(USER_ID, year_ago, today, "expense"))
+    read("report category summary income", lambda: report_service.get_category_summary_report(USER_ID, year_ago, today, "income"))
+    read("report monthly income/expense", lambda: report_service.get_monthly_income_expense_report(USER_ID, year_ago, today))
+    read("report recurrent summary", lambda: report_service.get_recurrent_summary_report(USER_ID, year_ago, today))
+    read("report dashboard", lambda: report_service.get_dashboard_report(USER_ID, year_ago, today))
+    cases.append(("report balance (cached)", "cached", lambda: report_service.get_balance_report(USER_ID)))
+
+    read("series list", lambda: transaction_service.get_all_recurrence_series(USER_ID))
+    read("series forecast 1 year", lambda: transaction_service.get_recurrence_forecast(USER_ID, today + timedelta(days=365)))
+    read("due pending transactions", lambda: transaction_service.get_due_pending_transactions(USER_ID))
+
+    def new_transaction(**extra):
+        return {
+            "date": str(today - timedelta(days=rng.randrange(365))),
+            "description": "Benchmark write",
+            "amount": round(rng.uniform(-200, -1), 2),
+            "currency": "EUR",
+            "is_recurrent": False,
+            "account_id": rng.randint(1, 5),
+            "category_id": rng.randint(1, 20),
+            **extra,
+        }
+
+    write("create transaction", lambda: transaction_service.create_transaction_with_recurrence(new_transaction(), USER_ID))
+    write("create monthly series", lambda: transaction_service.create_transaction_with_recurrence(
+        new_transaction(is_recurrent=True, recurrence_num=1, recurrence_unit="months"), USER_ID
+    ))
+    write("create weekly series to 2 years", lambda: transaction_service.create_transaction_with_recurrence(
+        new_transaction(is_recurrent=True, recurrence_num=1, recurrence_unit="weeks", recurrence_end_date=str(today + timedelta(days=730))), USER_ID
+    ))
+    write("create transfer", lambda: transaction_service.create_transfer(
+        str(today - timedelta(days=rng.randrange(365))), "Benchmark transfer", round(rng.uniform(1, 500), 2), 1, 2, USER_ID
+    ))
+    write("batch recategorize 100", lambda: transaction_service.batch_process_transactions(
+        [{"action": "recategorize", "transaction_id": rng.randint(1, rows), "target_category_id": rng.randint(1, 20)} for _ in range(100)], USER_ID
+    ))
+    return cases
+
+
+# --- Measurement ---
+def _clear_caches():
+    from app.services import report_service, transaction_service
+    report_service._report_cache.clear()
+    transaction_service._count_cache.clear()
+
+def summarize(samples_ms: list):
+    ordered = sorted(samples_ms)
+    if len(ordered) > 1:
+        cuts = statistics.quantiles(ordered, n=100, method="inclusive")
+        p50, p90, p95, p99 = cuts[49], cuts[89], cuts[94], cuts[98]
+    else:
+        p50 = p90 = p95 = p99 = ordered[0]
+    return {
+        "iterations": len(ordered), "min": ordered[0], "p50": p50, "p90": p90, "p95": p95, "p99": p99,
+        "max": ordered[-1], "mean": statistics.fmean(ordered),
+    }
+
+async def run_case(kind: str, factory, iterations: int):
+    """Times iterations calls, then repeats one under tracemalloc for its peak Python allocation."""
+    if kind == "cached":
+        await factory()
+    samples = []
+    for _ in range(iterations):
+        if kind == "read":
+            _clear_caches()
+        started = time.perf_counter()
+        await factory()
+        samples.append((time.perf_counter() - started) * 1000)
+    if kind == "read":
+        _clear_caches()
+    tracemalloc.start()
+    try:
+        await factory()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {**summarize(samples), "py_peak_kb": peak / 1024}
+
+def _prepare_dataset(db_path: str, rows: int):
+    """Builds the dataset and the transfer category the transfer cases need."""
+    started = time.perf_counter()
+    build_dataset(db_path, rows)
+    conn = sqlite3.connect(db_path)
+    category_id = conn.execute("INSERT INTO categories (user_id, name) VALUES (?, 'Transfers')", (USER_ID,)).lastrowid
+    conn.execute("INSERT INTO settings (user_id, key, value) VALUES (?, 'transfer_category_id', ?)", (USER_ID, str(category_id)))
+    conn.commit()
+    conn.close()
+    return time.perf_counter() - started
+
+async def run_size_async(rows: int, iterations: int, case_filter: str | None, seed: int):
+    rng = random.Random(seed)
+    pattern = re.compile(case_filter) if case_filter else None
+    results = {}
+    for name, kind, factory in build_cases(rows, rng):
+        if pattern and not pattern.search(name):
+            continue
+        results[name] = await run_case(kind, factory, iterations)
+        r = results[name]
+        print(f"  {name:<48}{r['p50']:>10.3f}{r['p95']:>10.3f}{r['p99']:>10.3f}{r['py_peak_kb']:>12.1f}", flush=True)
+    return results
+
+def run_size(args):
+    """Child process: builds one dataset, runs every case on it and writes the results to --result-file."""
+    build_s = _prepare_dataset(os.environ["TRAKFIN_DB_PATH"], args.run_size)
+    print(f"  built in {build_s:.1f}s\n  {'case':<48}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'py peak KB':>12}", flush=True)
+    try:
+        cases = asyncio.run(run_size_async(args.run_size, args.iterations, args.cases, args.seed))
+    finally:
+        from app import acrud, db
+        acrud.shutdown()
+        db.close_pool()
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    with open(args.result_file, "w") as f:
+        json.dump({"build_s": build_s, "peak_rss_mb": peak_rss, "cases": cases}, f)
+
+
+# --- Baseline comparison ---
+def compare(results: dict, baseline: dict, threshold: float):
+    """Returns one row per case present in both runs, flagging p50 or p95 slowdowns beyond the threshold."""
+    rows = []
+    for size, current in results["sizes"].items():
+        previous = baseline.get("sizes", {}).get(size)
+        if not previous:
+            continue
+        for name, stats in current["cases"].items():
+            before = previous["cases"].get(name)
+            if not before:
+                continue
+            regressed = any(
+                stats[p] > before[p] * (1 + threshold) and stats[p] - before[p] > NOISE_FLOOR_MS
+                for p in ("p50", "p95")
+            )
+            rows.append({
+                "size": size, "case": name, "baseline_p50": before["p50"], "p50": stats["p50"],
+                "baseline_p95": before["p95"], "p95": stats["p95"],
+                "ratio": stats["p50"] / before["p50"] if before["p50"] else float("inf"), "regressed": regressed,
+            })
+    return rows
+
+def print_comparison(rows: list, threshold: float):
+    print(f"\nAgainst baseline (regression: p50 or p95 more than {threshold:.0%} and {NOISE_FLOOR_MS} ms slower)")
+    print(f"{'rows':>10}  {'case':<48}{'base p50':>10}{'p50':>10}{'base p95':>10}{'p95':>10}{'p50 x':>8}")
+    for row in rows:
+        flag = "  REGRESSED" if row["regressed"] else ""
+        print(
+            f"{int(row['size']):>10,}  {row['case']:<48}{row['baseline_p50']:>10.3f}{row['p50']:>10.3f}"
+            f"{row['baseline_p95']:>10.3f}{row['p95']:>10.3f}{row['ratio']:>8.2f}{flag}"
+        )
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Transactions per dataset.")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed calls per case.")
+    parser.add_argument("--cases", help="Only run cases whose name matches this regex.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Where to write the JSON results. Defaults to benchmarks/results/suite-<time>.json.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown that counts as a regression.")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--run-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        run_size(args)
+        return
+
+    started_at = datetime.now(timezone.utc)
+    results = {
+        "meta": {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "seed": args.seed,
+        },
+        "sizes": {},
+    }
+    for rows in args.sizes:
+        tmp_dir = tempfile.mkdtemp(prefix="trakfin-suite-")
+        db_path = os.path.join(tmp_dir, "bench.db")
+        result_file = os.path.join(tmp_dir, "result.json")
+        print(f"\nBuilding dataset with {rows:,} transactions in {db_path}...", flush=True)
+        command = [
+            sys.executable, os.path.abspath(__file__), "--run-size", str(rows), "--result-file", result_file,
+            "--iterations", str(args.iterations), "--seed", str(args.seed),
+        ] + (["--cases", args.cases] if args.cases else [])
+        subprocess.run(command, env={**os.environ, "TRAKFIN_DB_PATH": db_path}, check=True)
+        with open(result_file) as f:
+            results["sizes"][str(rows)] = json.load(f)
+        shutil.rmtree(tmp_dir)
+        print(f"  peak RSS {results['sizes'][str(rows)]['peak_rss_mb']:.1f} MB")
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"suite-{started_at:%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        regressions = sum(row["regressed"] for row in rows)
+        print(f"\n{regressions} regression(s) in {len(rows)} compared case(s).")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# scripts/check_balances.py
+import os
+import sys
+import sqlite3
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import crud
+
+def check_evolution(user_id, start_date):
+    """Prints the month ends where the monthly and daily balance evolution disagree; returns True if any do."""
+    user_ids = [user_id] if user_id is not None else [user['id'] for user in crud.get_users()]
+    failed = False
+    for uid in user_ids:
+        for row in crud.check_balance_evolution(uid, start_date=start_date):
+            failed = True
+            print(f"  - user {uid}, {row['date']}: monthly {row['monthly_balance']:.2f}, daily {row['daily_balance']:.2f}")
+    if failed:
+        print("The monthly balance evolution disagrees with the daily one at the month ends above.")
+    else:
+        print(f"✅ Monthly and daily balance evolution agree at every month end from {start_date}.")
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute account balances from scratch and report drift in the account_balances table.")
+    parser.add_argument("--user-id", type=int, default=None, help="Only check this user's accounts.")
+    parser.add_argument("--fix", action="store_true", help="Rebuild the stored balances when drift is found.")
+    parser.add_argument("--evolution-start", default=None, metavar="YYYY-MM-DD",
+                        help="Also check that the monthly and daily balance evolution agree at month ends from this date.")
+    args = parser.parse_args()
+
+    try:
+        drift = crud.check_account_balances(user_id=args.user_id, fix=args.fix)
+        evolution_failed = args.evolution_start is not None and check_evolution(args.user_id, args.evolution_start)
+    except sqlite3.OperationalError as e:
+        print(f"Error: {e}. Run scripts/migrate.py to bring the schema up to date.")
+        sys.exit(2)
+    if evolution_failed:
+        sys.exit(1)
+    if not drift:
+        print("✅ All account balances are consistent.")
+        return
+
+    print(f"Found {len(drift)} drifted balance(s):")
+    for row in drift:
+        print(f"  - user {row['user_id']}, account {row['account_id']}, {row['currency']}: "
+              f"stored {row['stored_balance']:.2f}, expected {row['expected_balance']:.2f}")
+    if args.fix:
+        print("Stored balances were rebuilt from the transactions.")
+    else:
+        print("Run again with --fix to rebuild them.")
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
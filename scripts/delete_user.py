@@ -34,7 +34,7 @@ def delete_users(user_ids_to_delete):
     
     print(f"Preparing to delete users with IDs: {', '.join(user_ids_to_delete)}")
     
-    child_tables = ['accounts', 'categories', 'transactions', 'settings']
+    child_tables = ['accounts', 'categories', 'transactions', 'recurrence_series', 'transfers', 'settings']
     
     conn = None
     try:
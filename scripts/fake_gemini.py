@@ -0,0 +1,132 @@
+# scripts/fake_gemini.py
+"""
+A local stand-in for the Gemini API, to exercise and load-test the chat endpoints offline.
+
+It answers both :generateContent and :streamGenerateContent (as Server-Sent Events) with canned replies picked
+by matching the last message against a list of rules, waiting --latency-ms before the first byte and
+--token-delay-ms between streamed chunks. Point the app at it with:
+
+    TRAKFIN_GEMINI_API_URL=http://127.0.0.1:8765/v1beta/models/fake:generateContent GEMINI_API_KEY=fake
+"""
+import re
+import json
+import time
+import random
+import argparse
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# (pattern, reply) pairs tried in order against the last message; {result} is replaced by the query result
+# quoted in a formatting prompt.
+DEFAULT_REPLIES = [
+    (r"^The user originally asked", "Here is what I found in your data:\n{result}\nLet me know if you want more detail."),
+    (r"spen[dt]|expense", "[SQL]SELECT ROUND(-SUM(amount) / 100.0, 2) AS spent FROM transactions WHERE amount < 0 AND status = 'confirmed';[/SQL]"),
+    (r"income|earn", "[SQL]SELECT ROUND(SUM(amount) / 100.0, 2) AS income FROM transactions WHERE amount > 0 AND status = 'confirmed';[/SQL]"),
+    (r"balance", "[SQL]SELECT a.name, ROUND(b.balance / 100.0, 2) AS balance, b.currency FROM account_balances b JOIN accounts a ON a.id = b.account_id;[/SQL]"),
+    (r"", "Hello! I am a local stand-in for the AI model. Ask me how much you spent or earned, or for your balance."),
+]
+_RESULT = re.compile(r"The result from the database is: \n(.*)\n\. Based on this data", re.S)
+
+
+def load_replies(path: str | None):
+    if not path:
+        return [(re.compile(pattern, re.I), reply) for pattern, reply in DEFAULT_REPLIES]
+    with open(path, encoding="utf-8") as f:
+        return [(re.compile(item["match"], re.I), item["reply"]) for item in json.load(f)]
+
+def pick_reply(replies, text: str):
+    for pattern, reply in replies:
+        if pattern.search(text):
+            result = _RESULT.search(text)
+            return reply.replace("{result}", result.group(1) if result else "")
+    return ""
+
+def split_chunks(text: str, words_per_chunk: int):
+    """Splits text into chunks of a few words each, keeping the whitespace so they join back exactly."""
+    words = re.findall(r"\S+\s*|\s+", text)
+    return ["".join(words[i:i + words_per_chunk]) for i in range(0, len(words), words_per_chunk)] or [""]
+
+def _response_json(text: str):
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}]}
+
+
+def make_handler(args, replies):
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *params):
+            if args.verbose:
+                super().log_message(format, *params)
+
+        def _send_json(self, status: int, body: dict, headers: dict | None = None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            path = urlsplit(self.path).path
+            if not path.endswith((":generateContent", ":streamGenerateContent")):
+                self._send_json(404, {"error": {"code": 404, "message": f"Unknown method {path}"}})
+                return
+            if random.random() < args.error_rate:
+                self._send_json(503, {"error": {"code": 503, "message": "The model is overloaded."}}, {"Retry-After": "0"})
+                return
+            try:
+                text = body["contents"][-1]["parts"][0]["text"]
+            except (KeyError, IndexError, TypeError):
+                self._send_json(400, {"error": {"code": 400, "message": "Request has no contents."}})
+                return
+            reply = pick_reply(replies, text)
+            time.sleep(args.latency_ms / 1000)
+
+            if path.endswith(":generateContent"):
+                self._send_json(200, _response_json(reply))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, chunk in enumerate(split_chunks(reply, args.words_per_chunk)):
+                if i:
+                    time.sleep(args.token_delay_ms / 1000)
+                self._write_chunk(b"data: " + json.dumps(_response_json(chunk)).encode() + b"\r\n\r\n")
+            self._write_chunk(b"")
+
+    return FakeGeminiHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned Gemini replies locally, streamed or not, with configurable latency.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Delay before the first byte of every reply.")
+    parser.add_argument("--token-delay-ms", type=float, default=30, help="Delay between two streamed chunks.")
+    parser.add_argument("--words-per-chunk", type=int, default=3, help="Words in each streamed chunk.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a retryable 503.")
+    parser.add_argument("--replies", help="JSON file of [{\"match\": regex, \"reply\": text}] rules replacing the built-in ones.")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args, load_replies(args.replies)))
+    server.daemon_threads = True
+    print(f"Fake Gemini listening on http://{args.host}:{args.port} (latency {args.latency_ms:g} ms, {args.token_delay_ms:g} ms between chunks).")
+    print(f"   TRAKFIN_GEMINI_API_URL=http://{args.host}:{args.port}/v1beta/models/fake:generateContent")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
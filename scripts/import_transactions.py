@@ -0,0 +1,64 @@
+# scripts/import_transactions.py
+import os
+import sys
+import csv
+import asyncio
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import acrud, db
+from app.services import import_service
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a CSV or XLSX bank statement into a user's transactions.")
+    parser.add_argument("path", help="CSV or XLSX file to import.")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--format", choices=import_service.IMPORT_FORMATS, help="Defaults to the file extension.")
+    parser.add_argument("--mapping", help="Column mapping as 'field=Column,...' or JSON. Fields: " + ", ".join(import_service.IMPORT_FIELDS) + ".")
+    parser.add_argument("--account", help="Account name or id for every row, overriding the account column.")
+    parser.add_argument("--category", help="Category name or id for every row, overriding the category column.")
+    parser.add_argument("--currency", help="Currency for rows without one. Defaults to the user's preferred currency.")
+    parser.add_argument("--date-format", help="strptime format of the date column, e.g. %%d/%%m/%%Y. Defaults to ISO dates.")
+    parser.add_argument("--decimal-comma", action="store_true", help="Amounts use ',' as the decimal separator.")
+    parser.add_argument("--delimiter", default=",", help="CSV field delimiter.")
+    parser.add_argument("--sheet", help="XLSX worksheet name. Defaults to the active sheet.")
+    parser.add_argument("--chunk-size", type=int, default=import_service.IMPORT_CHUNK_SIZE)
+    parser.add_argument("--rejected-out", help="Write every rejected row with its reason to this CSV file.")
+    args = parser.parse_args()
+
+    rejected_file = open(args.rejected_out, "w", newline="", encoding="utf-8") if args.rejected_out else None
+    rejected_writer = csv.writer(rejected_file) if rejected_file else None
+    if rejected_writer:
+        rejected_writer.writerow(["row", "reason", "data"])
+
+    def on_rejected(rejection):
+        if rejected_writer:
+            rejected_writer.writerow([rejection["row"], rejection["reason"], rejection["data"]])
+
+    try:
+        with open(args.path, "rb") as f:
+            report = asyncio.run(import_service.import_file(
+                f, args.path, args.user_id, file_format=args.format, delimiter=args.delimiter, sheet=args.sheet,
+                mapping=args.mapping, account=args.account, category=args.category, currency=args.currency,
+                date_format=args.date_format, decimal_comma=args.decimal_comma, chunk_size=args.chunk_size,
+                on_rejected=on_rejected
+            ))
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    finally:
+        if rejected_file:
+            rejected_file.close()
+        acrud.shutdown()
+        db.close_pool()
+
+    print(f"✅ Read {report['rows_read']:,} rows in {report['elapsed_s']:.2f}s ({report['rows_per_sec']:,.0f} rows/sec).")
+    print(f"   Inserted {report['inserted']:,}, skipped {report['duplicates']:,} duplicate(s), rejected {report['rejected']:,}.")
+    for rejection in report["rejected_rows"][:10]:
+        print(f"   - row {rejection['row']}: {rejection['reason']}")
+    if report["rejected"] > 10:
+        print(f"   ... and {report['rejected'] - 10:,} more" + (f" (see {args.rejected_out})." if args.rejected_out else ". Use --rejected-out to save them all."))
+    sys.exit(1 if report["rejected"] else 0)
+
+if __name__ == "__main__":
+    main()
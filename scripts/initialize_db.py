@@ -1,8 +1,11 @@
 # scripts/initialize_db.py
 import sqlite3
 import os
+import sys
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'trakfin.db')
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import migrations
+from app.config import DB_PATH
 
 def create_connection():
     """ create a database connection to a SQLite database """
@@ -102,6 +105,8 @@ def main():
         create_table(conn, sql_categories_table)
         create_table(conn, sql_transactions_table)
         create_table(conn, sql_settings_table)
+        print("Applying schema migrations...")
+        migrations.apply_migrations(conn)
         conn.close()
         print("Database initialized successfully.")
     else:
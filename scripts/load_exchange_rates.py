@@ -0,0 +1,42 @@
+# scripts/load_exchange_rates.py
+import os
+import sys
+import csv
+import sqlite3
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import crud, db
+
+def read_rates(path, delimiter):
+    """Yields (currency, effective_date, rate) from a CSV file with currency, date (or effective_date) and rate columns."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line_number, row in enumerate(csv.DictReader(f, delimiter=delimiter), start=2):
+            try:
+                yield row["currency"], row.get("effective_date") or row["date"], float(row["rate"])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"Line {line_number}: expected currency, date and a numeric rate, got {row}.")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=f"Load date-effective exchange rates from a CSV file and recompute the affected base-currency amounts. "
+                    f"Each rate is the value of one unit of the currency in {crud.BASE_CURRENCY}, effective from its date."
+    )
+    parser.add_argument("path", help="CSV file with currency, date and rate columns.")
+    parser.add_argument("--delimiter", default=",", help="CSV field delimiter.")
+    args = parser.parse_args()
+
+    try:
+        loaded, updated = crud.load_exchange_rates(read_rates(args.path, args.delimiter))
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    except sqlite3.OperationalError as e:
+        print(f"Error: {e}. Run scripts/migrate.py to bring the schema up to date.")
+        sys.exit(2)
+    finally:
+        db.close_pool()
+    print(f"✅ Loaded {loaded} rate(s); recomputed {updated} transaction amount(s) in {crud.BASE_CURRENCY}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# scripts/migrate.py
+import sqlite3
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import migrations
+from app.config import DB_PATH
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations to the TrakFin database.")
+    parser.add_argument("--status", action="store_true", help="Show the current schema version and pending migrations without applying them.")
+    parser.add_argument("--target", type=int, default=None, help="Migrate up to this version instead of the latest one.")
+    args = parser.parse_args()
+
+    if not os.path.exists(DB_PATH):
+        print(f"Error: Database file not found at {DB_PATH}. Run scripts/initialize_db.py first.")
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        current_version = migrations.get_schema_version(conn)
+        pending = migrations.get_pending_migrations(conn)
+        print(f"Current schema version: {current_version} (latest: {migrations.LATEST_VERSION})")
+
+        if args.status:
+            for version, description, _ in pending:
+                print(f"  - pending {version:04d}: {description}")
+            if not pending:
+                print("Database is up to date.")
+            return
+
+        applied = migrations.apply_migrations(conn, target_version=args.target)
+        for version, description in applied:
+            print(f"  - applied {version:04d}: {description}")
+        print(f"Schema version is now {migrations.get_schema_version(conn)}.")
+    except sqlite3.Error as e:
+        print(f"Migration failed: {e}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
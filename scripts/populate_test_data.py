@@ -1,89 +1,449 @@
-# Find and replace the entire content of this file
-import sqlite3
+# scripts/populate_test_data.py
+"""
+Generates realistic synthetic data for load tests: many users, each with accounts, the default categories,
+monthly and weekly recurring series (with their pending rows inside the rolling window), monthly transfers to
+savings and seasonal day-to-day spending. Everything is drawn as NumPy arrays from one seeded generator, so the
+same arguments always produce the same data.
+
+Rows are bulk-loaded with executemany, a few hundred thousand per transaction. The per-row triggers on
+transactions are dropped for the load and recreated before each commit; what they maintain (amount_base,
+account_balances, balance_checkpoints, the search index, series counts and data versions) is filled in
+set-based for the loaded users instead, exactly as the triggers would have.
+
+    python scripts/populate_test_data.py --users 100 --transactions 1000000
+"""
 import os
 import sys
-import random
-from datetime import date, timedelta
+import time
+import uuid
+import sqlite3
+import argparse
+from datetime import date
+
+import numpy as np
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from app import crud
-
-def clear_user_data(conn, user_id):
-    print(f"Clearing old data for user_id: {user_id}...")
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM transactions WHERE user_id = ?", (user_id,))
-    cursor.execute("DELETE FROM accounts WHERE user_id = ?", (user_id,))
-    cursor.execute("DELETE FROM categories WHERE user_id = ?", (user_id,))
-    cursor.execute("DELETE FROM settings WHERE user_id = ?", (user_id,))
-    cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-    conn.commit()
-    print("Old data cleared.")
+from app import migrations
+from app.config import DB_PATH, RECURRENCE_WINDOW_DAYS
 
-def main():
-    conn = crud.get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT id FROM users WHERE first_name = 'Test' AND surname = 'User'")
-    existing_user = cursor.fetchone()
-    if existing_user:
-        clear_user_data(conn, existing_user[0])
-
-    print("Creating 'Test User'...")
-    user_id = crud.create_user(first_name="Test", second_name=None, surname="User")
-    
-    print("Creating accounts...")
-    accounts = {
-        'checking': crud.add_account("Checking Account", user_id),
-        'savings': crud.add_account("Savings Account", user_id),
-        'credit': crud.add_account("Credit Card", user_id),
+# Generated users are recognised by their surname, so --replace can remove them again.
+GENERATED_SURNAME = "Test User"
+FIRST_NAMES = ("Alice", "Bruno", "Carla", "Daniel", "Elena", "Felix", "Greta", "Hugo", "Ines", "Jonas", "Lena", "Marco", "Nora", "Oscar", "Paula", "Rui")
+
+ACCOUNTS = ("Checking Account", "Savings Account", "Credit Card", "Cash")
+CHECKING, SAVINGS, CREDIT_CARD, CASH = range(len(ACCOUNTS))
+# The categories every new user gets (see user_service.create_new_user).
+CATEGORIES = (
+    ("Groceries", "category_groceries"), ("Salary", "category_salary"), ("Rent", "category_rent"),
+    ("Utilities", "category_utilities"), ("Restaurants", "category_restaurants"), ("Transport", "category_transport"),
+    ("Shopping", "category_shopping"), ("Entertainment", "category_entertainment"), ("Internal Transfers", "category_internal_transfer"),
+)
+_CATEGORY = {key: i for i, (_, key) in enumerate(CATEGORIES)}
+CURRENCIES = ("EUR", "USD", "GBP")
+CURRENCY_WEIGHTS = (0.94, 0.04, 0.02)
+
+# Recurring series: (description, category, account, unit, median amount in cents, spread, share of users having it).
+SERIES = (
+    ("Monthly Salary", "category_salary", CHECKING, "months", 280000, 0.35, 1.0),
+    ("Monthly Rent", "category_rent", CHECKING, "months", -95000, 0.30, 0.8),
+    ("Electricity Bill", "category_utilities", CHECKING, "months", -7500, 0.30, 0.9),
+    ("Mobile Phone", "category_utilities", CREDIT_CARD, "months", -2500, 0.30, 0.95),
+    ("Streaming Subscription", "category_entertainment", CREDIT_CARD, "months", -1299, 0.20, 0.6),
+    ("Groceries Delivery", "category_groceries", CREDIT_CARD, "weeks", -6500, 0.30, 0.3),
+)
+# Day-to-day spending: (category, base weight, median amount in cents, log-normal sigma, descriptions).
+SPENDING = (
+    ("category_groceries", 0.34, 3500, 0.6, ("Supermarket", "Local Market", "Bakery", "Organic Store", "Butcher")),
+    ("category_restaurants", 0.22, 1800, 0.7, ("Lunch", "Coffee", "Dinner with friends", "Pizza Place", "Sushi Bar", "Food Delivery")),
+    ("category_transport", 0.16, 1500, 0.8, ("Metro Ticket", "Taxi Ride", "Fuel", "Parking", "Train Ticket")),
+    ("category_shopping", 0.14, 4500, 0.9, ("Online Shopping", "Clothing Store", "Electronics Store", "Bookshop", "Pharmacy")),
+    ("category_entertainment", 0.09, 2500, 0.8, ("Cinema", "Concert Tickets", "Video Game", "Museum", "Bowling")),
+    ("category_utilities", 0.05, 6000, 0.5, ("Water Bill", "Gas Bill", "Internet", "Home Insurance")),
+)
+# Category weight multipliers per calendar month (January first): shopping peaks before Christmas, going out in summer.
+SEASONAL_CATEGORY_BOOST = {
+    "category_shopping": (1.0, 0.8, 0.9, 0.9, 1.0, 1.0, 1.1, 1.0, 0.9, 1.0, 1.6, 2.2),
+    "category_entertainment": (0.8, 0.8, 0.9, 1.0, 1.1, 1.3, 1.5, 1.5, 1.1, 1.0, 0.9, 1.2),
+}
+SPENDING_ACCOUNTS = (CHECKING, CREDIT_CARD, CASH)
+SPENDING_ACCOUNT_WEIGHTS = (0.45, 0.45, 0.10)
+REFUND_SHARE = 0.015
+TRANSFER_DESCRIPTION = "Transfer to Savings"
+TRANSFER_SHARE = 0.7  # share of months in which a user moves money to savings
+
+DESCRIPTIONS = [s[0] for s in SERIES] + [TRANSFER_DESCRIPTION] + [d for s in SPENDING for d in s[4]]
+_TRANSFER_DESCRIPTION_INDEX = len(SERIES)
+
+
+# --- Generation ---
+def _uuids(rng, count: int):
+    """Reproducible version-4 UUID strings drawn from rng."""
+    raw = rng.bytes(16 * count)
+    return [str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, 16 * count, 16)]
+
+def _day_weights(days):
+    """Relative spending volume of each day: busier weekends, a December peak and a mild summer bump."""
+    day_of_year = (days - days.astype('datetime64[Y]')).astype(np.int64)
+    weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday; Monday is 0
+    weights = np.where(weekday >= 5, 1.3, 1.0)
+    weights = weights * (1 + 0.35 * np.exp(-((day_of_year - 352) / 14.0) ** 2) + 0.1 * np.cos(2 * np.pi * (day_of_year - 200) / 365))
+    return weights / weights.sum()
+
+def _category_thresholds():
+    """Cumulative spending category probabilities per calendar month, shape (12, len(SPENDING))."""
+    weights = np.array([[s[1] * SEASONAL_CATEGORY_BOOST.get(s[0], (1.0,) * 12)[m] for s in SPENDING] for m in range(12)])
+    return np.cumsum(weights / weights.sum(axis=1, keepdims=True), axis=1)
+
+def generate(users: int, transactions: int, years: int, seed: int, today: date):
+    """
+    Draws the whole data set. Users, series and transfers are numbered from 0 and ordered by user; transactions
+    are ordered by user and date, so every user's rows are one contiguous slice. Dates are indices into `days`.
+    Recurring rows and transfers come first; day-to-day spending fills the rest of `transactions`.
+    """
+    rng = np.random.default_rng(seed)
+    first_month = np.datetime64(today, 'M') - 12 * years
+    start = first_month.astype('datetime64[D]')
+    today_index = int((np.datetime64(today) - start).astype(np.int64))
+    horizon_index = today_index + RECURRENCE_WINDOW_DAYS
+    days = start + np.arange(horizon_index + 1)
+    months = 12 * years + RECURRENCE_WINDOW_DAYS // 28 + 2
+
+    # Series: which users have which one, with the user's own day of the month and amount.
+    has_series = rng.random((users, len(SERIES))) < np.array([s[6] for s in SERIES])
+    series_user, series_template = np.nonzero(has_series)
+    medians = np.array([s[4] for s in SERIES])[series_template]
+    spreads = np.array([s[5] for s in SERIES])[series_template]
+    series_amount = np.rint(medians * np.exp(spreads * rng.standard_normal(len(series_user)))).astype(np.int64)
+    series_offset = rng.integers(0, 28, len(series_user))
+    weekly = np.array([s[3] == "weeks" for s in SERIES])[series_template]
+
+    # Occurrence k of a monthly series falls on its day in month k; of a weekly one, 7k days after its first.
+    steps = np.arange(max(months, horizon_index // 7 + 2))
+    month_starts = ((first_month + steps[:months]).astype('datetime64[D]') - start).astype(np.int64)
+    occurrence = np.where(
+        weekly[:, None],
+        series_offset[:, None] % 7 + 7 * steps[None, :],
+        np.pad(month_starts, (0, len(steps) - months), constant_values=horizon_index + 1)[None, :] + series_offset[:, None],
+    )
+    valid = occurrence <= horizon_index
+    occ_series, occ_step = np.nonzero(valid)
+    occ_day = occurrence[occ_series, occ_step]
+    series_next_step = valid.sum(axis=1)
+    series_first_day = occurrence[:, 0]
+
+    # Transfers: in some months, one amount moved from checking to savings, as an expense and an income leg.
+    has_transfer = (rng.random((users, 12 * years + 1)) < TRANSFER_SHARE)
+    transfer_user, transfer_month = np.nonzero(has_transfer)
+    transfer_day = month_starts[transfer_month] + rng.integers(0, 28, len(transfer_user))
+    keep = transfer_day <= today_index
+    transfer_user, transfer_day = transfer_user[keep], transfer_day[keep]
+    transfer_amount = np.rint(np.exp(np.log(30000) + 0.6 * rng.standard_normal(len(transfer_user))) / 100).astype(np.int64) * 100
+
+    # Day-to-day spending, spread over the users unevenly and over the past days by the seasonal weights.
+    fixed = len(occ_series) + 2 * len(transfer_user)
+    spending = max(transactions - fixed, 0)
+    user_share = rng.lognormal(0, 0.5, users)
+    per_user = rng.multinomial(spending, user_share / user_share.sum())
+    spend_user = np.repeat(np.arange(users), per_user)
+    spend_day = rng.choice(today_index + 1, size=spending, p=_day_weights(days[:today_index + 1]))
+    month_of_year = days[spend_day].astype('datetime64[M]').astype(np.int64) % 12
+    draws = rng.random(spending)
+    spend_template = np.empty(spending, dtype=np.int64)
+    for month, thresholds in enumerate(_category_thresholds()):
+        in_month = month_of_year == month
+        spend_template[in_month] = np.minimum(np.searchsorted(thresholds, draws[in_month], side='right'), len(SPENDING) - 1)
+    medians = np.array([s[2] for s in SPENDING])[spend_template]
+    sigmas = np.array([s[3] for s in SPENDING])[spend_template]
+    spend_amount = np.maximum(np.rint(medians * np.exp(sigmas * rng.standard_normal(spending))), 1).astype(np.int64)
+    spend_amount = np.where(rng.random(spending) < REFUND_SHARE, spend_amount, -spend_amount)
+    description_counts = np.array([len(s[4]) for s in SPENDING])
+    description_starts = len(SERIES) + 1 + np.concatenate(([0], np.cumsum(description_counts)[:-1]))
+    spend_description = description_starts[spend_template] + (rng.random(spending) * description_counts[spend_template]).astype(np.int64)
+
+    n_occ, n_tr = len(occ_series), len(transfer_user)
+    series_category = np.array([_CATEGORY[s[1]] for s in SERIES])
+    series_account = np.array([s[2] for s in SERIES])
+    tx = {
+        "user": np.concatenate((series_user[occ_series], transfer_user, transfer_user, spend_user)),
+        "day": np.concatenate((occ_day, transfer_day, transfer_day, spend_day)),
+        "description": np.concatenate((series_template[occ_series], np.full(2 * n_tr, _TRANSFER_DESCRIPTION_INDEX), spend_description)),
+        "amount": np.concatenate((series_amount[occ_series], -transfer_amount, transfer_amount, spend_amount)),
+        "currency": np.concatenate((np.zeros(n_occ + 2 * n_tr, dtype=np.int64), rng.choice(len(CURRENCIES), size=spending, p=CURRENCY_WEIGHTS))),
+        "account": np.concatenate((
+            series_account[series_template[occ_series]], np.full(n_tr, CHECKING), np.full(n_tr, SAVINGS),
+            np.array(SPENDING_ACCOUNTS)[rng.choice(len(SPENDING_ACCOUNTS), size=spending, p=SPENDING_ACCOUNT_WEIGHTS)],
+        )),
+        "category": np.concatenate((
+            series_category[series_template[occ_series]], np.full(2 * n_tr, _CATEGORY["category_internal_transfer"]),
+            np.array([_CATEGORY[s[0]] for s in SPENDING])[spend_template],
+        )),
+        "series": np.concatenate((occ_series, np.full(2 * n_tr + spending, -1))),
+        "transfer": np.concatenate((np.full(n_occ, -1), np.arange(n_tr), np.arange(n_tr), np.full(spending, -1))),
+        # A series' first occurrence is its master, which carries the rule like one created through the API.
+        "master": np.concatenate((occ_step == 0, np.zeros(2 * n_tr + spending, dtype=bool))),
     }
+    # Compact types keep ten million rows in memory comfortably.
+    dtypes = {"user": np.int32, "day": np.int32, "description": np.int16, "amount": np.int64, "currency": np.int8,
+              "account": np.int8, "category": np.int8, "series": np.int32, "transfer": np.int32, "master": bool}
+    order = np.lexsort((tx["day"], tx["user"]))
+    tx = {name: column[order].astype(dtypes[name]) for name, column in tx.items()}
+    tx["pending"] = tx["day"] > today_index
 
-    print("Creating categories...")
-    categories = {
-        'salary': crud.add_category("Salary", user_id),
-        'groceries': crud.add_category("Groceries", user_id),
-        'rent': crud.add_category("Rent", user_id),
-        'transport': crud.add_category("Transport", user_id),
-        'eating_out': crud.add_category("Eating Out", user_id),
-        'shopping': crud.add_category("Shopping", user_id),
-        'utilities': crud.add_category("Utilities", user_id),
-        'transfer': crud.add_category("Internal Transfer", user_id),
+    return {
+        "days": days,
+        "today_index": today_index,
+        "user_first_name": rng.integers(0, len(FIRST_NAMES), users),
+        "preferred_currency": rng.choice(len(CURRENCIES), size=users, p=(0.8, 0.12, 0.08)),
+        "series": {
+            "user": series_user, "template": series_template, "amount": series_amount,
+            "first_day": series_first_day, "next_step": series_next_step, "public_id": _uuids(rng, len(series_user)),
+        },
+        "transfers": {"user": transfer_user, "public_id": _uuids(rng, len(transfer_user))},
+        "transactions": tx,
     }
-    crud.update_setting("transfer_category_id", categories['transfer'], user_id)
-    
-    print("Generating transactions...")
-    today = date.today()
-    
-    # --- Key Transactions ---
-    # Salary (last 3 months)
-    for i in range(3):
-        crud.add_transaction(today - timedelta(days=15 + i*30), "Monthly Salary", 3000, 'EUR', True, accounts['checking'], categories['salary'], user_id)
-    # Rent (last 3 months)
-    for i in range(3):
-        crud.add_transaction(today - timedelta(days=25 + i*30), "Monthly Rent", -850, 'EUR', True, accounts['checking'], categories['rent'], user_id)
-
-    # --- Randomized Transactions ---
-    random_expenses = [
-        ("Groceries", -75.50, categories['groceries']), ("Lunch", -15.80, categories['eating_out']),
-        ("Coffee", -4.20, categories['eating_out']), ("Metro Pass", -30.00, categories['transport']),
-        ("Online Shopping", -120.00, categories['shopping']), ("Electricity Bill", -88.90, categories['utilities']),
-        ("Gas Bill", -45.00, categories['utilities']), ("Dinner with friends", -55.75, categories['eating_out']),
-        ("New T-shirt", -29.99, categories['shopping']), ("Taxi ride", -12.50, categories['transport'])
-    ]
-
-    for _ in range(40):
-        desc, amount, cat_id = random.choice(random_expenses)
-        rand_date = today - timedelta(days=random.randint(1, 365))
-        rand_account = random.choice([accounts['checking'], accounts['credit']])
-        crud.add_transaction(rand_date, desc, amount, 'EUR', False, rand_account, cat_id, user_id)
-        
-    # Add a transfer
-    transfer_id = "test-transfer-01"
-    crud.add_transaction(today - timedelta(days=30), "Transfer to Savings", 500, 'EUR', False, accounts['savings'], categories['transfer'], user_id, transfer_id=transfer_id)
-    crud.add_transaction(today - timedelta(days=30), "Transfer to Savings", -500, 'EUR', False, accounts['checking'], categories['transfer'], user_id, transfer_id=transfer_id)
-    
-    conn.close()
-    print(f"✅ Test data populated successfully with ~50 transactions!")
+
+
+# --- Loading ---
+def _base_amounts(conn, amounts, currencies, day_strings):
+    """
+    amount_base of each row, computed like migrations.base_amount_sql: the rate effective on the row's date (else
+    the earliest one, else 1.0), converted between minor units and rounded half away from zero as SQLite's ROUND does.
+    """
+    scales = dict(conn.execute("SELECT code, scale FROM currencies").fetchall())
+    base = np.zeros(len(amounts), dtype=np.int64)
+    for i, currency in enumerate(CURRENCIES):
+        rows = np.nonzero(currencies == i)[0]
+        rates = conn.execute("SELECT effective_date, rate FROM exchange_rates WHERE currency = ? ORDER BY effective_date", (currency,)).fetchall()
+        if rates:
+            effective = np.array([r[0] for r in rates])
+            position = np.searchsorted(effective, day_strings[rows], side='right') - 1
+            rate = np.array([r[1] for r in rates])[np.maximum(position, 0)]
+        else:
+            rate = np.ones(len(rows))
+        value = amounts[rows] * rate * scales.get('EUR', 100) / scales.get(currency, 100)
+        base[rows] = np.trunc(value + np.where(value < 0, -0.5, 0.5)).astype(np.int64)
+    return base
+
+def _next_id(conn, table: str):
+    """First id above both the table's rows and its AUTOINCREMENT counter."""
+    row = conn.execute(
+        f"SELECT MAX(COALESCE((SELECT MAX(id) FROM {table}), 0), COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0))",
+        (table,)
+    ).fetchone()
+    return row[0] + 1
+
+def _drop_transaction_triggers(conn):
+    """Drops the per-row triggers on transactions and returns their SQL, to recreate them in the same transaction."""
+    triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'transactions'").fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    return [sql for _, sql in triggers]
+
+def _nullable(ids, base: int):
+    """Python list of base + ids, with None where ids is negative."""
+    column = np.full(len(ids), None, dtype=object)
+    present = ids >= 0
+    column[present] = (base + ids[present].astype(np.int64)).tolist()
+    return column.tolist()
+
+def delete_generated_users(conn):
+    """Deletes every generated user and all their data in one transaction. Returns how many users were deleted."""
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE surname LIKE ?", (f"{GENERATED_SURNAME} %",))]
+    if not user_ids:
+        return 0
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        triggers = _drop_transaction_triggers(conn)
+        conn.execute("CREATE TEMP TABLE generated_users (id INTEGER PRIMARY KEY)")
+        conn.executemany("INSERT INTO temp.generated_users (id) VALUES (?)", [(user_id,) for user_id in user_ids])
+        for table in ("transactions", "transfers", "recurrence_series", "account_balances", "balance_checkpoints", "settings", "categories", "accounts", "user_data_versions"):
+            conn.execute(f"DELETE FROM {table} WHERE user_id IN (SELECT id FROM temp.generated_users)")
+        conn.execute("DELETE FROM users WHERE id IN (SELECT id FROM temp.generated_users)")
+        conn.execute("DROP TABLE temp.generated_users")
+        conn.execute("INSERT INTO transactions_fts(transactions_fts) VALUES('rebuild')")
+        for sql in triggers:
+            conn.execute(sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(user_ids)
+
+def load_users(conn, data, first: int, last: int, ids: dict):
+    """
+    Inserts users [first, last) with everything they own in one transaction: users, accounts, categories, settings,
+    series, transfers and transactions, then the rows the transactions' triggers would have maintained.
+    Returns the number of transactions inserted.
+    """
+    tx, series, transfers = data["transactions"], data["series"], data["transfers"]
+    day_strings = data["day_strings"]
+    users = np.arange(first, last)
+    user_ids = ids["users"] + users
+    account_id = lambda user, slot: ids["accounts"] + np.int64(user) * len(ACCOUNTS) + slot
+    category_id = lambda user, slot: ids["categories"] + np.int64(user) * len(CATEGORIES) + slot
+
+    tx_lo, tx_hi = np.searchsorted(tx["user"], [first, last])
+    s_lo, s_hi = np.searchsorted(series["user"], [first, last])
+    t_lo, t_hi = np.searchsorted(transfers["user"], [first, last])
+    rows = slice(tx_lo, tx_hi)
+    tx_ids = ids["transactions"] + np.arange(tx_lo, tx_hi)
+
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        triggers = _drop_transaction_triggers(conn)
+        conn.executemany(
+            "INSERT INTO users (id, first_name, second_name, surname) VALUES (?, ?, NULL, ?)",
+            zip(user_ids.tolist(), [FIRST_NAMES[i] for i in data["user_first_name"][first:last]], [f"{GENERATED_SURNAME} {u}" for u in user_ids.tolist()])
+        )
+        conn.executemany(
+            "INSERT INTO accounts (id, user_id, name) VALUES (?, ?, ?)",
+            ((int(account_id(u, slot)), int(user_id), name) for u, user_id in zip(users.tolist(), user_ids) for slot, name in enumerate(ACCOUNTS))
+        )
+        conn.executemany(
+            "INSERT INTO categories (id, user_id, name, i18n_key) VALUES (?, ?, ?, ?)",
+            ((int(category_id(u, slot)), int(user_id), name, key) for u, user_id in zip(users.tolist(), user_ids) for slot, (name, key) in enumerate(CATEGORIES))
+        )
+        conn.executemany(
+            "INSERT INTO settings (user_id, key, value) VALUES (?, ?, ?)",
+            [(int(user_id), 'preferred_currency', CURRENCIES[c]) for user_id, c in zip(user_ids, data["preferred_currency"][first:last])]
+            + [(int(user_id), 'transfer_category_id', str(int(category_id(u, _CATEGORY["category_internal_transfer"])))) for u, user_id in zip(users.tolist(), user_ids)]
+        )
+
+        materialized_until = str(data["days"][-1])
+        conn.executemany(
+            """INSERT INTO recurrence_series
+                   (id, public_id, user_id, start_date, recurrence_num, recurrence_unit, end_date, description, amount, currency,
+                    account_id, category_id, next_step, materialized_until)
+               VALUES (?, ?, ?, ?, 1, ?, NULL, ?, ?, 'EUR', ?, ?, ?, ?)""",
+            (
+                (ids["series"] + i, series["public_id"][i], ids["users"] + u, day_strings[first_day], SERIES[t][3], SERIES[t][0], amount,
+                 int(account_id(u, SERIES[t][2])), int(category_id(u, _CATEGORY[SERIES[t][1]])), next_step, materialized_until)
+                for i, u, t, amount, first_day, next_step in zip(
+                    range(s_lo, s_hi), series["user"][s_lo:s_hi].tolist(), series["template"][s_lo:s_hi].tolist(),
+                    series["amount"][s_lo:s_hi].tolist(), series["first_day"][s_lo:s_hi].tolist(), series["next_step"][s_lo:s_hi].tolist(),
+                )
+            )
+        )
+
+        # Each transfer's legs are its expense and income rows, found by their (ordered) positions.
+        transfer_rows = np.nonzero(tx["transfer"][rows] >= 0)[0]
+        legs = np.full((t_hi - t_lo, 2), 0, dtype=np.int64)
+        legs[tx["transfer"][rows][transfer_rows] - t_lo, (tx["amount"][rows][transfer_rows] > 0).astype(np.int64)] = tx_ids[transfer_rows]
+        conn.executemany(
+            "INSERT INTO transfers (id, public_id, user_id, expense_id, income_id) VALUES (?, ?, ?, ?, ?)",
+            zip(range(ids["transfers"] + t_lo, ids["transfers"] + t_hi), transfers["public_id"][t_lo:t_hi],
+                (ids["users"] + transfers["user"][t_lo:t_hi]).tolist(), legs[:, 0].tolist(), legs[:, 1].tolist())
+        )
+
+        user, day, amount, currency = tx["user"][rows].astype(np.int64), tx["day"][rows], tx["amount"][rows], tx["currency"][rows]
+        dates = day_strings[day]
+        master = tx["master"][rows]
+        units = np.array([s[3] for s in SERIES], dtype=object)
+        conn.executemany(
+            """INSERT INTO transactions
+                   (id, user_id, date, description, amount, currency, account_id, category_id, is_recurrent, status, amount_base,
+                    series_id, transfer_ref_id, recurrence_num, recurrence_unit)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            zip(
+                tx_ids.tolist(), (ids["users"] + user).tolist(), dates.tolist(),
+                np.array(DESCRIPTIONS, dtype=object)[tx["description"][rows]].tolist(), amount.tolist(),
+                np.array(CURRENCIES, dtype=object)[currency].tolist(),
+                account_id(user, tx["account"][rows]).tolist(), category_id(user, tx["category"][rows]).tolist(),
+                (tx["series"][rows] >= 0).astype(np.int64).tolist(),
+                np.where(tx["pending"][rows], 'pending', 'confirmed').tolist(),
+                _base_amounts(conn, amount, currency, dates).tolist(),
+                _nullable(tx["series"][rows], ids["series"]), _nullable(tx["transfer"][rows], ids["transfers"]),
+                np.where(master, 1, None).tolist(), np.where(master, units[series["template"][tx["series"][rows]]], None).tolist(),
+            )
+        )
+
+        # What the triggers maintain, set-based over the new users' rows.
+        user_range = (int(user_ids[0]), int(user_ids[-1]))
+        conn.execute("""
+            INSERT INTO account_balances (user_id, account_id, currency, balance)
+            SELECT user_id, account_id, currency, SUM(amount) FROM transactions
+            WHERE user_id BETWEEN ? AND ? AND status = 'confirmed' GROUP BY user_id, account_id, currency
+        """, user_range)
+        conn.execute("""
+            INSERT INTO balance_checkpoints (user_id, month, account_id, currency, change, change_base)
+            SELECT user_id, substr(date, 1, 7), account_id, currency, SUM(amount), SUM(amount_base) FROM transactions
+            WHERE user_id BETWEEN ? AND ? AND status = 'confirmed' GROUP BY user_id, substr(date, 1, 7), account_id, currency
+        """, user_range)
+        conn.execute("""
+            UPDATE recurrence_series SET
+                confirmed_count = (SELECT COUNT(*) FROM transactions WHERE series_id = recurrence_series.id AND status = 'confirmed'),
+                pending_count = (SELECT COUNT(*) FROM transactions WHERE series_id = recurrence_series.id AND status = 'pending'),
+                master_id = (SELECT MIN(id) FROM transactions WHERE series_id = recurrence_series.id AND status = 'confirmed')
+            WHERE user_id BETWEEN ? AND ?
+        """, user_range)
+        if tx_hi > tx_lo:
+            conn.execute(
+                "INSERT INTO transactions_fts (rowid, description) SELECT id, description FROM transactions WHERE id BETWEEN ? AND ?",
+                (int(tx_ids[0]), int(tx_ids[-1]))
+            )
+        conn.execute("""
+            INSERT INTO user_data_versions (user_id, version) SELECT id, 1 FROM users WHERE id BETWEEN ? AND ?
+            ON CONFLICT(user_id) DO UPDATE SET version = version + 1
+        """, user_range)
+
+        for sql in triggers:
+            conn.execute(sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return tx_hi - tx_lo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate reproducible synthetic users, series, transfers and transactions for load tests.")
+    parser.add_argument("--users", type=int, default=10, help="Number of users to generate.")
+    parser.add_argument("--transactions", type=int, default=100000, help="Total transactions across all users (recurring rows and transfers included).")
+    parser.add_argument("--years", type=int, default=3, help="Years of history to generate, up to today.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the random generator; the same arguments give the same data.")
+    parser.add_argument("--chunk-rows", type=int, default=500000, help="About this many transactions are loaded per database transaction.")
+    parser.add_argument("--replace", action="store_true", help="Delete previously generated users first.")
+    args = parser.parse_args()
+
+    if not os.path.exists(DB_PATH):
+        print(f"Error: Database file not found at {DB_PATH}. Run scripts/initialize_db.py first.")
+        sys.exit(1)
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        migrations.apply_migrations(conn)
+        # A crash mid-load loses nothing but generated rows, so skip the fsyncs.
+        conn.execute("PRAGMA synchronous = OFF;")
+        conn.execute("PRAGMA cache_size = -262144;")
+        if args.replace:
+            print(f"Deleted {delete_generated_users(conn)} previously generated user(s).")
+
+        started = time.perf_counter()
+        data = generate(args.users, args.transactions, args.years, args.seed, date.today())
+        data["day_strings"] = np.datetime_as_string(data["days"])
+        generated = time.perf_counter()
+        print(f"Generated {len(data['transactions']['user'])} transactions, {len(data['series']['user'])} series and "
+              f"{len(data['transfers']['user'])} transfers for {args.users} users in {generated - started:.1f}s.")
+
+        ids = {table: _next_id(conn, table) for table in ("users", "accounts", "categories", "recurrence_series", "transfers", "transactions")}
+        ids["series"] = ids.pop("recurrence_series")
+        counts = np.bincount(data["transactions"]["user"], minlength=args.users)
+        total = 0
+        first = 0
+        while first < args.users:
+            last = first + 1 + int(np.searchsorted(np.cumsum(counts[first:]), args.chunk_rows))
+            last = min(last, args.users)
+            chunk_started = time.perf_counter()
+            inserted = load_users(conn, data, first, last, ids)
+            total += inserted
+            print(f"  - users {ids['users'] + first}-{ids['users'] + last - 1}: {inserted} transactions in {time.perf_counter() - chunk_started:.1f}s")
+            first = last
+
+        conn.execute("ANALYZE;")
+        elapsed = time.perf_counter() - started
+        print(f"✅ Loaded {total} transactions for {args.users} users in {elapsed:.1f}s ({total / elapsed * 60:,.0f} rows/min).")
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,21 @@
+# scripts/rebuild_search_index.py
+import os
+import sys
+import time
+import sqlite3
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import crud
+
+def main():
+    print("Rebuilding the transaction description search index...")
+    start = time.perf_counter()
+    try:
+        indexed = crud.rebuild_search_index()
+    except sqlite3.OperationalError as e:
+        print(f"Error: {e}. Run scripts/migrate.py to create the search index first.")
+        sys.exit(2)
+    print(f"✅ Indexed {indexed} transactions in {time.perf_counter() - start:.2f}s.")
+
+if __name__ == "__main__":
+    main()